@@ -0,0 +1,120 @@
+"""
+Benchmark for server/cluster lookups against file repositories of growing
+size.
+
+Generates servers.config/clusters.config files of 1000, 5000 and 20000
+servers (3 member replica sets) in temp config roots and times the
+show-server and print-uri commands (in process, with repository caches
+cleared between runs) for the last server and replica set of each.
+
+Usage: python benchmarks/config_lookup_benchmark.py [NUM_SERVERS ...]
+"""
+__author__ = 'abdul'
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+import mongoctl.config as config
+import mongoctl.repository as repository
+import mongoctl.mongoctl_globals as mongoctl_globals
+
+from mongoctl.mongoctl import do_main
+
+###############################################################################
+DEFAULT_SIZES = [1000, 5000, 20000]
+
+RUNS = 5
+
+# command output (and mongoctl's console log handler) goes here
+DEVNULL = open(os.devnull, "w")
+
+###############################################################################
+def generate_conf_root(conf_root, num_servers):
+    servers = []
+    clusters = []
+    for i in range(num_servers):
+        servers.append({
+            "_id": "server%s" % i,
+            "address": "host%s.example.com:27017" % i,
+            "cmdOptions": {
+                "port": 27017,
+                "dbpath": "/data/db/server%s" % i,
+                "replSet": "rs%s" % (i / 3)
+            }
+        })
+
+    for i in range(0, num_servers, 3):
+        clusters.append({
+            "_id": "rs%s" % (i / 3),
+            "members": [{"server": {"$ref": "servers", "$id": "server%s" % j}}
+                        for j in range(i, min(i + 3, num_servers))]
+        })
+
+    write_json(os.path.join(conf_root, "mongoctl.config"), {
+        "fileRepository": {
+            "servers": "servers.config",
+            "clusters": "clusters.config"
+        }
+    })
+    write_json(os.path.join(conf_root, "servers.config"), servers)
+    write_json(os.path.join(conf_root, "clusters.config"), clusters)
+
+###############################################################################
+def write_json(path, value):
+    with open(path, "w") as json_file:
+        json.dump(value, json_file, indent=4)
+
+###############################################################################
+def time_command(conf_root, args):
+    """
+    Returns the best time of RUNS runs of the specified mongoctl command
+    """
+    best = None
+    stdout = sys.stdout
+    try:
+        for _ in range(RUNS):
+            config.__mongo_config__ = None
+            repository.clear_repository_cache()
+            sys.stdout = DEVNULL
+            start = time.time()
+            do_main(["--config-root", conf_root] + args)
+            elapsed = time.time() - start
+            sys.stdout = stdout
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        sys.stdout = stdout
+
+    return best
+
+###############################################################################
+def run(sizes):
+    tmp_dir = tempfile.mkdtemp(prefix="config_lookup_benchmark")
+    # keep compiled config caches out of the user's conf root
+    mongoctl_globals.DEFAULT_CONF_ROOT = tmp_dir
+    try:
+        print "%10s %20s %20s %20s" % ("servers", "show-server (s)",
+                                       "print-uri (s)", "print-uri rs (s)")
+        for size in sizes:
+            conf_root = os.path.join(tmp_dir, "conf-%s" % size)
+            os.makedirs(conf_root)
+            generate_conf_root(conf_root, size)
+            last_server = "server%s" % (size - 1)
+            last_cluster = "rs%s" % ((size - 1) / 3)
+            print "%10s %20.4f %20.4f %20.4f" % (
+                size,
+                time_command(conf_root, ["show-server", last_server]),
+                time_command(conf_root, ["print-uri", last_server]),
+                time_command(conf_root, ["print-uri", last_cluster]))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+###############################################################################
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
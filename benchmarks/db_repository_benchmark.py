@@ -0,0 +1,146 @@
+"""
+Benchmark for cluster lookups against a mongoctl database repository, with
+and without the indexes created by the ensure-indexes command.
+
+Fills a scratch database of a local mongod with 27000 server and 10000
+cluster documents (9000 replica sets and 1000 sharded clusters of 9 shards
+each), times db_lookup_cluster_by_server() and db_lookup_cluster_by_shard()
+for random servers/replica sets, creates the indexes and times them again.
+It also times listing all servers with full documents and with the summary
+projection used by list-servers. The scratch database is dropped at the end.
+
+Usage: python benchmarks/db_repository_benchmark.py [DATABASE_URI]
+"""
+__author__ = 'abdul'
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+import pymongo
+
+from bson import DBRef
+
+import mongoctl.config as config
+import mongoctl.repository as repository
+
+###############################################################################
+DEFAULT_DATABASE_URI = "mongodb://localhost:27017/mongoctl_benchmark"
+
+NUM_REPLICA_SETS = 9000
+
+SHARDS_PER_CLUSTER = 9
+
+LOOKUPS = 200
+
+LIST_RUNS = 5
+
+BATCH_SIZE = 1000
+
+###############################################################################
+def fill_repository(db):
+    servers = []
+    clusters = []
+    for i in range(NUM_REPLICA_SETS):
+        member_ids = ["server%s" % (i * 3 + j) for j in range(3)]
+        for server_id in member_ids:
+            servers.append({
+                "_id": server_id,
+                "address": "%s.example.com:27017" % server_id,
+                "cmdOptions": {"port": 27017, "replSet": "rs%s" % i}
+            })
+        clusters.append({
+            "_id": "rs%s" % i,
+            "members": [{"server": DBRef("servers", server_id)}
+                        for server_id in member_ids]
+        })
+
+    for i in range(NUM_REPLICA_SETS / SHARDS_PER_CLUSTER):
+        first_shard = i * SHARDS_PER_CLUSTER
+        clusters.append({
+            "_id": "sharded%s" % i,
+            "_type": "ShardedCluster",
+            "shards": [{"cluster": DBRef("clusters", "rs%s" % j)}
+                       for j in range(first_shard,
+                                      first_shard + SHARDS_PER_CLUSTER)]
+        })
+
+    for collection, docs in [(db.servers, servers), (db.clusters, clusters)]:
+        for i in range(0, len(docs), BATCH_SIZE):
+            collection.insert_many(docs[i:i + BATCH_SIZE])
+
+    return len(servers), len(clusters)
+
+###############################################################################
+def time_lookups(lookup_func, ids):
+    start = time.time()
+    for doc_id in ids:
+        if lookup_func(doc_id) is None:
+            raise Exception("Lookup of '%s' found nothing" % doc_id)
+    return (time.time() - start) / len(ids) * 1000
+
+###############################################################################
+def time_list_servers(summaries):
+    start = time.time()
+    for _ in range(LIST_RUNS):
+        repository.db_lookup_all_servers(summaries=summaries)
+    return (time.time() - start) / LIST_RUNS * 1000
+
+###############################################################################
+def docs_examined(db, query):
+    explain = db.clusters.find(query).limit(1).explain()
+    return explain.get("executionStats", {}).get("totalDocsExamined")
+
+###############################################################################
+def run(database_uri):
+    client = pymongo.MongoClient(database_uri)
+    db = client.get_default_database()
+    client.drop_database(db.name)
+
+    # look up straight from the database: no preload, no snapshot
+    config.__mongo_config__ = {
+        "databaseRepository": {
+            "databaseURI": database_uri,
+            "preload": False
+        }
+    }
+
+    try:
+        num_servers, num_clusters = fill_repository(db)
+        print "%s servers, %s clusters" % (num_servers, num_clusters)
+
+        server_ids = random.sample(range(num_servers), LOOKUPS)
+        servers = [repository.new_server({"_id": "server%s" % i})
+                   for i in server_ids]
+        shards = [repository.new_cluster({"_id": "rs%s" % (i / 3)})
+                  for i in server_ids]
+        # the last server: a collection scan has to go through everything
+        last_server_id = "server%s" % (num_servers - 1)
+        by_server_query = {"$or": [
+            {"%s.server.$id" % t: last_server_id} for t in
+            repository.LOOKUP_TYPE_ANY]}
+
+        print "%-12s %22s %22s %14s" % ("", "by server (ms/lookup)",
+                                        "by shard (ms/lookup)",
+                                        "docs examined")
+        for label in ["no indexes", "indexes"]:
+            if label == "indexes":
+                repository.ensure_db_repository_indexes()
+            print "%-12s %22.2f %22.2f %14s" % (
+                label,
+                time_lookups(repository.db_lookup_cluster_by_server, servers),
+                time_lookups(repository.db_lookup_cluster_by_shard, shards),
+                docs_examined(db, by_server_query))
+
+        print "list servers (ms/list): full docs %.2f, summaries %.2f" % (
+            time_list_servers(False), time_list_servers(True))
+    finally:
+        client.drop_database(db.name)
+
+###############################################################################
+if __name__ == '__main__':
+    run(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DATABASE_URI)
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark for minify_json.json_minify().
+
+Generates commented servers.config-like fixtures of 1, 10 and 50 MB in a temp
+dir and times json_minify() and json_minify() + json.loads() on each.
+
+Usage: python benchmarks/minify_json_benchmark.py [SIZE_MB ...]
+"""
+__author__ = 'abdul'
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+from mongoctl.minify_json.minify_json import json_minify
+
+###############################################################################
+DEFAULT_SIZES_MB = [1, 10, 50]
+
+SERVER_TEMPLATE = """    // server %(i)s
+    {
+        "_id": "server%(i)s", /* inline comment with "quotes" and // */
+        "address": "host%(i)s.example.com:27017",
+        "description": "http://example.com/servers/%(i)s // not a comment",
+        "cmdOptions": {
+            "port": 27017,
+            "dbpath": "/data/db/server%(i)s",
+            "replSet": "rs%(rs)s"
+        }
+    }"""
+
+###############################################################################
+def generate_fixture(path, size_mb):
+    target_size = size_mb * 1024 * 1024
+    size = 0
+    i = 0
+    with open(path, "w") as fixture:
+        fixture.write("/*\n * generated benchmark fixture\n */\n[\n")
+        while size < target_size:
+            server = SERVER_TEMPLATE % {"i": i, "rs": i / 3}
+            if i:
+                fixture.write(",\n")
+            fixture.write(server)
+            size += len(server) + 2
+            i += 1
+        fixture.write("\n]\n")
+
+    return i
+
+###############################################################################
+def time_it(func):
+    start = time.time()
+    result = func()
+    return time.time() - start, result
+
+###############################################################################
+def run(sizes_mb):
+    tmp_dir = tempfile.mkdtemp(prefix="minify_json_benchmark")
+    try:
+        print "%8s %10s %14s %14s %12s" % ("size", "servers", "minify (s)",
+                                           "+loads (s)", "MB/s")
+        for size_mb in sizes_mb:
+            path = os.path.join(tmp_dir, "servers-%sMB.config" % size_mb)
+            count = generate_fixture(path, size_mb)
+            json_str = open(path).read()
+
+            minify_time, minified = time_it(lambda: json_minify(json_str))
+            total_time, docs = time_it(
+                lambda: json.loads(json_minify(json_str)))
+
+            assert len(docs) == count
+            print "%6sMB %10s %14.3f %14.3f %12.1f" % (
+                size_mb, count, minify_time, total_time,
+                len(json_str) / 1024.0 / 1024.0 / minify_time)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+###############################################################################
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES_MB)
@@ -0,0 +1,279 @@
+__author__ = 'abdul'
+
+import os
+import time
+import atexit
+import hashlib
+import threading
+import Queue
+
+from bson import json_util, ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import repository
+
+from local_cache import get_cache_file_path, write_cache_file
+from mongoctl_logging import log_verbose, log_warning, log_exception
+
+###############################################################################
+# CONSTS
+###############################################################################
+# how long to wait for more records before writing a batch
+BATCH_LINGER = 0.5
+
+MAX_BATCH_SIZE = 500
+
+# max seconds to wait at exit for queued records to be written before
+# spooling them
+EXIT_FLUSH_TIMEOUT = 5
+
+# records that could not be written are kept in this file in the cache dir
+# and written along with the next batch. Oldest ones are dropped beyond
+# MAX_SPOOLED_RECORDS
+SPOOL_FILE_NAME = "activity-spool.jsonl"
+
+MAX_SPOOLED_RECORDS = 10000
+
+DUPLICATE_KEY_ERROR = 11000
+
+###############################################################################
+def log_activity(record, server_doc):
+    """
+    Queues the activity record to be written to the activity collection in
+     the background. The server doc is stored once per distinct content in
+     the activity server docs collection and the record refers to it by hash
+    """
+    __activity_logger__.log(record, server_doc)
+
+###############################################################################
+def get_server_doc_hash(server_doc):
+    return hashlib.md5(json_util.dumps(server_doc, sort_keys=True)).hexdigest()
+
+###############################################################################
+# ActivityLogger Class
+###############################################################################
+class ActivityLogger(object):
+    """
+    Writes activity records in batches from a background thread. Records
+     that cannot be written (e.g. db repository offline) are spooled to a
+     local file and retried with the next batch
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self):
+        self._queue = Queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._saved_doc_hashes = set()
+
+    ###########################################################################
+    def log(self, record, server_doc):
+        record = dict(record)
+        # assigned here so that retried records are not inserted twice
+        record["_id"] = ObjectId()
+        record["serverDocHash"] = get_server_doc_hash(server_doc)
+        self._queue.put({
+            "record": record,
+            "serverDoc": server_doc
+        })
+        self._ensure_started()
+
+    ###########################################################################
+    def _ensure_started(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name="activity-logger")
+                self._thread.daemon = True
+                self._thread.start()
+                atexit.register(self.close)
+
+    ###########################################################################
+    def close(self):
+        """
+        Waits up to EXIT_FLUSH_TIMEOUT for queued records to be written then
+         spools whatever is left
+        """
+        self._stopping.set()
+        self._thread.join(EXIT_FLUSH_TIMEOUT)
+        if self._thread.is_alive():
+            remaining = self._take_queued(MAX_SPOOLED_RECORDS)
+            if remaining:
+                log_warning("Timed out writing server activity. Spooling %s "
+                            "record(s)" % len(remaining))
+                self._spool(remaining)
+
+    ###########################################################################
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+
+    ###########################################################################
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except Queue.Empty:
+            return []
+
+        # give concurrent start/stops a chance to make it in the same batch
+        deadline = time.time() + BATCH_LINGER
+        while len(batch) < MAX_BATCH_SIZE and not self._stopping.is_set():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Queue.Empty:
+                break
+
+        return batch + self._take_queued(MAX_BATCH_SIZE - len(batch))
+
+    ###########################################################################
+    def _take_queued(self, max_count):
+        entries = []
+        while len(entries) < max_count:
+            try:
+                entries.append(self._queue.get_nowait())
+            except Queue.Empty:
+                break
+        return entries
+
+    ###########################################################################
+    def _flush(self, batch):
+        spooled, claimed_spool_path = self._claim_spool()
+        entries = spooled + batch
+        try:
+            if not repository.is_db_repository_online():
+                raise Exception("database repository is offline")
+            self._write(entries)
+            log_verbose("Wrote %s server activity record(s)" % len(entries))
+        except Exception, e:
+            log_exception(e)
+            log_verbose("Unable to write server activity. Spooling %s "
+                        "record(s). Cause: %s" % (len(entries), e))
+            if not self._spool(entries):
+                # keep the claimed records rather than losing them
+                if claimed_spool_path:
+                    self._unclaim_spool(claimed_spool_path)
+                return
+
+        if claimed_spool_path:
+            os.remove(claimed_spool_path)
+
+    ###########################################################################
+    def _write(self, entries):
+        doc_updates = []
+        doc_hashes = set()
+        for entry in entries:
+            doc_hash = entry["record"]["serverDocHash"]
+            if (doc_hash not in self._saved_doc_hashes and
+                    doc_hash not in doc_hashes):
+                doc_hashes.add(doc_hash)
+                doc_updates.append(UpdateOne(
+                    {"_id": doc_hash},
+                    {"$setOnInsert": {"serverDoc": entry["serverDoc"]}},
+                    upsert=True))
+
+        if doc_updates:
+            repository.get_activity_server_docs_collection().bulk_write(
+                doc_updates, ordered=False)
+            self._saved_doc_hashes.update(doc_hashes)
+
+        try:
+            repository.get_activity_collection().insert_many(
+                [entry["record"] for entry in entries], ordered=False)
+        except BulkWriteError, e:
+            # records of a previous partially written batch are already there
+            errors = e.details.get("writeErrors") or []
+            if any(error.get("code") != DUPLICATE_KEY_ERROR
+                   for error in errors):
+                raise
+
+    ###########################################################################
+    def _claim_spool(self):
+        """
+        Takes over the spool file (so that it is not drained by another
+         mongoctl process too) and returns (its entries, claimed path)
+        """
+        with self._spool_lock:
+            spool_path = get_cache_file_path(SPOOL_FILE_NAME)
+            claimed_path = "%s.%s.draining" % (spool_path, os.getpid())
+            try:
+                os.rename(spool_path, claimed_path)
+            except OSError:
+                # no spool file
+                return [], None
+
+            return _read_spool_file(claimed_path), claimed_path
+
+    ###########################################################################
+    def _unclaim_spool(self, claimed_path):
+        """
+        Puts a claimed spool file back unless a new spool file was created
+         meanwhile, in which case it is left in place
+        """
+        with self._spool_lock:
+            spool_path = get_cache_file_path(SPOOL_FILE_NAME)
+            if os.path.exists(spool_path):
+                log_warning("Unable to restore server activity spool. "
+                            "Records left in '%s'" % claimed_path)
+                return
+            try:
+                os.rename(claimed_path, spool_path)
+            except OSError, e:
+                log_warning("Unable to restore server activity spool. "
+                            "Records left in '%s'. Cause: %s" %
+                            (claimed_path, e))
+
+    ###########################################################################
+    def _spool(self, entries):
+        """
+        Adds entries to the spool file. Returns whether they were spooled
+        """
+        with self._spool_lock:
+            try:
+                spool_path = get_cache_file_path(SPOOL_FILE_NAME)
+                lines = []
+                if os.path.exists(spool_path):
+                    with open(spool_path) as spool_file:
+                        lines = spool_file.read().splitlines()
+                lines.extend(json_util.dumps(entry) for entry in entries)
+
+                dropped = len(lines) - MAX_SPOOLED_RECORDS
+                if dropped > 0:
+                    log_warning("Server activity spool is full. Dropping %s "
+                                "oldest record(s)" % dropped)
+                    lines = lines[dropped:]
+
+                write_cache_file(SPOOL_FILE_NAME, "\n".join(lines) + "\n")
+                return True
+            except Exception, e:
+                log_exception(e)
+                log_warning("Unable to spool %s server activity record(s). "
+                            "Cause: %s" % (len(entries), e))
+                return False
+
+###############################################################################
+def _read_spool_file(spool_path):
+    entries = []
+    with open(spool_path) as spool_file:
+        for line in spool_file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json_util.loads(line))
+            except Exception, e:
+                log_verbose("Skipping bad spooled activity record: %s" % e)
+
+    return entries
+
+###############################################################################
+__activity_logger__ = ActivityLogger()
@@ -0,0 +1,254 @@
+__author__ = 'abdul'
+
+import threading
+
+import mongoctl.repository as repository
+
+from mongoctl.mongoctl_logging import (
+    log_info, log_warning, log_error, log_exception
+)
+from mongoctl.errors import MongoctlException
+from mongoctl.utils import parallel_map, now, wait_for
+
+from mongoctl.objects.replicaset_cluster import ReplicaSetCluster
+from mongoctl.objects.server import assume_local_server
+
+from mongoctl.commands.server.start import do_start_server
+from mongoctl.commands.server.stop import do_stop_server, step_server_down
+from mongoctl.commands.cluster.start import validate_cluster_local_op
+
+###############################################################################
+# CONSTS
+###############################################################################
+# default max repl lag (in seconds) a restarted member may have before moving
+# on to the next one
+DEFAULT_MAX_REPL_LAG = 10
+
+# max time to wait for a restarted member to become healthy
+MEMBER_HEALTHY_TIMEOUT = 30 * 60
+
+# max time to wait for a new primary to be elected after step down
+NEW_PRIMARY_TIMEOUT = 60
+
+# seconds between health checks
+HEALTH_POLL_INTERVAL = 0.5
+
+###############################################################################
+# rolling-restart command
+###############################################################################
+def rolling_restart_command(parsed_options):
+    cluster = repository.lookup_and_validate_cluster(parsed_options.cluster)
+    if not isinstance(cluster, ReplicaSetCluster):
+        raise MongoctlException("Cluster '%s' is not a replicaset cluster" %
+                                cluster.id)
+
+    if parsed_options.assumeLocal:
+        assume_local_server(cluster.id)
+
+    rolling_restart_cluster(
+        cluster,
+        max_concurrent=_parse_int_option(parsed_options.maxConcurrent,
+                                         "--max-concurrent", 1),
+        max_repl_lag=_parse_int_option(parsed_options.maxReplLag,
+                                       "--max-lag", DEFAULT_MAX_REPL_LAG,
+                                       min_value=0),
+        force=parsed_options.forceStop)
+
+###############################################################################
+def _parse_int_option(value, option_name, default, min_value=1):
+    if value is None:
+        return default
+    try:
+        int_value = int(value)
+    except ValueError:
+        int_value = None
+    if int_value is None or int_value < min_value:
+        raise MongoctlException("Invalid %s value '%s'. Must be a number "
+                                "greater than or equal to %s." %
+                                (option_name, value, min_value))
+    return int_value
+
+###############################################################################
+def get_max_safe_concurrent(cluster):
+    """
+    Returns how many voting members can be down at once while the others
+     still make up a voting majority (at least 1)
+    """
+    votes = sum(member.get_votes() for member in cluster.get_members())
+    return max(1, votes - (votes / 2 + 1))
+
+###############################################################################
+def rolling_restart_cluster(cluster, max_concurrent=1,
+                            max_repl_lag=DEFAULT_MAX_REPL_LAG, force=False):
+    """
+    Restarts all members of the replica set without taking it down:
+     secondaries first (max_concurrent at a time), each one gated on coming
+     back as SECONDARY with a repl lag under max_repl_lag, then the primary
+     after stepping it down.
+    """
+    validate_cluster_local_op(cluster, [("members", [cluster])], "restart")
+
+    primary_server = cluster.get_primary_server()
+    if not primary_server:
+        raise MongoctlException("Unable to determine primary member for"
+                                " cluster '%s'" % cluster.id)
+
+    max_safe_concurrent = get_max_safe_concurrent(cluster)
+    if max_concurrent > max_safe_concurrent:
+        log_warning("Restarting %s members of cluster '%s' at a time would "
+                    "take down a voting majority and make the primary step "
+                    "down. Restarting %s at a time instead." %
+                    (max_concurrent, cluster.id, max_safe_concurrent))
+        max_concurrent = max_safe_concurrent
+
+    others = [s for s in cluster.get_servers() if s.id != primary_server.id]
+    report = DowntimeReport()
+    log_info("Rolling restart of cluster '%s': restarting %s secondaries, "
+             "%s at a time, then primary '%s'" %
+             (cluster.id, len(others), max_concurrent, primary_server.id))
+
+    try:
+        for i in range(0, len(others), max_concurrent):
+            batch = others[i:i + max_concurrent]
+
+            def restart_batch_member(server):
+                restart_member(cluster, server, max_repl_lag, report,
+                               primary_server=primary_server, force=force)
+
+            parallel_map(restart_batch_member, batch,
+                         parallelism=max_concurrent)
+
+        # step down the primary and wait for another member to take over
+        if not step_server_down(primary_server, force=force):
+            raise MongoctlException("Unable to step down primary '%s'" %
+                                    primary_server.id)
+
+        log_info("Waiting for a new primary to be elected...")
+        if not wait_for(new_primary_predicate(cluster, primary_server),
+                        timeout=NEW_PRIMARY_TIMEOUT,
+                        sleep_duration=HEALTH_POLL_INTERVAL):
+            raise MongoctlException("Timed out waiting for a new primary for "
+                                    "cluster '%s'" % cluster.id)
+
+        restart_member(cluster, primary_server, max_repl_lag, report,
+                       force=force)
+    finally:
+        report.log_report(cluster)
+
+    log_info("Rolling restart of cluster '%s' completed successfully!" %
+             cluster.id)
+
+###############################################################################
+def restart_member(cluster, server, max_repl_lag, report,
+                   primary_server=None, force=False):
+    log_info("Restarting member '%s'..." % server.id)
+    down_time = now()
+    try:
+        if server.is_online():
+            do_stop_server(server, force=force)
+        else:
+            log_info("Server '%s' is not running." % server.id)
+
+        do_start_server(server, tail_log=False)
+        up_time = now()
+
+        log_info("Waiting for member '%s' to become healthy (repl lag <= "
+                 "%s seconds)..." % (server.id, max_repl_lag))
+        healthy = wait_for(member_healthy_predicate(cluster, server,
+                                                    max_repl_lag,
+                                                    primary_server),
+                           timeout=MEMBER_HEALTHY_TIMEOUT,
+                           sleep_duration=HEALTH_POLL_INTERVAL)
+    except Exception, e:
+        log_exception(e)
+        report.add(server, down_time, None, None)
+        raise
+
+    report.add(server, down_time, up_time, now() if healthy else None)
+    if not healthy:
+        raise MongoctlException("Timed out waiting for member '%s' to become "
+                                "healthy. Aborting rolling restart." %
+                                server.id)
+
+    log_info("Member '%s' is healthy." % server.id)
+
+###############################################################################
+def member_healthy_predicate(cluster, server, max_repl_lag,
+                             primary_server=None):
+    member = cluster.get_member_for(server)
+
+    def is_healthy():
+        master_result = server.is_master_command()
+        if not master_result:
+            return False
+        if master_result.get("arbiterOnly"):
+            return True
+        if not (master_result.get("secondary") or
+                    master_result.get("ismaster")):
+            return False
+
+        try:
+            lag_matrix = cluster.get_repl_lag_matrix(
+                primary_server=primary_server)
+            return cluster.get_member_lag(member, lag_matrix) <= max_repl_lag
+        except Exception, e:
+            log_exception(e)
+            return False
+
+    return is_healthy
+
+###############################################################################
+def new_primary_predicate(cluster, old_primary_server):
+    def has_new_primary():
+        primary_server = cluster.get_primary_server()
+        return (primary_server is not None and
+                primary_server.id != old_primary_server.id)
+
+    return has_new_primary
+
+###############################################################################
+# DowntimeReport Class
+###############################################################################
+class DowntimeReport(object):
+    """
+    Records when each member went down, came back up (process started) and
+     became healthy again
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self):
+        self._start_time = now()
+        self._entries = []
+        self._lock = threading.Lock()
+
+    ###########################################################################
+    def add(self, server, down_time, up_time, healthy_time):
+        with self._lock:
+            self._entries.append({
+                "server": server.id,
+                "down": down_time,
+                "up": up_time,
+                "healthy": healthy_time
+            })
+
+    ###########################################################################
+    def log_report(self, cluster):
+        with self._lock:
+            entries = sorted(self._entries, key=lambda e: e["down"])
+
+        log_info("\nRolling restart downtime for cluster '%s' (seconds):" %
+                 cluster.id)
+        for entry in entries:
+            if entry["healthy"] is not None:
+                log_info("  %-30s downtime %7.1f  (stop/start %.1f, "
+                         "catch up %.1f)" %
+                         (entry["server"],
+                          entry["healthy"] - entry["down"],
+                          entry["up"] - entry["down"],
+                          entry["healthy"] - entry["up"]))
+            else:
+                log_error("  %-30s FAILED after %.1f" %
+                          (entry["server"], now() - entry["down"]))
+        log_info("Total elapsed: %.1f seconds\n" % (now() - self._start_time))
@@ -0,0 +1,242 @@
+__author__ = 'abdul'
+
+import mongoctl.repository as repository
+
+from mongoctl import mongo_utils
+from mongoctl.mongoctl_logging import (
+    log_info, log_verbose, log_warning, log_exception
+)
+from mongoctl.errors import MongoctlException
+from mongoctl.prompt import prompt_execute_task
+from mongoctl.utils import parallel_map, now, time_string, wait_for_all
+
+from mongoctl.objects.cluster import Cluster
+from mongoctl.objects.replicaset_cluster import ReplicaSetCluster
+from mongoctl.objects.sharded_cluster import ShardedCluster
+from mongoctl.objects.mongod import MongodServer
+from mongoctl.objects.server import (
+    is_assumed_local_server, assume_local_server
+)
+
+from mongoctl.commands.server.start import (
+    START_CONN_TIMEOUT_MS, MEMBER_JOIN_TIMEOUT, is_server_already_running,
+    _pre_server_start, start_server_process, maybe_config_server_repl_set,
+    prepare_mongod_server, dry_run_start_server_cmd, wait_for_rs_config_load,
+    SUPPORTED_MONGOD_OPTIONS, SUPPORTED_MONGOS_OPTIONS
+)
+from mongoctl.commands.command_utils import extract_mongo_exe_options
+
+###############################################################################
+# start cluster command
+###############################################################################
+def start_cluster_command(parsed_options):
+    cluster = repository.lookup_and_validate_cluster(parsed_options.server)
+    validate_cluster_start_options(cluster, parsed_options)
+
+    if parsed_options.dryRun:
+        dry_run_start_cluster(cluster)
+    else:
+        start_cluster(cluster,
+                      rs_add=parsed_options.rsAdd or parsed_options.rsAddNoInit,
+                      no_init=parsed_options.rsAddNoInit)
+
+###############################################################################
+def validate_cluster_start_options(cluster, parsed_options):
+    """
+    Rejects the start options that only apply to a single server
+    """
+    server_options = set(extract_mongo_exe_options(
+        parsed_options, SUPPORTED_MONGOD_OPTIONS + SUPPORTED_MONGOS_OPTIONS))
+    if parsed_options.standalone:
+        server_options.add("standalone")
+
+    if server_options:
+        raise MongoctlException("Cannot start cluster '%s' with server "
+                                "options: %s. Start its servers one by one "
+                                "instead." %
+                                (cluster.id, ", ".join(sorted(server_options))))
+
+###############################################################################
+def dry_run_start_cluster(cluster):
+    for tier_name, units in get_cluster_start_tiers(cluster):
+        log_info("\n---- %s of cluster '%s' ----" % (tier_name, cluster.id))
+        for server in get_units_servers(units):
+            dry_run_start_server_cmd(server)
+
+###############################################################################
+def start_cluster(cluster, rs_add=False, no_init=False):
+    """
+    Starts all servers of the cluster tier by tier (config servers, then
+     shards, then mongos for sharded clusters). All servers within a tier are
+     started concurrently. Replica sets are then initialized once per set
+     (unless no_init) and shards are added once all mongos are up.
+    """
+    tiers = get_cluster_start_tiers(cluster)
+    validate_cluster_local_op(cluster, tiers, "start")
+
+    start_time = now()
+    auth_stats = mongo_utils.get_client_auth_stats()
+    for tier_name, units in tiers:
+        tier_start_time = now()
+        servers = get_units_servers(units)
+        log_info("Starting %s of cluster '%s': %s" %
+                 (tier_name, cluster.id, ", ".join(s.id for s in servers)))
+
+        parallel_map(start_cluster_server, servers)
+
+        # configure replica sets once all their members are up
+        for unit in units:
+            if isinstance(unit, ReplicaSetCluster):
+                setup_started_replicaset(unit, rs_add=rs_add,
+                                         no_init=no_init)
+
+        for server in servers:
+            prepare_cluster_server(server)
+
+        log_info("Started %s of cluster '%s' in %s" %
+                 (tier_name, cluster.id,
+                  time_string(now() - tier_start_time)))
+
+    if isinstance(cluster, ShardedCluster):
+        prompt_execute_task("Do you want to add any missing shards to "
+                            "sharded cluster '%s'?" % cluster.id,
+                            cluster.configure_sharded_cluster)
+
+    log_info("Cluster '%s' started successfully in %s" %
+             (cluster.id, time_string(now() - start_time)))
+
+    end_auth_stats = mongo_utils.get_client_auth_stats()
+    log_verbose("Auth round trips while starting cluster '%s': %s, saved by "
+                "the auth state cache: %s" %
+                (cluster.id,
+                 end_auth_stats["performed"] - auth_stats["performed"],
+                 end_auth_stats["saved"] - auth_stats["saved"]))
+
+###############################################################################
+def get_cluster_start_tiers(cluster):
+    """
+    Returns the list of (tier name, units) to start in order. A unit is either
+     a server or a replica set cluster. Units in the same tier do not depend
+     on each other.
+    """
+    if isinstance(cluster, ShardedCluster):
+        return [
+            ("config servers", _get_shard_members_units(cluster.config_members)),
+            ("shards", _get_shard_members_units(cluster.shards)),
+            ("mongos", cluster.get_servers())
+        ]
+    else:
+        return [("members", [cluster])]
+
+###############################################################################
+def _get_shard_members_units(shard_members):
+    units = []
+    for shard_member in shard_members:
+        shard = shard_member.get_shard()
+        if shard is None:
+            raise MongoctlException("Invalid shard/config member: %s" %
+                                    shard_member)
+        units.append(shard)
+
+    return units
+
+###############################################################################
+def get_units_servers(units):
+    servers = []
+    for unit in units:
+        if isinstance(unit, Cluster):
+            servers.extend(unit.get_servers())
+        else:
+            servers.append(unit)
+
+    return servers
+
+###############################################################################
+def validate_cluster_local_op(cluster, tiers, op):
+    # --assume-local with a cluster id applies to all its servers
+    assume_local = is_assumed_local_server(cluster.id)
+
+    for server in get_units_servers(get_units_of_tiers(tiers)):
+        if assume_local:
+            assume_local_server(server.id)
+        server.validate_local_op(op)
+        if op in ["start", "restart"] and not server.is_fork():
+            raise MongoctlException("Cannot %s cluster '%s': server '%s' "
+                                    "is not configured to fork. All servers "
+                                    "must fork to be started together." %
+                                    (op, cluster.id, server.id))
+
+###############################################################################
+def get_units_of_tiers(tiers):
+    units = []
+    for tier_name, tier_units in tiers:
+        units.extend(tier_units)
+
+    return units
+
+###############################################################################
+def start_cluster_server(server):
+    server.connection_timeout_ms = START_CONN_TIMEOUT_MS
+
+    if is_server_already_running(server):
+        return
+
+    _pre_server_start(server)
+    server.log_server_activity("start")
+    start_server_process(server, tail_log=False)
+
+###############################################################################
+def setup_started_replicaset(cluster, rs_add=False, no_init=False):
+    if not cluster.is_replicaset_initialized():
+        log_info("Replica set cluster '%s' has not been initialized yet." %
+                 cluster.id)
+        if no_init:
+            log_warning("Replicaset is not initialized and you specified "
+                        "--rs-add-noinit. Not initializing replica set "
+                        "cluster '%s'..." % cluster.id)
+        elif rs_add:
+            cluster.initialize_replicaset()
+        else:
+            prompt_execute_task("Do you want to initialize replica set "
+                                "cluster '%s'?" % cluster.id,
+                                cluster.initialize_replicaset)
+    else:
+        unconfigured = [server for server in cluster.get_servers()
+                        if not cluster.is_member_configured_for(server)]
+        if unconfigured:
+            wait_for_rs_config_load(unconfigured)
+
+        # wait for all members still joining the replica set at once rather
+        # than one after the other
+        joining = [server for server in unconfigured
+                   if server.has_joined_replica()]
+        if joining:
+            log_info("Waiting for %s to finish joining replica set '%s'..." %
+                     (", ".join(s.id for s in joining), cluster.id))
+            wait_for_all([member_configured_predicate(cluster, server)
+                          for server in joining],
+                         timeout=MEMBER_JOIN_TIMEOUT)
+
+        for server in cluster.get_servers():
+            maybe_config_server_repl_set(server, rs_add=rs_add,
+                                         no_init=no_init)
+
+###############################################################################
+def member_configured_predicate(cluster, server):
+    def is_member_configured():
+        return cluster.is_member_configured_for(server)
+
+    return is_member_configured
+
+###############################################################################
+def prepare_cluster_server(server):
+    if not isinstance(server, MongodServer):
+        return
+
+    try:
+        prepare_mongod_server(server)
+        server.set_runtime_parameters()
+    except Exception, e:
+        log_exception(e)
+        raise MongoctlException("Unable to fully prepare server '%s'. "
+                                "Cause: %s" % (server.id, e))
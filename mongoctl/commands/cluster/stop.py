@@ -0,0 +1,173 @@
+__author__ = 'abdul'
+
+import threading
+
+import mongoctl.repository as repository
+
+from mongoctl.mongoctl_logging import log_info, log_error, log_exception
+from mongoctl.errors import MongoctlException
+from mongoctl.utils import parallel_map, now, time_string
+
+from mongoctl.objects.cluster import Cluster
+from mongoctl.objects.replicaset_cluster import ReplicaSetCluster
+from mongoctl.objects.sharded_cluster import ShardedCluster
+
+from mongoctl.commands.server.stop import do_stop_server
+from mongoctl.commands.cluster.start import (
+    get_units_servers, validate_cluster_local_op
+)
+
+###############################################################################
+# stop cluster command
+###############################################################################
+def stop_cluster_command(parsed_options):
+    cluster = repository.lookup_and_validate_cluster(parsed_options.server)
+    stop_cluster(cluster, force=parsed_options.forceStop)
+
+###############################################################################
+def stop_cluster(cluster, force=False):
+    """
+    Stops all servers of the cluster tier by tier: mongos first, then
+     replica set secondaries, then primaries and finally config servers.
+     All servers within a tier are stopped concurrently. Stops after a tier
+     in which some server failed to stop.
+    """
+    tiers = get_cluster_stop_tiers(cluster)
+    validate_cluster_local_op(cluster, tiers, "stop")
+
+    timeline = StopTimeline()
+    try:
+        for tier_name, servers in tiers:
+            if not servers:
+                continue
+            log_info("Stopping %s of cluster '%s': %s" %
+                     (tier_name, cluster.id,
+                      ", ".join(s.id for s in servers)))
+
+            def stop_tier_server(server):
+                return stop_cluster_server(server, tier_name, timeline,
+                                           force=force)
+
+            results = parallel_map(stop_tier_server, servers)
+            failed = [s.id for s, ok in zip(servers, results) if not ok]
+            if failed:
+                raise MongoctlException("Unable to stop %s %s of cluster "
+                                        "'%s'. Not stopping the rest of the "
+                                        "cluster." %
+                                        (tier_name, ", ".join(failed),
+                                         cluster.id))
+    finally:
+        timeline.log_report(cluster)
+
+    log_info("Cluster '%s' stopped successfully in %s" %
+             (cluster.id, time_string(timeline.get_elapsed())))
+
+###############################################################################
+def get_cluster_stop_tiers(cluster):
+    """
+    Returns the list of (tier name, servers) to stop in order
+    """
+    if isinstance(cluster, ShardedCluster):
+        mongos_servers = cluster.get_servers()
+        shards = [m.get_shard() for m in cluster.shards]
+        config_servers = get_units_servers(
+            [m.get_shard() for m in cluster.config_members])
+    else:
+        mongos_servers = []
+        shards = [cluster]
+        config_servers = []
+
+    secondaries, primaries = _split_secondaries_and_primaries(shards)
+
+    return [
+        ("mongos", mongos_servers),
+        ("secondaries", secondaries),
+        ("primaries", primaries),
+        ("config servers", config_servers)
+    ]
+
+###############################################################################
+def _split_secondaries_and_primaries(shards):
+    """
+    Splits the servers of the specified shards (replica sets or servers) into
+     non primary and primary servers. Standalone shards count as primaries.
+    """
+    secondaries = []
+    primaries = []
+
+    def get_primary(shard):
+        if isinstance(shard, ReplicaSetCluster):
+            return shard.get_primary_server()
+
+    shard_primaries = parallel_map(get_primary, shards)
+
+    for shard, primary in zip(shards, shard_primaries):
+        if isinstance(shard, Cluster):
+            for server in shard.get_servers():
+                if primary is not None and server.id == primary.id:
+                    primaries.append(server)
+                else:
+                    secondaries.append(server)
+        elif shard is not None:
+            primaries.append(shard)
+
+    return secondaries, primaries
+
+###############################################################################
+def stop_cluster_server(server, tier_name, timeline, force=False):
+    start_time = now()
+    try:
+        do_stop_server(server, force=force)
+        ok = True
+    except Exception, e:
+        log_exception(e)
+        log_error("Failed to stop server '%s'. Cause: %s" % (server.id, e))
+        ok = False
+
+    timeline.add(server, tier_name, start_time, now(), ok)
+    return ok
+
+###############################################################################
+# StopTimeline Class
+###############################################################################
+class StopTimeline(object):
+    """
+    Records when each server of a cluster started/finished stopping
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self):
+        self._start_time = now()
+        self._entries = []
+        self._lock = threading.Lock()
+
+    ###########################################################################
+    def add(self, server, tier_name, start_time, end_time, ok):
+        with self._lock:
+            self._entries.append({
+                "server": server.id,
+                "tier": tier_name,
+                "start": start_time - self._start_time,
+                "end": end_time - self._start_time,
+                "ok": ok
+            })
+
+    ###########################################################################
+    def get_elapsed(self):
+        return now() - self._start_time
+
+    ###########################################################################
+    def log_report(self, cluster):
+        with self._lock:
+            entries = sorted(self._entries, key=lambda e: e["start"])
+
+        log_info("\nStop timeline for cluster '%s' (seconds since start):" %
+                 cluster.id)
+        for entry in entries:
+            log_info("  %-16s %-30s %7.1f -> %7.1f  (%.1f)  %s" %
+                     (entry["tier"], entry["server"], entry["start"],
+                      entry["end"], entry["end"] - entry["start"],
+                      "stopped" if entry["ok"] else "FAILED"))
+        log_info("Total elapsed: %.1f seconds\n" % self.get_elapsed())
@@ -0,0 +1,25 @@
+__author__ = 'abdul'
+
+import mongoctl.repository as repository
+
+from mongoctl.mongoctl_logging import log_info
+from mongoctl.errors import MongoctlException
+
+###############################################################################
+# ensure-indexes command
+###############################################################################
+def ensure_indexes_command(parsed_options):
+    if not repository.has_db_repository():
+        raise MongoctlException("No databaseRepository configured in "
+                                "mongoctl.config")
+
+    if not repository.is_db_repository_online():
+        raise MongoctlException("Unable to connect to the database "
+                                "repository")
+
+    for collection_name, index_name in \
+            repository.ensure_db_repository_indexes():
+        log_info("Index '%s' on collection '%s' is in place" %
+                 (index_name, collection_name))
+
+    log_info("All database repository indexes are in place.")
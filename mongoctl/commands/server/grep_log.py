@@ -0,0 +1,52 @@
+__author__ = 'abdul'
+
+import os
+import sys
+
+from mongoctl.mongoctl_logging import *
+from mongoctl.objects.server import assume_local_server
+from mongoctl.server_log import (
+    iter_log_entries, merge_log_entries, parse_time_arg
+)
+from mongoctl.commands.server.tail_log import (
+    get_tail_log_servers, get_log_line_filter
+)
+
+###############################################################################
+# grep log command
+###############################################################################
+def grep_log_command(parsed_options):
+    since = _parse_time_option(parsed_options.since)
+    until = _parse_time_option(parsed_options.until)
+    line_filter = get_log_line_filter(parsed_options)
+
+    servers = get_tail_log_servers(parsed_options)
+    log_paths = []
+    for server in servers:
+        if parsed_options.assumeLocal:
+            assume_local_server(server.id)
+        if not server.is_use_local():
+            log_warning("Skipping server '%s' since it is not running on "
+                        "local host" % server.id)
+            continue
+        log_path = server.get_log_file_path()
+        if os.path.exists(log_path):
+            log_paths.append((server, log_path))
+        else:
+            log_info("Log file '%s' does not exist." % log_path)
+
+    # prefix lines with their server id when grepping several servers
+    prefixes = [("[%s] " % server.id if len(servers) > 1 else "")
+                for server, log_path in log_paths]
+    entry_streams = [iter_log_entries(log_path, since=since, until=until,
+                                      line_filter=line_filter)
+                     for server, log_path in log_paths]
+
+    for index, timestamp, lines in merge_log_entries(entry_streams):
+        for line in lines:
+            sys.stdout.write("%s%s\n" % (prefixes[index], line))
+
+###############################################################################
+def _parse_time_option(value):
+    if value is not None:
+        return parse_time_arg(value)
@@ -7,7 +7,7 @@ from mongoctl.utils import to_string
 # list servers command
 ###############################################################################
 def list_servers_command(parsed_options):
-    servers = repository.lookup_all_servers()
+    servers = repository.lookup_all_servers(summaries=True)
     if not servers or len(servers) < 1:
         log_info("No servers have been configured.")
         return
@@ -1,6 +1,5 @@
 __author__ = 'abdul'
 
-import time
 import stat
 import subprocess
 import re
@@ -22,10 +21,10 @@ from mongoctl.processes import(
     )
 from mongoctl.prompt import prompt_execute_task
 from mongoctl.utils import (
-    ensure_dir, which, wait_for, dir_exists, is_pid_alive,
+    ensure_dir, which, wait_for, wait_for_all, dir_exists, is_pid_alive,
     validate_openssl
 )
-from tail_log import tail_server_log, stop_tailing
+from mongoctl.server_log import StartupLogMonitor
 from mongoctl.commands.command_utils import (
     get_mongo_executable, VersionPreference
     )
@@ -56,12 +55,25 @@ START_CONN_TIMEOUT_MS = 10 * 60 * 1000
 # Max time to wait for server to be online (i.e running and accepting connection) after start
 SERVER_ONLINE_TIMEOUT = 20 * 60
 
+# Max time to wait for a server to finish joining its replica set
+MEMBER_JOIN_TIMEOUT = 10 * 60
+
+# Max time to wait for a started server to load its replica set config
+RS_CONFIG_LOAD_TIMEOUT = 2
+
 ###############################################################################
 # start command
 ###############################################################################
 
 def start_command(parsed_options):
     server_id = parsed_options.server
+
+    # start all servers of a cluster if a cluster id was passed
+    if (repository.lookup_server(server_id) is None and
+            repository.lookup_cluster(server_id) is not None):
+        from mongoctl.commands.cluster.start import start_cluster_command
+        return start_cluster_command(parsed_options)
+
     server = repository.lookup_and_validate_server(server_id)
     options_override = extract_server_options(server, parsed_options)
     # apply overrides to server's cmd options (in memory only)
@@ -123,21 +135,50 @@ __mongod_pid__ = None
 __current_server__ = None
 
 ###############################################################################
-def do_start_server(server, options_override=None, rs_add=False, no_init=False, standalone=False):
+def do_start_server(server, options_override=None, rs_add=False, no_init=False, standalone=False,
+                    tail_log=True):
     # ensure that the start was issued locally. Fail otherwise
     server.validate_local_op("start")
 
+    if is_server_already_running(server):
+        # always call post server start if the server is already started
+        # the post server start steps should be idempotent
+        _post_server_start(server, server.get_pid(), rs_add=rs_add, no_init=no_init,
+                           standalone=standalone)
+        return
+
+    # do necessary work before starting the mongod process
+    _pre_server_start(server, options_override=options_override)
+
+    server.log_server_activity("start")
+
+    server_pid = start_server_process(server, options_override, standalone=standalone,
+                                      tail_log=tail_log)
+
+    _post_server_start(server, server_pid, rs_add=rs_add, no_init=no_init)
+
+    # Note: The following block has to be the last block
+    # because server_process.communicate() will not return unless you
+    # interrupt the server process which will kill mongoctl, so nothing after
+    # this block will be executed. Almost never...
+
+    if not server.is_fork():
+        communicate_to_child_process(server_pid)
+
+###############################################################################
+def is_server_already_running(server):
+    """
+    Returns True if the server is already running. Raises an exception if the
+     server cannot be started because something is in the way (e.g. another
+     process running on the same port)
+    """
     log_info("Checking to see if server '%s' is already running"
              " before starting it..." % server.id)
     status = server.get_status()
     if status['connection']:
         log_info("Server '%s' is already running." %
                  server.id)
-        # always call post server start if the server is already started
-        # the post server start steps should be idempotent
-        _post_server_start(server, server.get_pid(), rs_add=rs_add, no_init=no_init,
-                           standalone=standalone)
-        return
+        return True
     elif "timedOut" in status:
         raise MongoctlException("Unable to start server: Server '%s' seems to"
                                 " be already started but is"
@@ -160,22 +201,7 @@ def do_start_server(server, options_override=None, rs_add=False, no_init=False,
             "currently running with SSL (SSL handshake failed). "
             "Try running mongoctl with --ssl-off." % server.id)
 
-    # do necessary work before starting the mongod process
-    _pre_server_start(server, options_override=options_override)
-
-    server.log_server_activity("start")
-
-    server_pid = start_server_process(server, options_override, standalone=standalone)
-
-    _post_server_start(server, server_pid, rs_add=rs_add, no_init=no_init)
-
-    # Note: The following block has to be the last block
-    # because server_process.communicate() will not return unless you
-    # interrupt the server process which will kill mongoctl, so nothing after
-    # this block will be executed. Almost never...
-
-    if not server.is_fork():
-        communicate_to_child_process(server_pid)
+    return False
 
 ###############################################################################
 def _pre_server_start(server, options_override=None):
@@ -230,11 +256,11 @@ def _post_server_start(server, server_pid, **kwargs):
 def _post_mongod_server_start(server, server_pid, **kwargs):
     try:
 
-        # sleep for a couple of seconds for the server to catch
-        time.sleep(2)
-
         # skip repl init if running in standalone mode
         if not kwargs.get("standalone"):
+            if server.get_replicaset_cluster() is not None:
+                wait_for_rs_config_load([server])
+
             maybe_config_server_repl_set(server, rs_add=kwargs.get("rs_add"),
                                          no_init=kwargs.get("no_init"))
 
@@ -279,6 +305,15 @@ def shall_we_terminate(mongod_pid):
     (condemned, _) = prompt_execute_task("Kill server now?", killit)
     return condemned
 
+###############################################################################
+def wait_for_rs_config_load(servers):
+    """
+    Gives started servers a couple of seconds to load their replica set config
+     (if they have one) so that they are not taken for new members
+    """
+    wait_for_all([server.has_joined_replica for server in servers],
+                 timeout=RS_CONFIG_LOAD_TIMEOUT, sleep_duration=0.5)
+
 ###############################################################################
 def maybe_config_server_repl_set(server, rs_add=False, no_init=False):
     # if the server belongs to a replica set cluster,
@@ -316,7 +351,9 @@ def maybe_config_server_repl_set(server, rs_add=False, no_init=False):
                 if server.has_joined_replica():
                     ## wait for server to finish joining replica
                     log_info("Waiting for server to finish joining replica set...")
-                    wait_for(lambda: cluster.is_member_configured_for(server), timeout=10*60)
+                    wait_for(lambda: cluster.is_member_configured_for(server),
+                             timeout=MEMBER_JOIN_TIMEOUT,
+                             name="server '%s' to join" % server.id)
 
                 elif rs_add:
                     cluster.add_member_to_replica(server)
@@ -411,35 +448,47 @@ def get_forked_mongod_pid(parent_mongod):
 
 
 ###############################################################################
-def start_server_process(server, options_override=None, standalone=False):
+def start_server_process(server, options_override=None, standalone=False,
+                         tail_log=True):
 
     set_server_executable_env_vars(server)
-    mongod_pid = _start_server_process_4real(server, options_override=options_override,
-                                             standalone=standalone)
 
-    log_info("Will now wait for server '%s' to start up."
-             " Enjoy mongod's log for now!" %
-             server.id)
-    log_info("\n****************************************************************"
-             "***************")
-    log_info("* START: tail of log file at '%s'" % server.get_log_file_path())
-    log_info("******************************************************************"
-             "*************\n")
-
-    log_tailer = tail_server_log(server)
-    # wait until the server starts
+    # follow the log from before the server starts so that its readiness (or
+    # a startup error) is noticed as soon as it is logged
+    log_monitor = start_log_monitor(server, echo=tail_log)
     try:
-        is_online = wait_for(server_started_predicate(server, mongod_pid),
-                             timeout=SERVER_ONLINE_TIMEOUT)
+        mongod_pid = _start_server_process_4real(
+            server, options_override=options_override, standalone=standalone)
+
+        if tail_log:
+            log_info("Will now wait for server '%s' to start up."
+                     " Enjoy mongod's log for now!" %
+                     server.id)
+            log_info("\n********************************************************"
+                     "***********************")
+            log_info("* START: tail of log file at '%s'" %
+                     server.get_log_file_path())
+            log_info("**********************************************************"
+                     "*********************\n")
+        else:
+            log_info("Will now wait for server '%s' to start up." % server.id)
+
+        # wait until the server starts
+        is_online = wait_for(
+            server_started_predicate(server, mongod_pid, log_monitor),
+            timeout=SERVER_ONLINE_TIMEOUT,
+            wake_event=log_monitor.event if log_monitor else None,
+            name="server '%s' to start" % server.id)
     finally:
-        # stop tailing
-        stop_tailing(log_tailer)
+        if log_monitor:
+            log_monitor.stop()
 
-    log_info("\n****************************************************************"
-             "***************")
-    log_info("* END: tail of log file at '%s'" % server.get_log_file_path())
-    log_info("******************************************************************"
-             "*************\n")
+    if tail_log:
+        log_info("\n************************************************************"
+                 "*******************")
+        log_info("* END: tail of log file at '%s'" % server.get_log_file_path())
+        log_info("**************************************************************"
+                 "*****************\n")
 
     if not is_online:
         raise MongoctlException("Timed out waiting for server '%s' to start. "
@@ -549,19 +598,41 @@ def generate_start_command(server, options_override=None, standalone=False):
 ###############################################################################
 def server_stopped_predicate(server, pid):
     def server_stopped():
-        return (not server.is_online() and
-                (pid is None or not is_pid_alive(pid)))
+        # check the pid first since its cheaper than probing the server.
+        # is_online() does a fast tcp probe before connecting
+        return ((pid is None or not is_pid_alive(pid)) and
+                not server.is_online())
 
     return server_stopped
 
 ###############################################################################
-def server_started_predicate(server, mongod_pid):
+def start_log_monitor(server, echo=False):
+    """
+    Returns a started StartupLogMonitor for the log file of the server or None
+     if the server will not log to a file
+    """
+    if (server.get_cmd_option("syslog") or
+            not (server.is_fork() or server.get_cmd_option("logpath"))):
+        return None
+
+    log_monitor = StartupLogMonitor(server.get_log_file_path(), echo=echo)
+    log_monitor.start()
+    return log_monitor
+
+###############################################################################
+def server_started_predicate(server, mongod_pid, log_monitor=None):
     def server_started():
+        if log_monitor and log_monitor.fatal_error:
+            raise MongoctlException("Could not start the server. Log file "
+                                    "says: %s" % log_monitor.fatal_error)
+
         # check if the command failed
         if not is_pid_alive(mongod_pid):
             raise MongoctlException("Could not start the server. Please check"
                                     " the log file.")
 
+        # is_online() does a fast tcp probe so this is cheap until mongod
+        # starts listening
         return server.is_online()
 
     return server_started
@@ -19,10 +19,20 @@ from mongoctl.prompt import prompt_execute_task
 
 MAX_SHUTDOWN_WAIT = 45
 
+# seconds between checks while waiting for a server to stop
+STOP_POLL_INTERVAL = 0.5
+
 ###############################################################################
 # stop command
 ###############################################################################
 def stop_command(parsed_options):
+    # stop all servers of a cluster if a cluster id was passed
+    if (mongoctl.repository.lookup_server(parsed_options.server) is None and
+            mongoctl.repository.lookup_cluster(parsed_options.server)
+            is not None):
+        from mongoctl.commands.cluster.stop import stop_cluster_command
+        return stop_cluster_command(parsed_options)
+
     stop_server(parsed_options.server, force=parsed_options.forceStop,
                 port=parsed_options.port)
 
@@ -95,6 +105,9 @@ def do_stop_server(server, force=False):
             prompt_or_force_stop_server(server, pid, force,
                                         try_mongo_force=can_stop_mongoly)
 
+    # killed servers never ran the shutdown command so drop cached results
+    mongoctl.objects.server.invalidate_command_cache()
+
     if shutdown_success:
         log_info("Server '%s' has stopped." % server.id)
     else:
@@ -123,7 +136,8 @@ def mongo_stop_server(server, pid, force=False):
         log_info("Will now wait for server '%s' to stop." % server.id)
         # Check that the server has stopped
         stop_pred = server_stopped_predicate(server, pid)
-        wait_for(stop_pred,timeout=MAX_SHUTDOWN_WAIT)
+        wait_for(stop_pred, timeout=MAX_SHUTDOWN_WAIT,
+                 sleep_duration=STOP_POLL_INTERVAL)
 
         if not stop_pred():
             log_error("Shutdown command failed...")
@@ -160,7 +174,8 @@ def kill_stop_server(server, pid):
     kill_process(pid, force=True)
 
     log_info("Will now wait for server '%s' (pid=%s) to die." % (server.id, pid))
-    wait_for(pid_dead_predicate(pid), timeout=MAX_SHUTDOWN_WAIT)
+    wait_for(pid_dead_predicate(pid), timeout=MAX_SHUTDOWN_WAIT,
+             sleep_duration=STOP_POLL_INTERVAL)
 
     if not is_pid_alive(pid):
         log_info("Forcefully-stopped server '%s'." % server.id)
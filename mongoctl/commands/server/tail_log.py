@@ -1,11 +1,15 @@
 __author__ = 'abdul'
 
 import os
+import sys
+import time
+import threading
 
-from mongoctl.processes import create_subprocess
 from mongoctl.mongoctl_logging import *
 from mongoctl import repository
-from mongoctl.utils import execute_command
+from mongoctl.errors import MongoctlException
+from mongoctl.objects.server import assume_local_server
+from mongoctl.server_log import LogFollower, LogLineFilter
 
 ###############################################################################
 # CONSTS
@@ -16,39 +20,104 @@ DEFAULT_TAIL_LINES = 15
 # tail log command
 ###############################################################################
 def tail_log_command(parsed_options):
-    server = repository.lookup_server(parsed_options.server)
-    server.validate_local_op("tail-log")
-    log_path = server.get_log_file_path()
-    # check if log file exists
-    if os.path.exists(log_path):
-        log_tailer = tail_server_log(server)
-        log_tailer.communicate()
-    else:
-        log_info("Log file '%s' does not exist." % log_path)
+    servers = get_tail_log_servers(parsed_options)
+    num_lines = parse_num_lines(parsed_options.lines)
+    line_filter = get_log_line_filter(parsed_options)
 
+    log_paths = []
+    for server in servers:
+        if parsed_options.assumeLocal:
+            assume_local_server(server.id)
+        server.validate_local_op("tail-log")
+        log_path = server.get_log_file_path()
+        # check if log file exists
+        if os.path.exists(log_path):
+            log_paths.append((server, log_path))
+        else:
+            log_info("Log file '%s' does not exist." % log_path)
+
+    if not log_paths:
+        return
+
+    # prefix lines with their server id when tailing several servers
+    output = LogOutput(prefix_lines=len(servers) > 1)
+    followers = []
+    for server, log_path in log_paths:
+        follower = LogFollower(log_path, output.line_printer(server.id),
+                               last_lines=num_lines, line_filter=line_filter)
+        follower.start()
+        followers.append(follower)
+
+    if parsed_options.noFollow:
+        for follower in followers:
+            follower.stop()
+        return
+
+    # until interrupted (see mongoctl_signal)
+    while True:
+        time.sleep(1)
 
 ###############################################################################
-def tail_server_log(server):
-    try:
-        logpath = server.get_log_file_path()
-        # touch log file to make sure it exists
-        log_verbose("Touching log file '%s'" % logpath)
-        execute_command(["touch", logpath])
+def get_tail_log_servers(parsed_options):
+    """
+    Returns the servers of the specified server ids. A cluster id stands for
+     all the servers of the cluster
+    """
+    servers = []
+    for server_id in [parsed_options.server] + parsed_options.moreServers:
+        server = repository.lookup_server(server_id)
+        if server is not None:
+            servers.append(server)
+            continue
+        cluster = repository.lookup_cluster(server_id)
+        if cluster is None:
+            raise MongoctlException("Unknown server or cluster '%s'" %
+                                    server_id)
+        servers.extend(cluster.get_servers())
+
+    return servers
 
-        tail_cmd = ["tail", "-f", "-n", str(DEFAULT_TAIL_LINES), logpath]
-        log_verbose("Executing command: %s" % (" ".join(tail_cmd)))
-        return create_subprocess(tail_cmd)
-    except Exception, e:
-        log_exception(e)
-        log_error("Unable to tail server log file. Cause: %s" % e)
-        return None
+###############################################################################
+def get_log_line_filter(parsed_options):
+    return LogLineFilter(
+        min_severity=parsed_options.severity,
+        components=(parsed_options.component.split(",")
+                    if parsed_options.component else None),
+        pattern=parsed_options.grep)
 
 ###############################################################################
-def stop_tailing(log_tailer):
+def parse_num_lines(value):
+    if value is None:
+        return DEFAULT_TAIL_LINES
     try:
-        if log_tailer:
-            log_verbose("-- Killing tail log path subprocess")
-            log_tailer.terminate()
-    except Exception, e:
-        log_exception(e)
-        log_verbose("Failed to kill tail subprocess. Cause: %s" % e)
+        return int(value)
+    except ValueError:
+        raise MongoctlException("Invalid --lines value '%s'. Must be a "
+                                "number." % value)
+
+###############################################################################
+# LogOutput Class
+###############################################################################
+class LogOutput(object):
+    """
+    Writes the lines of several followed logs to stdout without interleaving
+     them mid line
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self, prefix_lines=False):
+        self._prefix_lines = prefix_lines
+        self._lock = threading.Lock()
+
+    ###########################################################################
+    def line_printer(self, server_id):
+        prefix = "[%s] " % server_id if self._prefix_lines else ""
+
+        def print_line(line):
+            with self._lock:
+                sys.stdout.write("%s%s\n" % (prefix, line))
+                sys.stdout.flush()
+
+        return print_line
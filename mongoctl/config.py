@@ -1,8 +1,8 @@
 __author__ = 'abdul'
 
 import json
-import urllib
 import mongoctl_globals
+import local_cache
 
 from utils import *
 
@@ -16,6 +16,10 @@ from bson import json_util
 ###############################################################################
 MONGOCTL_CONF_FILE_NAME = "mongoctl.config"
 
+DEFAULT_SERVERS_FILE = "servers.config"
+
+DEFAULT_CLUSTERS_FILE = "clusters.config"
+
 
 ###############################################################################
 # Config root / files stuff
@@ -29,6 +33,10 @@ def set_config_root(root_path):
     global __config_root__
     __config_root__ = root_path
 
+###############################################################################
+def get_config_root():
+    return __config_root__
+
 
 ###############################################################################
 # Configuration Functions
@@ -72,6 +80,32 @@ def get_default_users():
 def get_cluster_member_alt_address_mapping():
     return get_mongoctl_config_val('clusterMemberAltAddressesMapping', {})
 
+###############################################################################
+def get_ssl_negotiation_cache_ttl():
+    return get_mongoctl_config_val('sslNegotiationCacheTTL')
+
+###############################################################################
+def get_reachability_cache_ttl():
+    return get_mongoctl_config_val('reachabilityCacheTTL')
+
+###############################################################################
+def get_command_result_cache_ttl_ms(default=None):
+    return get_mongoctl_config_val('commandResultCacheTTLMS', default)
+
+###############################################################################
+def get_config_cache_max_age():
+    if __mongo_config__ is not None:
+        return get_mongoctl_config_val('configCacheMaxAge')
+
+    # reading mongoctl.config itself: go by its cached copy
+    cached_body = local_cache.get_cached_url_body(
+        to_full_config_path(MONGOCTL_CONF_FILE_NAME))
+    if cached_body:
+        try:
+            return parse_config_json(cached_body).get('configCacheMaxAge')
+        except Exception, e:
+            log_verbose("Unable to parse cached mongoctl config: %s" % e)
+
 
 ###############################################################################
 def to_full_config_path(path_or_url):
@@ -99,6 +133,11 @@ def get_mongoctl_config():
     global __mongo_config__
 
     if __mongo_config__ is None:
+        # servers/clusters files under a url config root are fetched along
+        # with mongoctl.config
+        prefetch_config_urls([MONGOCTL_CONF_FILE_NAME,
+                              DEFAULT_SERVERS_FILE,
+                              DEFAULT_CLUSTERS_FILE])
         __mongo_config__ = read_config_json("mongoctl",
                                             MONGOCTL_CONF_FILE_NAME)
 
@@ -112,11 +151,13 @@ def read_config_json(name, path_or_url):
         log_verbose("Reading %s configuration"
                     " from '%s'..." % (name, path_or_url))
 
-        json_str = read_json_string(path_or_url)
-        # minify the json/remove comments and sh*t
-        json_str = minify_json.json_minify(json_str)
-        json_val =json.loads(json_str,
-                             object_hook=json_util.object_hook)
+        full_path = to_full_config_path(path_or_url)
+        if not is_url(full_path) and os.path.isfile(full_path):
+            # local files are parsed once and then loaded from the compiled
+            # cache until they change
+            json_val = local_cache.load_compiled(full_path, parse_config_json)
+        else:
+            json_val = parse_config_json(read_json_string(path_or_url))
 
         if not json_val and not isinstance(json_val,list): # b/c [] is not True
             raise MongoctlException("Unable to load %s "
@@ -129,6 +170,12 @@ def read_config_json(name, path_or_url):
         raise MongoctlException("Unable to load %s "
                                 "config file: %s: %s" % (name, path_or_url, e))
 
+###############################################################################
+def parse_config_json(json_str):
+    # minify the json/remove comments and sh*t
+    json_str = minify_json.json_minify(json_str)
+    return json.loads(json_str, object_hook=json_util.object_hook)
+
 ###############################################################################
 def read_json_string(path_or_url, validate_exists=True):
     path_or_url = to_full_config_path(path_or_url)
@@ -145,11 +192,13 @@ def read_json_string(path_or_url, validate_exists=True):
             return None
 
     # Then its url
-    response = urllib.urlopen(path_or_url)
+    code, body = (__prefetched_urls__.pop(path_or_url, None) or
+                  local_cache.read_url(path_or_url,
+                                       max_age=get_config_cache_max_age()))
 
-    if response.getcode() != 200:
+    if code != 200:
         msg = ("Unable to open url '%s' (response code '%s')."
-               % (path_or_url, response.getcode()))
+               % (path_or_url, code))
 
         if validate_exists:
             raise MongoctlException(msg)
@@ -157,4 +206,33 @@ def read_json_string(path_or_url, validate_exists=True):
             log_verbose(msg)
             return None
     else:
-        return response.read()
+        return body
+
+###############################################################################
+# Global variable: (response code, body) of config urls fetched ahead of
+# time. See prefetch_config_urls()
+__prefetched_urls__ = {}
+
+###############################################################################
+def prefetch_config_urls(paths_or_urls):
+    """
+    Concurrently fetches the specified config files that are urls so that
+     reading them later does not wait on the network. Failures are ignored
+     here and surface when the file is actually read
+    """
+    urls = [url for url in set(map(to_full_config_path, paths_or_urls))
+            if is_url(url) and url not in __prefetched_urls__]
+    if len(urls) < 2:
+        return
+
+    max_age = get_config_cache_max_age()
+
+    def prefetch(url):
+        try:
+            return local_cache.read_url(url, max_age=max_age)
+        except Exception, e:
+            log_verbose("Unable to prefetch '%s': %s" % (url, e))
+
+    for url, result in zip(urls, parallel_map(prefetch, urls)):
+        if result is not None:
+            __prefetched_urls__[url] = result
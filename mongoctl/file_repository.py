@@ -0,0 +1,265 @@
+__author__ = 'abdul'
+
+import os
+import json
+import time
+import hashlib
+
+import config
+
+from errors import MongoctlException
+from mongoctl_logging import log_verbose, log_exception
+from utils import ensure_dir
+
+###############################################################################
+# CONSTS
+###############################################################################
+MANIFEST_FILE_NAME = "manifest.json"
+
+# bump when the manifest format changes so that old manifests are regenerated
+MANIFEST_VERSION = 2
+
+# files modified less than that many seconds before the manifest was saved
+# may change again without a visible mtime/size change (coarse mtimes) so
+# their content hash is checked on load
+RACY_MTIME_WINDOW = 2
+
+SERVERS_DIR_NAME = "servers"
+
+CLUSTERS_DIR_NAME = "clusters"
+
+CONFIG_FILE_EXTENSIONS = (".config", ".json")
+
+###############################################################################
+# RepositoryManifest Class
+###############################################################################
+class RepositoryManifest(object):
+    """
+    Index of a split file repository, i.e. a dir holding one config file per
+     server in servers/ and one per cluster in clusters/. The manifest maps
+     each server/cluster id to its file and also records:
+        - a summary of each server (enough to list servers)
+        - the servers/clusters each cluster references
+    It is kept in manifest.json in the repository dir and brought up to date
+     on load by re-reading only the files whose mtime, size or (for files
+     modified right before the manifest was saved) content changed.
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self, repo_dir, cluster_refs_func):
+        self._repo_dir = repo_dir
+        self._cluster_refs_func = cluster_refs_func
+        self._entries = {
+            SERVERS_DIR_NAME: {},
+            CLUSTERS_DIR_NAME: {}
+        }
+        self._saved_at = None
+
+    ###########################################################################
+    @property
+    def file_path(self):
+        return os.path.join(self._repo_dir, MANIFEST_FILE_NAME)
+
+    ###########################################################################
+    def get_server_ids(self):
+        return self._entries[SERVERS_DIR_NAME].keys()
+
+    ###########################################################################
+    def get_cluster_ids(self):
+        return self._entries[CLUSTERS_DIR_NAME].keys()
+
+    ###########################################################################
+    def get_server_summaries(self):
+        return [entry["summary"] for entry in
+                self._entries[SERVERS_DIR_NAME].values()]
+
+    ###########################################################################
+    def get_cluster_refs(self):
+        """
+        Returns a list of (cluster id, refs) where refs is what
+         cluster_refs_func returned for the cluster document
+        """
+        return [(cluster_id, [tuple(ref) for ref in entry["refs"]])
+                for cluster_id, entry in
+                self._entries[CLUSTERS_DIR_NAME].items()]
+
+    ###########################################################################
+    def read_server_document(self, server_id):
+        return self._read_entry_document(SERVERS_DIR_NAME, server_id)
+
+    ###########################################################################
+    def read_cluster_document(self, cluster_id):
+        return self._read_entry_document(CLUSTERS_DIR_NAME, cluster_id)
+
+    ###########################################################################
+    def _read_entry_document(self, kind, doc_id):
+        entry = self._entries[kind][doc_id]
+        return self._read_document(entry["file"])
+
+    ###########################################################################
+    def _read_document(self, rel_path, content=None):
+        file_path = os.path.join(self._repo_dir, rel_path)
+        # single small files: not worth a compiled cache entry each
+        try:
+            if content is None:
+                content = self._read_content(rel_path)
+            document = config.parse_config_json(content)
+        except Exception, e:
+            raise MongoctlException("Unable to load config file: %s: %s" %
+                                    (file_path, e))
+        if not isinstance(document, dict) or "_id" not in document:
+            raise MongoctlException("'%s' must contain a single object with "
+                                    "an _id" % file_path)
+        return document
+
+    ###########################################################################
+    def _read_content(self, rel_path):
+        with open(os.path.join(self._repo_dir, rel_path)) as config_file:
+            return config_file.read()
+
+    ###########################################################################
+    def load(self):
+        """
+        Loads the manifest and refreshes the entries of new, changed and
+         removed files. The manifest file is rewritten if anything changed
+        """
+        saved_entries = self._load_saved_entries()
+        changed = saved_entries is None
+        saved_entries = saved_entries or {}
+
+        for kind in self._entries:
+            kind_saved_entries = saved_entries.get(kind) or {}
+            entries, kind_changed = self._refresh_entries(kind,
+                                                          kind_saved_entries)
+            self._entries[kind] = entries
+            changed = changed or kind_changed
+
+        if changed:
+            self._save()
+
+    ###########################################################################
+    def _refresh_entries(self, kind, saved_entries):
+        saved_by_file = dict((entry["file"], (doc_id, entry))
+                             for doc_id, entry in saved_entries.items())
+        entries = {}
+        changed = False
+
+        for rel_path, mtime, size in self._list_files(kind):
+            saved = saved_by_file.get(rel_path)
+            if (saved and saved[1]["mtime"] == mtime and
+                    saved[1]["size"] == size and not self._is_racy(mtime)):
+                doc_id, entry = saved
+            else:
+                content = self._read_content(rel_path)
+                content_hash = hashlib.md5(content).hexdigest()
+                if saved and saved[1]["hash"] == content_hash:
+                    # touched or copied but same content
+                    doc_id, entry = saved
+                    entry.update(mtime=mtime, size=size)
+                else:
+                    document = self._read_document(rel_path, content)
+                    doc_id = document["_id"]
+                    entry = self._new_entry(kind, rel_path, mtime, size,
+                                            content_hash, document)
+                changed = True
+
+            if doc_id in entries:
+                raise MongoctlException(
+                    "Duplicate _id '%s' in '%s' and '%s'" %
+                    (doc_id, entries[doc_id]["file"], rel_path))
+            entries[doc_id] = entry
+
+        # removed files
+        changed = changed or len(entries) != len(saved_entries)
+
+        return entries, changed
+
+    ###########################################################################
+    def _is_racy(self, mtime):
+        return (self._saved_at is None or
+                mtime >= self._saved_at - RACY_MTIME_WINDOW)
+
+    ###########################################################################
+    def _list_files(self, kind):
+        """
+        Returns a (relative path, mtime, size) list of the config files of
+         the specified kind
+        """
+        kind_dir = os.path.join(self._repo_dir, kind)
+        if not os.path.isdir(kind_dir):
+            return []
+
+        files = []
+        for file_name in sorted(os.listdir(kind_dir)):
+            if file_name.endswith(CONFIG_FILE_EXTENSIONS):
+                stat = os.stat(os.path.join(kind_dir, file_name))
+                files.append((os.path.join(kind, file_name), stat.st_mtime,
+                              stat.st_size))
+        return files
+
+    ###########################################################################
+    def _new_entry(self, kind, rel_path, mtime, size, content_hash,
+                   document):
+        entry = {
+            "file": rel_path,
+            "mtime": mtime,
+            "size": size,
+            "hash": content_hash
+        }
+        if kind == SERVERS_DIR_NAME:
+            entry["summary"] = get_server_summary(document)
+        else:
+            entry["refs"] = self._cluster_refs_func(document)
+
+        return entry
+
+    ###########################################################################
+    def _load_saved_entries(self):
+        if not os.path.exists(self.file_path):
+            return None
+        try:
+            with open(self.file_path) as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest.get("version") == MANIFEST_VERSION:
+                self._saved_at = manifest["savedAt"]
+                return manifest["entries"]
+        except Exception, e:
+            log_exception(e)
+            log_verbose("Regenerating unreadable manifest '%s'. Cause: %s" %
+                        (self.file_path, e))
+
+    ###########################################################################
+    def _save(self):
+        log_verbose("Saving manifest '%s'" % self.file_path)
+        try:
+            ensure_dir(self._repo_dir)
+            tmp_path = "%s.%s.tmp" % (self.file_path, os.getpid())
+            with open(tmp_path, "w") as tmp_file:
+                json.dump({
+                    "version": MANIFEST_VERSION,
+                    "savedAt": time.time(),
+                    "entries": self._entries
+                }, tmp_file)
+            os.rename(tmp_path, self.file_path)
+        except Exception, e:
+            # e.g. a read only repository dir. Just regenerate next time
+            log_exception(e)
+            log_verbose("Unable to save manifest '%s'. Cause: %s" %
+                        (self.file_path, e))
+
+###############################################################################
+def get_server_summary(server_document):
+    """
+    Returns the subset of the server document needed to list the server: all
+     string properties (_id, _type, description, address and alternative
+     addresses) and the port
+    """
+    summary = dict((key, value) for key, value in server_document.items()
+                   if isinstance(value, basestring))
+    port = (server_document.get("cmdOptions") or {}).get("port")
+    if port is not None:
+        summary["cmdOptions"] = {"port": port}
+
+    return summary
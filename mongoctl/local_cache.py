@@ -0,0 +1,306 @@
+__author__ = 'abdul'
+
+import os
+import json
+import time
+import threading
+import hashlib
+import urllib2
+
+import config
+import mongoctl_globals
+
+from bson import json_util
+
+from utils import resolve_path, ensure_dir, is_url
+from mongoctl_logging import log_verbose, log_warning, log_exception
+
+###############################################################################
+# CONSTS
+###############################################################################
+CACHE_DIR_NAME = "cache"
+
+# bump when the format of compiled values changes so that old compiled cache
+# files are ignored
+COMPILED_CACHE_VERSION = 2
+
+###############################################################################
+def get_cache_dir():
+    """
+    Returns the dir where mongoctl keeps its local caches. That is the "cache"
+     dir under the config root, or under the default config root if the
+     config root is a url, is not writable or is within the mongoctl package
+     (e.g. the sample/testing confs)
+    """
+    conf_root = config.get_config_root()
+    if not _is_cache_conf_root(conf_root):
+        conf_root = mongoctl_globals.DEFAULT_CONF_ROOT
+
+    return resolve_path(os.path.join(conf_root, CACHE_DIR_NAME))
+
+###############################################################################
+def _is_cache_conf_root(conf_root):
+    if is_url(conf_root):
+        return False
+
+    conf_root = os.path.realpath(resolve_path(conf_root))
+    package_dir = os.path.realpath(os.path.dirname(os.path.abspath(__file__)))
+    if (conf_root + os.sep).startswith(package_dir + os.sep):
+        return False
+
+    return os.access(conf_root, os.W_OK)
+
+###############################################################################
+def get_cache_file_path(file_name):
+    return os.path.join(get_cache_dir(), file_name)
+
+###############################################################################
+def write_cache_file(file_name, data):
+    """
+    Atomically writes data to the specified file in the cache dir
+    """
+    cache_dir = get_cache_dir()
+    ensure_dir(cache_dir)
+    file_path = os.path.join(cache_dir, file_name)
+    tmp_path = "%s.%s.tmp" % (file_path, os.getpid())
+    with open(tmp_path, "wb") as tmp_file:
+        tmp_file.write(data)
+    os.rename(tmp_path, file_path)
+
+###############################################################################
+# Compiled file cache
+###############################################################################
+def load_compiled(file_path, compile_func):
+    """
+    Returns compile_func(<contents of file_path>). The compiled value (which
+     must be json serializable, bson extended json types included) is saved
+     as json in the cache dir and reused by later invocations for as long as
+     the file's mtime, size and content hash stay the same. Json is used
+     rather than pickle so that cache files can never run code when loaded
+    """
+    stat = os.stat(file_path)
+    cache_file_name = _get_compiled_cache_file_name(file_path)
+
+    with open(file_path) as source_file:
+        content = source_file.read()
+    content_hash = hashlib.md5(content).hexdigest()
+
+    entry = _read_compiled_entry(cache_file_name)
+    if (entry and
+            entry.get("version") == COMPILED_CACHE_VERSION and
+            entry.get("path") == file_path and
+            entry.get("mtime") == stat.st_mtime and
+            entry.get("size") == stat.st_size and
+            entry.get("hash") == content_hash):
+        log_verbose("Using compiled cache of '%s'" % file_path)
+        return entry["value"]
+
+    value = compile_func(content)
+
+    try:
+        write_cache_file(cache_file_name, json.dumps({
+            "version": COMPILED_CACHE_VERSION,
+            "path": file_path,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "hash": content_hash,
+            "value": value
+        }, default=json_util.default))
+    except Exception, e:
+        log_exception(e)
+        log_verbose("Unable to save compiled cache of '%s'. Cause: %s" %
+                    (file_path, e))
+
+    return value
+
+###############################################################################
+def _get_compiled_cache_file_name(file_path):
+    return "compiled-%s.json" % hashlib.md5(file_path).hexdigest()
+
+###############################################################################
+def _read_compiled_entry(cache_file_name):
+    file_path = get_cache_file_path(cache_file_name)
+    if not os.path.exists(file_path):
+        return None
+    try:
+        with open(file_path) as cache_file:
+            return json.load(cache_file, object_hook=json_util.object_hook)
+    except Exception, e:
+        log_exception(e)
+        log_verbose("Ignoring unreadable compiled cache file '%s'. Cause: %s"
+                    % (file_path, e))
+        return None
+
+###############################################################################
+# HTTP cache
+###############################################################################
+def read_url(url, max_age=None):
+    """
+    GETs the specified url and returns (response code, body). Bodies of
+     successful responses are kept in the cache dir and reused without any
+     request for max_age seconds, then revalidated with conditional requests
+     (ETag/Last-Modified). The cached body is also returned when the url
+     cannot be reached at all.
+    """
+    cache_file_name = _get_http_cache_file_name(url)
+    entry = _read_http_entry(cache_file_name, url)
+
+    if (entry and max_age is not None and
+            time.time() - entry["fetchedAt"] <= max_age):
+        log_verbose("Using cached '%s'" % url)
+        return 200, entry["body"]
+
+    request = urllib2.Request(url)
+    if entry and entry.get("etag"):
+        request.add_header("If-None-Match", entry["etag"])
+    if entry and entry.get("lastModified"):
+        request.add_header("If-Modified-Since", entry["lastModified"])
+
+    try:
+        response = urllib2.urlopen(request)
+        code = response.getcode()
+        body = response.read()
+    except urllib2.HTTPError, e:
+        if e.code == 304 and entry:
+            log_verbose("'%s' not modified. Using cached copy" % url)
+            entry["fetchedAt"] = time.time()
+            _save_http_entry(cache_file_name, entry)
+            return 200, entry["body"]
+        return e.code, None
+    except urllib2.URLError, e:
+        if not entry:
+            raise
+        log_warning("Unable to reach '%s'. Using copy cached %s seconds ago."
+                    " Cause: %s" % (url, int(time.time() - entry["fetchedAt"]),
+                                    e))
+        return 200, entry["body"]
+
+    if code == 200:
+        headers = response.info()
+        _save_http_entry(cache_file_name, {
+            "url": url,
+            "etag": headers.getheader("ETag"),
+            "lastModified": headers.getheader("Last-Modified"),
+            "fetchedAt": time.time(),
+            "body": body
+        })
+
+    return code, body
+
+###############################################################################
+def get_cached_url_body(url):
+    entry = _read_http_entry(_get_http_cache_file_name(url), url)
+    if entry:
+        return entry["body"]
+
+###############################################################################
+def _get_http_cache_file_name(url):
+    return "http-%s.json" % hashlib.md5(url).hexdigest()
+
+###############################################################################
+def _read_http_entry(cache_file_name, url):
+    file_path = get_cache_file_path(cache_file_name)
+    if not os.path.exists(file_path):
+        return None
+    try:
+        with open(file_path) as cache_file:
+            entry = json.load(cache_file)
+        if entry.get("url") == url:
+            entry["body"] = entry["body"].encode("utf-8")
+            return entry
+    except Exception, e:
+        log_exception(e)
+        log_verbose("Ignoring unreadable http cache file '%s'. Cause: %s" %
+                    (file_path, e))
+
+###############################################################################
+def _save_http_entry(cache_file_name, entry):
+    try:
+        write_cache_file(cache_file_name, json.dumps(entry))
+    except Exception, e:
+        log_exception(e)
+        log_verbose("Unable to cache '%s'. Cause: %s" % (entry["url"], e))
+
+###############################################################################
+# PersistedCache Class
+###############################################################################
+class PersistedCache(object):
+    """
+    A small key/value cache that is persisted as a json file in the cache dir
+     so that it survives between mongoctl invocations. Entries expire after
+     ttl seconds.
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self, name, ttl):
+        self._name = name
+        self._ttl = ttl
+        self._entries = None
+        self._lock = threading.Lock()
+
+    ###########################################################################
+    @property
+    def file_name(self):
+        return "%s.json" % self._name
+
+    ###########################################################################
+    def get(self, key):
+        with self._lock:
+            entry = self._get_entries().get(key)
+            if entry is not None and not self._is_expired(entry):
+                return entry["value"]
+
+    ###########################################################################
+    def put(self, key, value):
+        with self._lock:
+            self._get_entries()[key] = {
+                "value": value,
+                "ts": time.time()
+            }
+            self._save()
+
+    ###########################################################################
+    def remove(self, key):
+        with self._lock:
+            if self._get_entries().pop(key, None) is not None:
+                self._save()
+
+    ###########################################################################
+    def _is_expired(self, entry):
+        return self._ttl is not None and time.time() - entry["ts"] > self._ttl
+
+    ###########################################################################
+    def _get_entries(self):
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    ###########################################################################
+    def _load(self):
+        file_path = get_cache_file_path(self.file_name)
+        if not os.path.exists(file_path):
+            return {}
+        try:
+            with open(file_path) as cache_file:
+                entries = json.load(cache_file,
+                                    object_hook=json_util.object_hook)
+            # drop expired entries
+            return dict((key, entry) for key, entry in entries.items()
+                        if not self._is_expired(entry))
+        except Exception, e:
+            log_exception(e)
+            log_verbose("Ignoring unreadable cache file '%s'. Cause: %s" %
+                        (file_path, e))
+            return {}
+
+    ###########################################################################
+    def _save(self):
+        try:
+            data = json.dumps(self._entries, default=json_util.default)
+            write_cache_file(self.file_name, data)
+        except Exception, e:
+            log_exception(e)
+            log_verbose("Unable to save cache '%s'. Cause: %s" %
+                        (self._name, e))
@@ -10,45 +10,39 @@ https://github.com/getify/JSON.minify
 
 import re
 
+# Single pass tokenizer. Each match is one of: a string literal (possibly
+# unterminated), a multi line comment, a single line comment, a run of white
+# space or a run of anything else. Strings are matched as a whole so comment
+# markers inside them are never seen as comments.
+_TOKENIZER = re.compile(r'''
+    ("[^"\\]*(?:\\.[^"\\]*)*"?)    # 1: string
+  | (/\*.*?(?:\*/|\Z))               # 2: multi line comment
+  | (//[^\n\r]*[\n\r]?)               # 3: single line comment
+  | ([ \t\n\r]+)                     # 4: white space
+  | ([^"/ \t\n\r]+|/)                # 5: anything else
+''', re.VERBOSE | re.DOTALL)
+
 def json_minify(json,strip_space=True):
-    tokenizer=re.compile('"|(/\*)|(\*/)|(//)|\n|\r')
-    in_string = False
-    in_multiline_comment = False
-    in_singleline_comment = False
-    
+    """
+    Removes comments (and white space unless strip_space is False) from the
+    json string in a single O(n) pass. The result can be passed straight to
+    json.loads()
+    """
     new_str = []
-    from_index = 0 # from is a keyword in Python
-    
-    for match in re.finditer(tokenizer,json):
-        
-        if not in_multiline_comment and not in_singleline_comment:
-            tmp2 = json[from_index:match.start()]
-            if not in_string and strip_space:
-                tmp2 = re.sub('[ \t\n\r]*','',tmp2) # replace only white space defined in standard
-            new_str.append(tmp2)
-            
-        from_index = match.end()
-        
-        if match.group() == '"' and not in_multiline_comment and not in_singleline_comment:
-            escaped = re.search('(\\\\)*$',json[:match.start()])
-            if not in_string or escaped is None or len(escaped.group()) % 2 == 0:
-                # start of string with ", or unescaped " character found to end string
-                in_string = not in_string
-            from_index -= 1 # include " character in next catch
-            
-        elif match.group() == '/*' and not in_string and not in_multiline_comment and not in_singleline_comment:
-            in_multiline_comment = True
-        elif match.group() == '*/' and not in_string and in_multiline_comment and not in_singleline_comment:
-            in_multiline_comment = False
-        elif match.group() == '//' and not in_string and not in_multiline_comment and not in_singleline_comment:
-            in_singleline_comment = True
-        elif (match.group() == '\n' or match.group() == '\r') and not in_string and not in_multiline_comment and in_singleline_comment:
-            in_singleline_comment = False
-        elif not in_multiline_comment and not in_singleline_comment and (  
-             match.group() not in ['\n','\r',' ','\t'] or not strip_space):
-                new_str.append(match.group()) 
-    
-    new_str.append(json[from_index:])
+    append = new_str.append
+
+    for match in _TOKENIZER.finditer(json):
+        kind = match.lastindex
+        if kind == 2 or kind == 3:
+            continue
+        if kind == 4 and strip_space:
+            continue
+        token = match.group(kind)
+        if kind == 1 and strip_space and ("\n" in token or "\r" in token):
+            # raw line breaks are not allowed within json strings
+            token = token.replace("\n", "").replace("\r", "")
+        append(token)
+
     return ''.join(new_str)
 
 if __name__ == '__main__':
@@ -1,5 +1,9 @@
 __author__ = 'abdul'
 
+import atexit
+import threading
+import time
+
 import pymongo
 import pymongo.uri_parser
 import pymongo.errors
@@ -11,6 +15,16 @@ from pymo import mongo_client as _mongo_client
 # db connection timeout, 10 seconds
 CONN_TIMEOUT_MS = 10000
 
+# max connections of each registered (shared) client. Connections are only
+# opened as concurrent commands need them
+REGISTRY_CLIENT_MAX_POOL_SIZE = 16
+
+# registered clients that were not used for that many seconds are pinged
+# before being reused. Within that interval the client's monitor (which
+# checks the server every 10 seconds) or a failed command would have reset
+# the server of a stale client
+CLIENT_VALIDATE_IDLE_SECS = 10
+
 ###############################################################################
 def mongo_client(*args, **kwargs):
     """
@@ -25,9 +39,9 @@ def mongo_client(*args, **kwargs):
 
     kwargs.update({
         "socketTimeoutMS": connection_timeout_ms,
-        "connectTimeoutMS": connection_timeout_ms,
-        "maxPoolSize": 1
+        "connectTimeoutMS": connection_timeout_ms
     })
+    kwargs.setdefault("maxPoolSize", 1)
 
     if pymongo.get_version_string().startswith("3.2"):
         if kwargs and kwargs.get("serverSelectionTimeoutMS") is None:
@@ -38,6 +52,221 @@ def mongo_client(*args, **kwargs):
 
     return _mongo_client(*args, **kwargs)
 
+###############################################################################
+# Client registry
+###############################################################################
+# Process-wide registry of MongoClients keyed by
+# (address, auth identity, client options). Clients are shared across all
+# Server objects and commands within the same mongoctl process.
+__client_registry__ = {}
+
+__client_registry_lock__ = threading.Lock()
+
+# when each registered client was last handed out, keyed by registry key
+__client_last_used__ = {}
+
+__client_registry_stats__ = {
+    "created": 0,
+    "reused": 0,
+    "evicted": 0
+}
+
+###############################################################################
+def get_mongo_client(address, identity=None, validate=False, **kwargs):
+    """
+    Returns a registered MongoClient for the specified address/options,
+    creating it only if there is no usable one yet.
+    :param address: address or uri to connect to
+    :param identity: auth identity the client will be authenticated as.
+                     Clients with different identities are never shared
+    :param validate: ping a registered client before returning it if it was
+                     idle for CLIENT_VALIDATE_IDLE_SECS or lost track of its
+                     server (e.g. after a failed command). Stale clients are
+                     evicted and replaced by a new one
+    :param kwargs: client options (same as mongo_client())
+    :return:
+    """
+    key = _client_registry_key(address, identity, kwargs)
+    kwargs.setdefault("maxPoolSize", REGISTRY_CLIENT_MAX_POOL_SIZE)
+
+    with __client_registry_lock__:
+        client = __client_registry__.get(key)
+        last_used = __client_last_used__.get(key)
+        __client_last_used__[key] = time.time()
+
+    if client is not None:
+        if (not validate or
+                (time.time() - last_used < CLIENT_VALIDATE_IDLE_SECS and
+                 client.nodes) or
+                _is_client_alive(client)):
+            _incr_client_registry_stat("reused")
+            mongoctl_logging.log_debug("Reusing registered MongoClient for "
+                                       "%s" % address)
+            return client
+
+        mongoctl_logging.log_debug("Evicting stale MongoClient for %s" %
+                                   address)
+        _evict_mongo_client(key, client)
+
+    # create a new client. This may raise if the address is not reachable
+    client = mongo_client(address, **kwargs)
+
+    with __client_registry_lock__:
+        registered = __client_registry__.get(key)
+        if registered is None:
+            __client_registry__[key] = client
+            __client_registry_stats__["created"] += 1
+
+    # another thread registered a client for this key while we were
+    # connecting, use that one
+    if registered is not None:
+        _close_client(client)
+        _incr_client_registry_stat("reused")
+        return registered
+
+    return client
+
+###############################################################################
+def _client_registry_key(address, identity, options):
+    connection_timeout_ms = options.get("connectTimeoutMS") or CONN_TIMEOUT_MS
+    other_options = tuple(sorted((name, repr(value))
+                                 for name, value in options.items()
+                                 if name != "connectTimeoutMS"))
+
+    return address, identity, connection_timeout_ms, other_options
+
+###############################################################################
+def _is_client_alive(client):
+    # A client whose monitor lost track of the server has no known nodes.
+    # Don't ping those since the ping would block until server selection
+    # times out
+    try:
+        if not client.nodes:
+            return False
+        client.get_database("admin").command({"ping": 1})
+        return True
+    except Exception, e:
+        mongoctl_logging.log_exception(e)
+        return False
+
+###############################################################################
+def _evict_mongo_client(key, client):
+    with __client_registry_lock__:
+        if __client_registry__.get(key) is client:
+            del __client_registry__[key]
+            __client_last_used__.pop(key, None)
+            __client_registry_stats__["evicted"] += 1
+
+    forget_client_auth_states(client)
+    _close_client(client)
+
+###############################################################################
+def _close_client(client):
+    try:
+        client.close()
+    except Exception, e:
+        mongoctl_logging.log_exception(e)
+
+###############################################################################
+def _incr_client_registry_stat(name):
+    with __client_registry_lock__:
+        __client_registry_stats__[name] += 1
+
+###############################################################################
+def get_client_registry_stats():
+    """
+    Returns counters of clients created/reused/evicted by the registry so far
+    """
+    with __client_registry_lock__:
+        stats = dict(__client_registry_stats__)
+        stats["open"] = len(__client_registry__)
+
+    return stats
+
+###############################################################################
+def close_all_mongo_clients():
+    with __client_registry_lock__:
+        clients = __client_registry__.values()
+        __client_registry__.clear()
+        __client_last_used__.clear()
+
+    for client in clients:
+        forget_client_auth_states(client)
+        _close_client(client)
+
+    stats = get_client_registry_stats()
+    mongoctl_logging.log_debug("MongoClient registry closed. Clients created:"
+                               " %(created)s, reused: %(reused)s, evicted:"
+                               " %(evicted)s" % stats)
+    mongoctl_logging.log_debug("Auth round trips: %(performed)s, saved by the "
+                               "auth state cache: %(saved)s" %
+                               get_client_auth_stats())
+
+###############################################################################
+# Auth state cache
+###############################################################################
+# What is known about the auth state of each registered client, keyed by
+# (client, database, login username): either the database needs no auth
+# (AUTH_NOT_NEEDED) or the client already authenticated to it
+# (AUTHENTICATED). MongoClients keep their credentials for the life of the
+# client so these hold until the client is evicted or users are added.
+AUTH_NOT_NEEDED = "notNeeded"
+
+AUTHENTICATED = "authenticated"
+
+__client_auth_states__ = {}
+
+__client_auth_states_lock__ = threading.Lock()
+
+__client_auth_stats__ = {
+    # needs-auth checks and authenticate calls sent to servers
+    "performed": 0,
+    # ones that were not needed thanks to the cache
+    "saved": 0
+}
 
+###############################################################################
+def get_client_auth_state(client, dbname, username):
+    with __client_auth_states_lock__:
+        state = __client_auth_states__.get((id(client), dbname, username))
+        if state is not None:
+            __client_auth_stats__["saved"] += 1
+
+    return state
+
+###############################################################################
+def set_client_auth_state(client, dbname, username, state):
+    with __client_auth_states_lock__:
+        __client_auth_states__[(id(client), dbname, username)] = state
+
+###############################################################################
+def forget_client_auth_states(client, dbname=None):
+    """
+    Forgets the auth states of the client (for the specified database only if
+     specified). Returns True if there was anything to forget
+    """
+    with __client_auth_states_lock__:
+        keys = [key for key in __client_auth_states__
+                if key[0] == id(client) and dbname in (None, key[1])]
+        for key in keys:
+            del __client_auth_states__[key]
 
+    return bool(keys)
+
+###############################################################################
+def incr_client_auth_round_trips():
+    with __client_auth_states_lock__:
+        __client_auth_stats__["performed"] += 1
+
+###############################################################################
+def get_client_auth_stats():
+    """
+    Returns counters of auth round trips (needs-auth checks and authenticate
+     calls) performed and saved by the auth state cache so far
+    """
+    with __client_auth_states_lock__:
+        return dict(__client_auth_stats__)
+
+###############################################################################
+atexit.register(close_all_mongo_clients)
 
@@ -37,6 +37,7 @@ import os
 import config
 import objects.server
 import repository
+import utils
 from dargparse import dargparse
 from mongoctl_logging import (
     log_error, log_info, turn_logging_verbose_on, log_verbose, log_exception
@@ -61,6 +62,9 @@ CONF_ROOT_ENV_VAR = "MONGOCTL_CONF"
 
 SERVER_ID_PARAM = "server"
 
+# command args holding server/cluster ids to preload from the db repository
+PRELOAD_ID_PARAMS = [SERVER_ID_PARAM, "cluster", "id", "shardId"]
+
 ###############################################################################
 # MAIN
 ###############################################################################
@@ -134,6 +138,19 @@ def do_main(args):
         log_info("Using alternative address '%s'..." % use_alt_address)
         objects.server.USE_ALT_ADDRESS = use_alt_address
 
+    # set the global FORCE_ADDRESS_REPROBE field
+    if parsed_args.reprobeAddresses:
+        objects.server.FORCE_ADDRESS_REPROBE = True
+
+    # set the global PARALLELISM field
+    if parsed_args.parallelism:
+        try:
+            utils.PARALLELISM = max(int(parsed_args.parallelism), 1)
+        except ValueError:
+            raise MongoctlException("Invalid --parallelism value '%s'. "
+                                    "Must be a number." %
+                                    parsed_args.parallelism)
+
     # set conf root if specified
     if parsed_args.configRoot is not None:
         config.set_config_root(parsed_args.configRoot)
@@ -159,6 +176,11 @@ def do_main(args):
         assume_local = namespace_get_property(parsed_args,"assumeLocal")
         if assume_local:
             objects.server.assume_local_server(server_id)
+
+    # load everything the command may look up from the db repository at once
+    repository.preload_db_repository(
+        [namespace_get_property(parsed_args, p) for p in PRELOAD_ID_PARAMS])
+
     # execute command
     log_info("")
     return command_function(parsed_args)
@@ -123,6 +123,31 @@ MONGOCTL_PARSER_DEF = {
             "default": None
         },
 
+        {
+            "name": "reprobeAddresses",
+            "type": "optional",
+            "help": "ignore cached address reachability and probe server "
+                    "addresses again",
+            "cmd_arg": [
+                "--reprobe"
+            ],
+            "nargs": 0,
+            "action": "store_true",
+            "default": False
+        },
+
+        {
+            "name": "parallelism",
+            "type": "optional",
+            "help": "max number of servers to probe/operate on concurrently "
+                    "(default 8)",
+            "cmd_arg": [
+                "--parallelism"
+            ],
+            "nargs": 1,
+            "default": None
+        },
+
         {
             "name": "servers",
             "type": "optional",
@@ -180,8 +205,11 @@ MONGOCTL_PARSER_DEF = {
             "prog": "start",
             "group": "serverCommands",
             #"usage" : generate default usage
-            "shortDescription" : "start a server",
-            "description" : "Starts a specific server.",
+            "shortDescription" : "start a server or a cluster",
+            "description" : "Starts a specific server, or all servers of a "
+                            "cluster. Cluster servers are started in "
+                            "parallel: config servers first, then shards, "
+                            "then mongos.",
             "function": "mongoctl.commands.server.start.start_command",
             "args":[
 
@@ -190,7 +218,7 @@ MONGOCTL_PARSER_DEF = {
                     "type" : "positional",
                     "nargs": 1,
                     "displayName": "SERVER_ID",
-                    "help": "a valid server id"
+                    "help": "a valid server or cluster id"
                 },
 
                     {
@@ -263,15 +291,18 @@ MONGOCTL_PARSER_DEF = {
             {
             "prog": "stop",
             "group": "serverCommands",
-            "shortDescription" : "stop a server",
-            "description" : "Stops a specific server.",
+            "shortDescription" : "stop a server or a cluster",
+            "description" : "Stops a specific server, or all servers of a "
+                            "cluster. Cluster servers are stopped in "
+                            "parallel: mongos first, then secondaries, then "
+                            "primaries, then config servers.",
             "function": "mongoctl.commands.server.stop.stop_command",
             "args":[
                     {   "name": "server",
                         "type" : "positional",
                         "nargs": 1,
                         "displayName": "SERVER_ID",
-                        "help": "A valid server id"
+                        "help": "A valid server or cluster id"
                 },
                     {   "name": "forceStop",
                         "type": "optional",
@@ -573,7 +604,10 @@ MONGOCTL_PARSER_DEF = {
             "prog": "tail-log",
             "group": "serverCommands",
             "shortDescription" : "tails a server's log file",
-            "description" : "Tails server's log file. Works only on local host",
+            "description" : "Tails server's log file. Works only on local host."
+                            "\nSeveral servers (or a cluster id for all its"
+                            " servers) can be tailed at once, in which case"
+                            " each line is prefixed with its server id",
             "function": "mongoctl.commands.server.tail_log.tail_log_command",
             "args": [
                     {
@@ -582,6 +616,59 @@ MONGOCTL_PARSER_DEF = {
                     "nargs": 1,
                     "displayName": "SERVER_ID",
                     "help": "a valid server id"
+                },
+                    {
+                    "name": "moreServers",
+                    "type" : "positional",
+                    "nargs": "*",
+                    "displayName": "[SERVER_ID ...]",
+                    "help": "more server (or cluster) ids"
+                },
+                    {
+                    "name": "lines",
+                    "type" : "optional",
+                    "displayName": "N",
+                    "cmd_arg": ["-n", "--lines"],
+                    "nargs": 1,
+                    "help": "number of last lines to show first (default 15)",
+                    "default": None
+                },
+                    {
+                    "name": "noFollow",
+                    "type" : "optional",
+                    "cmd_arg": "--no-follow",
+                    "nargs": 0,
+                    "help": "only show the last lines, do not follow the log",
+                    "default": False
+                },
+                    {
+                    "name": "severity",
+                    "type" : "optional",
+                    "displayName": "SEVERITY",
+                    "cmd_arg": "--severity",
+                    "nargs": 1,
+                    "help": "only show lines of this severity or higher "
+                            "(fatal, error, warning, info or debug)",
+                    "default": None
+                },
+                    {
+                    "name": "component",
+                    "type" : "optional",
+                    "displayName": "COMPONENT[,COMPONENT...]",
+                    "cmd_arg": "--component",
+                    "nargs": 1,
+                    "help": "only show lines of these log components (e.g. "
+                            "REPL,NETWORK)",
+                    "default": None
+                },
+                    {
+                    "name": "grep",
+                    "type" : "optional",
+                    "displayName": "REGEX",
+                    "cmd_arg": "--grep",
+                    "nargs": 1,
+                    "help": "only show lines matching this regular expression",
+                    "default": None
                 },
                     {
                     "name": "assumeLocal",
@@ -595,6 +682,94 @@ MONGOCTL_PARSER_DEF = {
             ]
         },
 
+        #### grep-log ####
+            {
+            "prog": "grep-log",
+            "group": "serverCommands",
+            "shortDescription" : "shows the logs of servers merged by time",
+            "description" : "Shows the log lines of the specified servers (or"
+                            " of all the servers of the specified clusters)"
+                            " merged in timestamp order, optionally only within"
+                            " a time window. Lines are prefixed with their"
+                            " server id when merging several logs. Only"
+                            " servers on local host are included",
+            "function": "mongoctl.commands.server.grep_log.grep_log_command",
+            "args": [
+                    {
+                    "name": "server",
+                    "type" : "positional",
+                    "nargs": 1,
+                    "displayName": "ID",
+                    "help": "a valid server or cluster id"
+                },
+                    {
+                    "name": "moreServers",
+                    "type" : "positional",
+                    "nargs": "*",
+                    "displayName": "[ID ...]",
+                    "help": "more server (or cluster) ids"
+                },
+                    {
+                    "name": "since",
+                    "type" : "optional",
+                    "displayName": "TIME",
+                    "cmd_arg": "--since",
+                    "nargs": 1,
+                    "help": "only show lines logged at or after TIME: "
+                            "relative (e.g. 10m, 2h, 1d ago) or a local "
+                            "date/time (e.g. 2016-01-06T10:00:00)",
+                    "default": None
+                },
+                    {
+                    "name": "until",
+                    "type" : "optional",
+                    "displayName": "TIME",
+                    "cmd_arg": "--until",
+                    "nargs": 1,
+                    "help": "only show lines logged at or before TIME",
+                    "default": None
+                },
+                    {
+                    "name": "severity",
+                    "type" : "optional",
+                    "displayName": "SEVERITY",
+                    "cmd_arg": "--severity",
+                    "nargs": 1,
+                    "help": "only show lines of this severity or higher "
+                            "(fatal, error, warning, info or debug)",
+                    "default": None
+                },
+                    {
+                    "name": "component",
+                    "type" : "optional",
+                    "displayName": "COMPONENT[,COMPONENT...]",
+                    "cmd_arg": "--component",
+                    "nargs": 1,
+                    "help": "only show lines of these log components (e.g. "
+                            "REPL,NETWORK)",
+                    "default": None
+                },
+                    {
+                    "name": "grep",
+                    "type" : "optional",
+                    "displayName": "REGEX",
+                    "cmd_arg": "--grep",
+                    "nargs": 1,
+                    "help": "only show lines matching this regular expression",
+                    "default": None
+                },
+                    {
+                    "name": "assumeLocal",
+                    "type" : "optional",
+                    "cmd_arg": "--assume-local",
+                    "nargs": 0,
+                    "help": "Assumes that the servers are running on local"
+                            " host. This will skip local address/dns check",
+                    "default": False
+                }
+            ]
+        },
+
         #### dump ####
             {
             "prog": "dump",
@@ -1081,6 +1256,88 @@ MONGOCTL_PARSER_DEF = {
             ]
         },
 
+        #### rolling-restart ####
+            {
+            "prog": "rolling-restart",
+            "group": "clusterCommands",
+            "shortDescription" : "restart a replica set without downtime",
+            "description" : "Restarts all members of a replica set cluster "
+                            "one batch at a time: secondaries first, each "
+                            "restart waiting for the member to be back as "
+                            "SECONDARY and caught up, then the primary "
+                            "after stepping it down.",
+            "function": "mongoctl.commands.cluster.rolling_restart.rolling_restart_command",
+            "args": [
+                    {
+                    "name": "cluster",
+                    "type" : "positional",
+                    "nargs": 1,
+                    "displayName": "CLUSTER_ID",
+                    "help": "A valid cluster id"
+                },
+
+                    {
+                    "name": "maxConcurrent",
+                    "type" : "optional",
+                    "displayName": "N",
+                    "cmd_arg":  ["--max-concurrent"],
+                    "nargs": 1,
+                    "help": "max number of secondaries to restart at a "
+                            "time (default 1). Capped so that a majority "
+                            "of voting members stays up",
+                    "default": None
+                },
+
+                    {
+                    "name": "maxReplLag",
+                    "type" : "optional",
+                    "displayName": "SECONDS",
+                    "cmd_arg":  ["--max-lag"],
+                    "nargs": 1,
+                    "help": "max repl lag (in seconds) a restarted member "
+                            "may have before moving on (default 10)",
+                    "default": None
+                },
+
+                    {   "name": "forceStop",
+                        "type": "optional",
+                        "cmd_arg": ["-f", "--force"],
+                        "nargs": 0,
+                        "help": "force stop/step down if needed",
+                        "default": False
+                },
+
+                    {
+                    "name": "assumeLocal",
+                    "type" : "optional",
+                    "cmd_arg": "--assume-local",
+                    "nargs": 0,
+                    "help": "Assumes that all members run on local host. "
+                            "This will skip local address/dns check",
+                    "default": False
+                },
+
+                    {
+                    "name": "username",
+                    "type" : "optional",
+                    "help": "admin username",
+                    "cmd_arg": [
+                        "-u"
+                    ],
+                    "nargs": 1
+                },
+                    {
+                    "name": "password",
+                    "type" : "optional",
+                    "help": "admin password",
+                    "cmd_arg": [
+                        "-p"
+                    ],
+                    "nargs": "?"
+                }
+            ]
+        },
+
         #### list-clusters ####
             {
             "prog": "list-clusters",
@@ -1220,6 +1477,22 @@ MONGOCTL_PARSER_DEF = {
             "function": "mongoctl.commands.misc.install.list_versions_command",
         },
 
+        #### ensure-indexes ####
+            {
+            "prog": "ensure-indexes",
+            "group": "adminCommands",
+            "shortDescription": "creates indexes used by mongoctl in the"
+                                " database repository",
+            "description": "Creates the indexes mongoctl lookups rely on in"
+                           " the collections of the databaseRepository"
+                           " configured in mongoctl.config (clusters,"
+                           " server activity and, if lastModifiedField is"
+                           " configured, servers). Existing indexes are"
+                           " left as is",
+            "function": "mongoctl.commands.misc.ensure_indexes."
+                        "ensure_indexes_command",
+        },
+
         #### install-mongodb ####
         {
             "prog": "publish-mongodb",
@@ -6,7 +6,6 @@ import traceback
 
 import logging
 
-import utils
 import mongoctl_globals
 
 from logging.handlers import TimedRotatingFileHandler
@@ -102,3 +101,8 @@ def stdout_log(msg):
 ###############################################################################
 def log_db_command(cmd):
     log_info( "Executing db command %s" % utils.document_pretty_string(cmd))
+
+###############################################################################
+# imported last: utils imports * from this module so when this module is
+# imported first all of the above must be defined by then
+import utils
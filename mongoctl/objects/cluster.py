@@ -74,6 +74,14 @@ class Cluster(DocumentWrapper):
     def has_member_server(self, server):
         return self.get_member_for(server) is not None
 
+    ###########################################################################
+    def contains_server(self, server):
+        """
+        Returns True if server is part of this cluster, directly or through
+         member clusters
+        """
+        return self.has_member_server(server)
+
     ###########################################################################
     def get_member_for(self, server):
         for member in self.get_members():
@@ -13,6 +13,14 @@ from mongoctl.mongoctl_logging import log_verbose, log_error, log_db_command
 
 from mongoctl.prompt import prompt_confirm
 
+from collections import OrderedDict
+
+###############################################################################
+# CONSTS
+###############################################################################
+# member states for which the repl lag is reported
+LAGGING_STATES = ["STARTUP2", "SECONDARY", "RECOVERING"]
+
 ###############################################################################
 # ReplicaSet Cluster Member Class
 ###############################################################################
@@ -62,6 +70,11 @@ class ReplicaSetClusterMember(DocumentWrapper):
     def get_priority(self):
         return self.get_property("priority")
 
+    ###########################################################################
+    def get_votes(self):
+        votes = self.get_property("votes")
+        return 1 if votes is None else votes
+
     ###########################################################################
     # Interface Methods
     ###########################################################################
@@ -299,18 +312,27 @@ class ReplicaSetCluster(Cluster):
 
     ###########################################################################
     def get_primary_member(self):
-        for member in self.get_members():
-            if member.get_server().is_primary():
+        members = self.get_members()
+        # probe all members concurrently so that dead members do not stall
+        # the lookup. First primary in members order wins
+        primaries = parallel_map(lambda m: m.get_server().is_primary(),
+                                 members)
+        for member, is_primary in zip(members, primaries):
+            if is_primary:
                 return member
 
         return None
 
     ###########################################################################
     def suggest_primary_member(self):
-        for member in self.get_members():
-            if(member.can_become_primary() and
-                       member.get_server() is not None and
-                   member.get_server().is_online_locally()):
+        candidates = filter(lambda m: (m.can_become_primary() and
+                                       m.get_server() is not None),
+                            self.get_members())
+
+        online = parallel_map(lambda m: m.get_server().is_online_locally(),
+                              candidates)
+        for member, is_online in zip(candidates, online):
+            if is_online:
                 return member
 
     ###########################################################################
@@ -323,25 +345,24 @@ class ReplicaSetCluster(Cluster):
 
         rs_config_members = primary_server.get_rs_config()['members']
 
-        master_status = primary_server.get_member_rs_status()
-        primary_server_address = master_status['name']
-        rs_status_members = primary_server.get_rs_status()['members']
+        lag_matrix = self.get_repl_lag_matrix(primary_server=primary_server)
+        primary_server_address = None
 
         other_members = []
-        for rs_status_m in rs_status_members:
-            if not rs_status_m.get("self", False):
-                address = rs_status_m.get("name")
+        for address, member_lag in lag_matrix.items():
+            if member_lag["self"]:
+                primary_server_address = address
+            else:
                 member = {
                     "address": address,
-                    "stateStr": rs_status_m.get("stateStr")
+                    "stateStr": member_lag["stateStr"]
                     #"uptime": utils.time_string(rs_status_m.get("uptime"))
                 }
-                if rs_status_m.get("errmsg", None):
-                    member['errmsg'] = rs_status_m['errmsg']
-                if rs_status_m.get("stateStr", None) in ["STARTUP2", "SECONDARY",
-                                               "RECOVERING"]:
-                    # compute lag
-                    lag_in_secs = get_member_repl_lag(rs_status_m, master_status)
+                if member_lag.get("errmsg"):
+                    member['errmsg'] = member_lag['errmsg']
+                if (member_lag["stateStr"] in LAGGING_STATES and
+                        member_lag["replLag"] is not None):
+                    lag_in_secs = member_lag["replLag"]
 
                     member['replLag'] = {
                         "value": lag_in_secs,
@@ -349,7 +370,7 @@ class ReplicaSetCluster(Cluster):
                     }
 
                 for rs_config_m in rs_config_members:
-                    if rs_config_m['host'] == rs_status_m['name']:
+                    if rs_config_m['host'] == address:
                         if rs_config_m.has_key("slaveDelay"):
                             member['slaveDelay'] = rs_config_m['slaveDelay']
                         if rs_config_m.get("priority", 1) != 1:
@@ -372,6 +393,82 @@ class ReplicaSetCluster(Cluster):
             "otherMembers": other_members
         }
 
+    ###########################################################################
+    def get_repl_lag_matrix(self, primary_server=None):
+        """
+        Returns the state, health and repl lag (in seconds, relative to the
+         primary) of all members as seen by the primary, computed from a
+         single replSetGetStatus. The result is an OrderedDict keyed by member
+         address (the 'name' in rs.status()) in rs.status() order:
+           { "<address>": {"stateStr": ..., "state": ..., "health": ...,
+                          "self": ..., "optimeDate": ..., "replLag": ...,
+                          "errmsg": ...} }
+         replLag is None for members with no optime (e.g. arbiters)
+        """
+        primary_server = primary_server or self.get_primary_server()
+        if not primary_server:
+            raise MongoctlException("Unable to determine primary member for"
+                                    " cluster '%s'" % self.id)
+
+        rs_status = primary_server.get_rs_status()
+        rs_status_members = rs_status and rs_status.get("members")
+        master_status = None
+        if rs_status_members:
+            master_status = filter(lambda m: m.get("self", False),
+                                   rs_status_members)
+            master_status = master_status and master_status[0]
+
+        if not master_status:
+            raise MongoctlException("Unable to determine replicaset status for"
+                                    " primary member '%s'" %
+                                    primary_server.id)
+
+        lag_matrix = OrderedDict()
+        for rs_status_m in rs_status_members:
+            repl_lag = None
+            if "optimeDate" in rs_status_m:
+                repl_lag = get_member_repl_lag(rs_status_m, master_status)
+
+            lag_matrix[rs_status_m["name"]] = {
+                "stateStr": rs_status_m.get("stateStr"),
+                "state": rs_status_m.get("state"),
+                "health": rs_status_m.get("health"),
+                "self": rs_status_m.get("self", False),
+                "optimeDate": rs_status_m.get("optimeDate"),
+                "replLag": repl_lag,
+                "errmsg": rs_status_m.get("errmsg")
+            }
+
+        return lag_matrix
+
+    ###########################################################################
+    def get_member_lag(self, member, lag_matrix):
+        """
+        Returns the repl lag of the specified member from the lag matrix.
+         Falls back to asking the member itself when it is not in the matrix
+         (e.g. configured with an address different than the one in the
+         replica set config)
+        """
+        member_lag = lag_matrix.get(member.get_host())
+        if member_lag and member_lag["replLag"] is not None:
+            return member_lag["replLag"]
+
+        log_verbose("Member '%s' not found in replica set status. Asking "
+                    "member for its lag." % member.get_server().id)
+        master_status = filter(lambda m: m["self"], lag_matrix.values())[0]
+        return member.get_server().get_repl_lag(master_status)
+
+    ###########################################################################
+    def _is_secondary_in_lag_matrix(self, member, lag_matrix):
+        """
+        Returns whether the member is a secondary as seen by the primary.
+         Falls back to asking the member itself when it is not in the matrix
+        """
+        member_status = lag_matrix.get(member.get_host())
+        if member_status:
+            return member_status["stateStr"] == "SECONDARY"
+        return member.get_server().is_secondary()
+
     ###########################################################################
     def get_dump_best_secondary(self, max_repl_lag=None):
         """
@@ -385,16 +482,12 @@ class ReplicaSetCluster(Cluster):
             raise MongoctlException("Unable to determine primary member for"
                                     " cluster '%s'" % self.id)
 
-        master_status = primary_member.get_server().get_member_rs_status()
-
-        if not master_status:
-            raise MongoctlException("Unable to determine replicaset status for"
-                                    " primary member '%s'" %
-                                    primary_member.get_server().id)
+        lag_matrix = self.get_repl_lag_matrix(
+            primary_server=primary_member.get_server())
 
         for member in self.get_members():
-            if member.get_server().is_secondary():
-                repl_lag = member.get_server().get_repl_lag(master_status)
+            if self._is_secondary_in_lag_matrix(member, lag_matrix):
+                repl_lag = self.get_member_lag(member, lag_matrix)
                 if max_repl_lag and  repl_lag > max_repl_lag:
                     log_info("Excluding member '%s' because it's repl lag "
                              "(in seconds)%s is more than max %s. " %
@@ -472,12 +565,15 @@ class ReplicaSetCluster(Cluster):
             log_db_command(init_cmd)
             primary_server.timeout_maybe_db_command(init_cmd, "admin")
 
+            # both waits below must be done within the init timeout
+            deadline = Deadline(60 * 10)
+
             # wait for replset to init
             def is_init():
                 return self.is_replicaset_initialized()
 
             log_info("Will now wait for the replica set to initialize.")
-            wait_for(is_init,timeout=60 * 10, sleep_duration=1)
+            wait_for(is_init, deadline=deadline, sleep_duration=1)
 
             if self.is_replicaset_initialized():
                 log_info("Successfully initiated replica set cluster '%s'!" %
@@ -496,7 +592,8 @@ class ReplicaSetCluster(Cluster):
 
             log_info("Will now wait for the intended primary server to "
                      "become primary.")
-            wait_for(is_primary_for_real,timeout=60, sleep_duration=1)
+            wait_for(is_primary_for_real, timeout=60, deadline=deadline,
+                     sleep_duration=1)
 
             if not is_primary_for_real():
                 msg = ("Timeout error: Waiting for server '%s' to become "
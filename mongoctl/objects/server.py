@@ -5,8 +5,12 @@ import os
 import mongoctl.repository as repository
 
 from base import DocumentWrapper
-from mongoctl.utils import resolve_path, document_pretty_string, is_host_local, timedelta_total_seconds
+from mongoctl.utils import (
+    resolve_path, document_pretty_string, is_host_local,
+    timedelta_total_seconds, probe_tcp_port, is_polling
+    )
 import pymongo
+from pymongo import uri_parser
 
 from pymongo.errors import AutoReconnect, OperationFailure, ConnectionFailure
 from mongoctl.mongoctl_logging import (
@@ -16,20 +20,28 @@ from mongoctl.mongoctl_logging import (
 
 from mongoctl.config import get_default_users
 from mongoctl.errors import MongoctlException, is_auth_error
-from mongoctl.prompt import read_username, read_password
+from mongoctl.prompt import read_username, read_password, get_prompt_lock
 
 from bson.son import SON
+from bson import json_util
 
 
 import datetime
+import time
+import errno
+import copy
+import json
+import threading
 
 from mongoctl import config
 from mongoctl import users
+from mongoctl import activity_log
 from mongoctl.mongodb_version import MongoDBEdition, make_version_info
 
 import ssl
 
 from mongoctl import mongo_utils
+from mongoctl.local_cache import PersistedCache
 
 ###############################################################################
 # CONSTANTS
@@ -55,6 +67,31 @@ CLIENT_SSL_MODE = None
 # a different "address" property of when making connections to servers
 USE_ALT_ADDRESS = None
 
+# A global config that is set through --reprobe option that will ignore
+# cached address reachability results and probe server addresses again
+FORCE_ADDRESS_REPROBE = False
+
+
+# Read only admin commands whose results can be served from the command
+# result cache
+CACHEABLE_COMMANDS = [
+    "isMaster",
+    "ismaster",
+    "replSetGetStatus",
+    "serverStatus"
+]
+
+# Commands that change the state of servers/replica sets and therefore
+# invalidate the command result cache
+CACHE_INVALIDATING_COMMANDS = [
+    "replSetInitiate",
+    "replSetReconfig",
+    "replSetStepDown",
+    "replSetFreeze",
+    "shutdown"
+]
+
+DEFAULT_COMMAND_RESULT_CACHE_TTL_MS = 1000
 
 ###############################################################################
 VERSION_2_6 = make_version_info("2.6.0")
@@ -152,18 +189,28 @@ class Server(DocumentWrapper):
         if self.get_client_ssl_mode() != ClientSslMode.PREFER:
             return False
 
+        address = self.get_connection_address()
+        use_ssl = get_negotiated_client_ssl(address, ClientSslMode.PREFER)
+        if use_ssl is not None:
+            return use_ssl
+
         log_debug("prefer_use_ssl() Checking if we prefer ssl for '%s'" %
                   self.id)
         try:
             self.new_ssl_test_mongo_client()
-            return True
+            use_ssl = True
         except (OperationFailure, AutoReconnect), ofe:
             log_exception(ofe)
-            return True
+            use_ssl = True
 
         except ConnectionFailure, ce:
             if "SSL handshake failed" in str(ce):
-                return False
+                use_ssl = False
+
+        if use_ssl is not None:
+            set_negotiated_client_ssl(address, ClientSslMode.PREFER, use_ssl)
+
+        return use_ssl
 
     ###########################################################################
     def get_default_key_file_path(self):
@@ -492,7 +539,48 @@ class Server(DocumentWrapper):
                 raise
 
     ###########################################################################
-    def db_command(self, cmd, dbname):
+    def db_command(self, cmd, dbname, use_cache=True):
+        """
+        :param use_cache: whether a cached result of a read only admin
+                          command can be returned. Cached results are never
+                          used when polling state in wait_for() predicates
+        """
+        cmd_name = get_command_name(cmd)
+
+        # read only admin commands are served from the command result cache
+        if cmd_name in CACHEABLE_COMMANDS:
+            cache_key = self._command_cache_key(cmd, dbname)
+            result = None
+            if use_cache and not is_polling():
+                result = get_cached_command_result(cache_key)
+            if result is not None:
+                log_debug("Server '%s': Using cached result of command '%s'"
+                          % (self.id, cmd_name))
+                return result
+
+            result = self._do_db_command(cmd, dbname)
+            set_cached_command_result(cache_key, result)
+            return result
+
+        if cmd_name in CACHE_INVALIDATING_COMMANDS:
+            # invalidate before and after since commands like shutdown do not
+            # return
+            invalidate_command_cache()
+            try:
+                return self._do_db_command(cmd, dbname)
+            finally:
+                invalidate_command_cache()
+
+        return self._do_db_command(cmd, dbname)
+
+    ###########################################################################
+    def _command_cache_key(self, cmd, dbname):
+        return "%s/%s/%s" % (self.get_connection_address(), dbname,
+                             json.dumps(cmd, sort_keys=True,
+                                        default=json_util.default))
+
+    ###########################################################################
+    def _do_db_command(self, cmd, dbname):
         # try without auth first if server allows it (i.e. version >= 3.0.0)
         if self.try_on_auth_failures():
             need_auth = False
@@ -504,7 +592,11 @@ class Server(DocumentWrapper):
         try:
             return db.command(cmd)
         except (RuntimeError,Exception), e:
-            if is_auth_error(e) and self.try_on_auth_failures():
+            # a cached auth state may be stale (e.g. the localhost exception
+            # no longer applies) so forget it and authenticate again
+            if is_auth_error(e) and (
+                    mongo_utils.forget_client_auth_states(db.client) or
+                    self.try_on_auth_failures()):
                 db = self.get_db(dbname, no_auth=False)
                 return db.command(cmd)
             else:
@@ -528,13 +620,18 @@ class Server(DocumentWrapper):
         if no_auth:
             return db
 
+        if username:
+            self.set_login_user(dbname, username, password)
+
+        # this client already authenticated to the db (or found it needs no
+        # auth) as the current login user
+        if self._get_auth_state(mongo_client, dbname) is not None:
+            return db
+
         if (not username and
                 (not self.needs_to_auth(dbname))):
             return db
 
-        if username:
-            self.set_login_user(dbname, username, password)
-
         login_user = self.get_login_user(dbname)
 
         # auth with local ?
@@ -543,7 +640,7 @@ class Server(DocumentWrapper):
         # if we have the system user then always auth with it
         if local_user and users.is_system_user(local_user["username"]) and dbname != "local":
             local_db = self.get_db("local", retry=retry)
-            return local_db.client.get_database(dbname)
+            return self._authenticated(local_db.client.get_database(dbname))
 
         is_system_user = (login_user and
                           users.is_system_user(login_user.get("username")))
@@ -559,7 +656,7 @@ class Server(DocumentWrapper):
              not self.supports_local_users())):
             # if this passes then we are authed!
             admin_db = self.get_db("admin", retry=retry)
-            return admin_db.client.get_database(dbname)
+            return self._authenticated(admin_db.client.get_database(dbname))
 
         # no retries on local db, so if we fail to auth to local we always
         # attempt to use admin
@@ -572,13 +669,35 @@ class Server(DocumentWrapper):
                 not auth_success
             and dbname != "admin"):
             admin_db = self.get_db("admin", retry=retry)
-            return admin_db.client.get_database(dbname)
+            return self._authenticated(admin_db.client.get_database(dbname))
 
         if auth_success:
-            return db
+            return self._authenticated(db)
         else:
             raise MongoctlException("Failed to authenticate to %s db" % dbname)
 
+    ###########################################################################
+    def _get_auth_state(self, client, dbname):
+        return mongo_utils.get_client_auth_state(
+            client, dbname, self._get_login_username(dbname))
+
+    ###########################################################################
+    def _set_auth_state(self, client, dbname, state):
+        mongo_utils.set_client_auth_state(
+            client, dbname, self._get_login_username(dbname), state)
+
+    ###########################################################################
+    def _authenticated(self, db):
+        self._set_auth_state(db.client, db.name, mongo_utils.AUTHENTICATED)
+        return db
+
+    ###########################################################################
+    def _get_login_username(self, dbname):
+        login_user = users.get_server_login_user(self, dbname)
+        if not login_user:
+            login_user = users.get_global_login_user(self, dbname)
+        return login_user and login_user.get("username")
+
     ###########################################################################
     def authenticate_db(self, db, dbname, retry=True):
         """
@@ -600,37 +719,58 @@ class Server(DocumentWrapper):
         # have three attempts to authenticate
         no_tries = 0
 
-        while not auth_success and no_tries < 3:
-            if not username:
-                username = read_username(dbname)
-            if not password:
-                password = self.lookup_password(dbname, username)
+        # held from the first prompt until the login is recorded so that
+        # servers sharing login users (e.g. members of a cluster stopped
+        # concurrently) prompt once and then reuse the first server's login
+        prompt_lock = None
+        try:
+            while not auth_success and no_tries < 3:
+                if not password and username:
+                    password = self.lookup_password(dbname, username)
+                if (not username or not password) and prompt_lock is None:
+                    prompt_lock = get_prompt_lock()
+                    prompt_lock.acquire()
+                    # another thread may have logged in meanwhile
+                    login_user = self.get_login_user(dbname)
+                    if (no_tries == 0 and login_user and
+                            login_user.get("password")):
+                        username = login_user["username"]
+                        password = login_user["password"]
+
+                if not username:
+                    username = read_username(dbname)
                 if not password:
-                    password = read_password("Enter password for user '%s\%s'"%
-                                             (dbname, username))
-
-            # if auth success then exit loop and memoize login
-            try:
-                auth_success = db.authenticate(username, password)
-                log_verbose("Authentication attempt #%s to db '%s' result: %s" % (no_tries, dbname, auth_success))
-            except OperationFailure, ofe:
-                if "auth fails" in str(ofe):
-                    auth_success = False
-
-            if auth_success or not retry:
-                break
+                    password = self.lookup_password(dbname, username)
+                    if not password:
+                        password = read_password("Enter password for user '%s\%s'"%
+                                                 (dbname, username))
+
+                # if auth success then exit loop and memoize login
+                try:
+                    mongo_utils.incr_client_auth_round_trips()
+                    auth_success = db.authenticate(username, password)
+                    log_verbose("Authentication attempt #%s to db '%s' result: %s" % (no_tries, dbname, auth_success))
+                except OperationFailure, ofe:
+                    if "auth fails" in str(ofe):
+                        auth_success = False
+
+                if auth_success or not retry:
+                    break
+                else:
+                    log_error("Invalid login!")
+                    username = None
+                    password = None
+
+                no_tries += 1
+
+            if auth_success:
+                self.set_login_user(dbname, username, password)
+                log_verbose("Authentication Succeeded!")
             else:
-                log_error("Invalid login!")
-                username = None
-                password = None
-
-            no_tries += 1
-
-        if auth_success:
-            self.set_login_user(dbname, username, password)
-            log_verbose("Authentication Succeeded!")
-        else:
-            log_verbose("Authentication failed")
+                log_verbose("Authentication failed")
+        finally:
+            if prompt_lock is not None:
+                prompt_lock.release()
 
         return auth_success
 
@@ -662,8 +802,12 @@ class Server(DocumentWrapper):
         start_date = datetime.datetime.now()
         result = False
         try:
-            self.new_default_mongo_client()
-            result = True
+            # fast path: no need for a client if nothing listens on the port
+            if self.is_port_closed():
+                result = False
+            else:
+                self.new_default_mongo_client()
+                result = True
         except (OperationFailure, AutoReconnect), ofe:
             log_exception(ofe)
             result = "refused" not in str(ofe)
@@ -716,11 +860,17 @@ class Server(DocumentWrapper):
         """
         log_debug("Checking if server '%s' needs to auth on  db '%s'...." %
                   (self.id, dbname))
+        client = self.get_mongo_client()
+        # i.e. the check already passed or the client authenticated
+        if self._get_auth_state(client, dbname) is not None:
+            return False
+
         try:
-            client = self.get_mongo_client()
             db = client.get_database(dbname)
+            mongo_utils.incr_client_auth_round_trips()
             db.collection_names()
             result = False
+            self._set_auth_state(client, dbname, mongo_utils.AUTH_NOT_NEEDED)
         except (RuntimeError,Exception), e:
             log_exception(e)
             result = "authorized" in str(e)
@@ -734,6 +884,13 @@ class Server(DocumentWrapper):
         status = {}
         ## check if the server is online
         try:
+            # fast path: no need for a client if nothing listens on the port
+            if self.is_port_closed():
+                raise ConnectionFailure("%s: [Errno %s] %s" %
+                                        (self.get_connection_address(),
+                                         errno.ECONNREFUSED,
+                                         os.strerror(errno.ECONNREFUSED)))
+
             self.new_default_mongo_client()
             status['connection'] = True
 
@@ -790,7 +947,15 @@ class Server(DocumentWrapper):
     ###########################################################################
     def new_default_mongo_client(self):
         client_params = self.get_client_params()
-        return self.new_mongo_client(**client_params)
+        try:
+            return self.new_mongo_client(**client_params)
+        except Exception:
+            # the negotiated ssl mode might not be valid anymore (e.g. server
+            # was restarted with different ssl settings) so renegotiate next
+            # time
+            forget_negotiated_client_ssl(self.get_connection_address(),
+                                         self.get_client_ssl_mode())
+            raise
 
     ###########################################################################
     def new_mongo_client(self, **kwargs):
@@ -799,7 +964,17 @@ class Server(DocumentWrapper):
         if self.connection_timeout_ms:
             kwargs["connectTimeoutMS"] = self.connection_timeout_ms
 
-        return mongo_utils.mongo_client(address, **kwargs)
+        return mongo_utils.get_mongo_client(
+            address, identity=self.get_client_identity(), validate=True,
+            **kwargs)
+
+    ###########################################################################
+    def get_client_identity(self):
+        """
+        Clients are shared only between servers that authenticate with the
+        same login users
+        """
+        return users.get_server_login_scope(self)
 
     ###########################################################################
     def new_ssl_test_mongo_client(self):
@@ -822,13 +997,42 @@ class Server(DocumentWrapper):
             use_ssl = False
         elif client_ssl_mode == ClientSslMode.REQUIRE:
             use_ssl = True
-        elif client_ssl_mode == ClientSslMode.ALLOW:
+        else:
+            use_ssl = self.negotiate_client_ssl(client_ssl_mode)
+
+        ssl_params = {}
+        if use_ssl:
+            ssl_params["ssl"] = True
+
+        return ssl_params
+
+
+    ###########################################################################
+    def negotiate_client_ssl(self, client_ssl_mode):
+        """
+        Determines if ssl should be used for ALLOW/PREFER client ssl modes.
+        The outcome is remembered per connection address so that the
+         negotiation connection attempt only happens once
+        """
+        address = self.get_connection_address()
+        use_ssl = get_negotiated_client_ssl(address, client_ssl_mode)
+        if use_ssl is not None:
+            log_debug("Using negotiated ssl=%s for '%s' (ssl mode '%s')" %
+                      (use_ssl, address, client_ssl_mode))
+            return use_ssl
+
+        # only remember outcomes that prove the server actually responded
+        negotiated = False
+        if client_ssl_mode == ClientSslMode.ALLOW:
             try:
                 # attempt a plain connection
                 self.new_mongo_client()
                 use_ssl = False
+                negotiated = True
             except Exception, e:
                 use_ssl = True
+                # servers that require ssl close plain connections
+                negotiated = "connection closed" in str(e)
 
         else:
             ## PREFER
@@ -836,15 +1040,15 @@ class Server(DocumentWrapper):
                 # attempt an ssl connection
                 self.new_ssl_test_mongo_client()
                 use_ssl = True
+                negotiated = True
             except Exception, e:
                 use_ssl = False
+                negotiated = "SSL handshake failed" in str(e)
 
-        ssl_params = {}
-        if use_ssl:
-            ssl_params["ssl"] = True
-
-        return ssl_params
+        if negotiated:
+            set_negotiated_client_ssl(address, client_ssl_mode, use_ssl)
 
+        return use_ssl
 
     ###########################################################################
     @property
@@ -864,11 +1068,14 @@ class Server(DocumentWrapper):
         # try to get the first working connection address
         # only use this technique if the server is not assumed locally
         if not is_assumed_local_server(self.id):
-            if (self.is_use_local() and
-                    self.has_connectivity_on(self.get_local_address())):
-                self._connection_address = self.get_local_address()
-            elif self.has_connectivity_on(self.get_address()):
-                self._connection_address = self.get_address()
+            candidates = []
+            if self.is_use_local():
+                candidates.append(self.get_local_address())
+            if self.get_address() is not None:
+                candidates.append(self.get_address())
+
+            self._connection_address = \
+                self.get_first_reachable_address(candidates)
 
         # use old logic
         if not self._connection_address:
@@ -882,13 +1089,79 @@ class Server(DocumentWrapper):
         return self._connection_address
 
 
+    ###########################################################################
+    def is_port_closed(self, address=None):
+        """
+        Fast pre-probe done before making a full client connection.
+        Returns True only if the server's port actively refused a raw tcp
+         connection
+        """
+        address = address or self.get_connection_address()
+        try:
+            # handles bare hosts (server's port) and [ipv6]:port addresses
+            host, port = uri_parser.parse_host(address, self.get_port())
+        except ValueError, e:
+            log_verbose("Not probing invalid address '%s' of server '%s': %s"
+                        % (address, self.id, e))
+            return False
+
+        start_time = time.time()
+        port_open = probe_tcp_port(host, int(port))
+        duration = time.time() - start_time
+
+        log_verbose("TCP probe for server '%s' on '%s': port %s (%.3f "
+                    "seconds)" % (self.id, address,
+                                  {True: "open", False: "closed"}.get(
+                                      port_open, "unknown"),
+                                  duration))
+
+        return port_open is False
+
+    ###########################################################################
+    def get_first_reachable_address(self, candidates):
+        """
+        Returns the first address in candidates that the server is reachable
+         on. Known reachability of addresses is looked up in the reachability
+         cache first. Results are recorded only when a reachable address is
+         found, i.e. nothing is learned about addresses of a server that is
+         down
+        """
+        unreachable = []
+        for address in candidates:
+            reachable = None
+            if not FORCE_ADDRESS_REPROBE:
+                reachable = get_cached_reachability(self.id, address)
+                if reachable is not None:
+                    log_verbose("Server '%s' is known to be %s on address "
+                                "'%s'" % (self.id,
+                                          "accessible" if reachable else
+                                          "inaccessible",
+                                          address))
+
+            if reachable is None:
+                reachable = self.has_connectivity_on(address)
+                if reachable:
+                    for unreachable_address in unreachable:
+                        set_cached_reachability(self.id, unreachable_address,
+                                                False)
+                    set_cached_reachability(self.id, address, True)
+
+            if reachable:
+                return address
+
+            unreachable.append(address)
+
     ###########################################################################
     def has_connectivity_on(self, address):
 
         try:
             log_verbose("Checking if server '%s' is accessible on "
                         "address '%s'" % (self.id, address))
-            mongo_utils.mongo_client(address)
+            if self.is_port_closed(address):
+                return False
+            mongo_utils.get_mongo_client(address,
+                                         identity=self.get_client_identity(),
+                                         validate=True)
             return True
         except Exception, e:
             log_exception(e)
@@ -954,13 +1227,13 @@ class Server(DocumentWrapper):
         if is_logging_activity():
             log_record = {"op": activity,
                           "ts": datetime.datetime.utcnow(),
-                          "serverDoc": self.get_document(),
                           "server": self.id,
                           "serverDisplayName": self.get_description()}
             log_verbose("Logging server activity \n%s" %
                         document_pretty_string(log_record))
 
-            repository.get_activity_collection().insert(log_record)
+            # written in the background. See activity_log
+            activity_log.log_activity(log_record, self.get_document())
 
     ###########################################################################
     def needs_repl_key(self):
@@ -1017,8 +1290,10 @@ class Server(DocumentWrapper):
 
 ###############################################################################
 def is_logging_activity():
-    return (repository.consulting_db_repository() and
-            config.get_mongoctl_config_val("logServerActivity" , False))
+    # activity is written to the db repository itself, not its snapshot.
+    # Records are spooled locally while it is offline
+    return (config.get_mongoctl_config_val("logServerActivity" , False) and
+            repository.has_db_repository())
 
 ###############################################################################
 __assumed_local_servers__ = []
@@ -1034,6 +1309,150 @@ def is_assumed_local_server(server_id):
     global __assumed_local_servers__
     return server_id in __assumed_local_servers__
 
+###############################################################################
+# Command result cache: short lived cache of read only admin command results
+# (e.g. isMaster) keyed by "<address>/<db>/<command>". Entries expire after
+# 'commandResultCacheTTLMS' milliseconds (defaults to
+# DEFAULT_COMMAND_RESULT_CACHE_TTL_MS, 0 disables the cache) and the whole
+# cache is invalidated by commands that change server/replica set state.
+# Polls of wait_for() predicates always bypass it
+__command_results__ = {}
+
+__command_results_lock__ = threading.Lock()
+
+def get_cached_command_result(key):
+    ttl_ms = config.get_command_result_cache_ttl_ms(
+        DEFAULT_COMMAND_RESULT_CACHE_TTL_MS)
+    if not ttl_ms:
+        return None
+
+    with __command_results_lock__:
+        entry = __command_results__.get(key)
+
+    if entry is not None:
+        result, ts = entry
+        if (time.time() - ts) * 1000 <= ttl_ms:
+            # callers may modify results so always hand out copies
+            return copy.deepcopy(result)
+
+###############################################################################
+def set_cached_command_result(key, result):
+    with __command_results_lock__:
+        __command_results__[key] = (copy.deepcopy(result), time.time())
+
+###############################################################################
+def invalidate_command_cache():
+    with __command_results_lock__:
+        __command_results__.clear()
+
+###############################################################################
+def get_command_name(cmd):
+    if cmd:
+        # SON keeps the command name first. Plain dicts are single key
+        # commands or have the command name as the only known key
+        if isinstance(cmd, SON):
+            return cmd.keys()[0]
+        for name in CACHEABLE_COMMANDS + CACHE_INVALIDATING_COMMANDS:
+            if name in cmd:
+                return name
+
+###############################################################################
+# Reachability cache: maps "<server id>/<address>" to whether the server was
+# reachable on that address. Entries are kept for the life of the process
+# (or 'reachabilityCacheTTL' seconds if configured, in which case they are
+# also persisted in the local cache)
+__address_reachability__ = {}
+
+__persisted_reachability_cache__ = None
+
+def get_cached_reachability(server_id, address):
+    key = _reachability_key(server_id, address)
+    entry = __address_reachability__.get(key)
+    ttl = config.get_reachability_cache_ttl()
+    if entry is not None:
+        reachable, ts = entry
+        if not ttl or time.time() - ts <= ttl:
+            return reachable
+
+    persisted_cache = _get_persisted_reachability_cache()
+    if persisted_cache:
+        reachable = persisted_cache.get(key)
+        if reachable is not None:
+            __address_reachability__[key] = (reachable, time.time())
+        return reachable
+
+###############################################################################
+def set_cached_reachability(server_id, address, reachable):
+    key = _reachability_key(server_id, address)
+    __address_reachability__[key] = (reachable, time.time())
+    persisted_cache = _get_persisted_reachability_cache()
+    if persisted_cache:
+        persisted_cache.put(key, reachable)
+
+###############################################################################
+def _reachability_key(server_id, address):
+    return "%s/%s" % (server_id, address)
+
+###############################################################################
+def _get_persisted_reachability_cache():
+    global __persisted_reachability_cache__
+    if __persisted_reachability_cache__ is None:
+        ttl = config.get_reachability_cache_ttl()
+        __persisted_reachability_cache__ = (
+            PersistedCache("reachability", ttl) if ttl else False)
+
+    return __persisted_reachability_cache__
+
+###############################################################################
+# Negotiated client ssl cache: maps "<address>/<ssl mode>" to whether ssl
+# should be used. Kept for the life of the process and also persisted in the
+# local cache when 'sslNegotiationCacheTTL' is configured
+__negotiated_client_ssl__ = {}
+
+__persisted_client_ssl_cache__ = None
+
+def get_negotiated_client_ssl(address, mode):
+    key = _negotiated_client_ssl_key(address, mode)
+    use_ssl = __negotiated_client_ssl__.get(key)
+    if use_ssl is None:
+        persisted_cache = _get_persisted_client_ssl_cache()
+        if persisted_cache:
+            use_ssl = persisted_cache.get(key)
+            if use_ssl is not None:
+                __negotiated_client_ssl__[key] = use_ssl
+
+    return use_ssl
+
+###############################################################################
+def set_negotiated_client_ssl(address, mode, use_ssl):
+    key = _negotiated_client_ssl_key(address, mode)
+    __negotiated_client_ssl__[key] = use_ssl
+    persisted_cache = _get_persisted_client_ssl_cache()
+    if persisted_cache:
+        persisted_cache.put(key, use_ssl)
+
+###############################################################################
+def forget_negotiated_client_ssl(address, mode):
+    key = _negotiated_client_ssl_key(address, mode)
+    if __negotiated_client_ssl__.pop(key, None) is not None:
+        persisted_cache = _get_persisted_client_ssl_cache()
+        if persisted_cache:
+            persisted_cache.remove(key)
+
+###############################################################################
+def _negotiated_client_ssl_key(address, mode):
+    return "%s/%s" % (address, mode)
+
+###############################################################################
+def _get_persisted_client_ssl_cache():
+    global __persisted_client_ssl_cache__
+    if __persisted_client_ssl_cache__ is None:
+        ttl = config.get_ssl_negotiation_cache_ttl()
+        __persisted_client_ssl_cache__ = (
+            PersistedCache("ssl-negotiation", ttl) if ttl else False)
+
+    return __persisted_client_ssl_cache__
+
 ###############################################################################
 def set_client_ssl_mode(mode):
     allowed_modes = [ClientSslMode.DISABLED,
@@ -49,6 +49,24 @@ class ShardedCluster(Cluster):
             if member.get_server().id == server.id:
                 return True
 
+    ###########################################################################
+    def contains_server(self, server):
+        """
+        Returns True if server is a mongos, a config server or a shard of
+         this cluster, or a member of a shard replica set
+        """
+        if self.has_member_server(server) or self.has_config_server(server):
+            return True
+
+        for shard_member in self.shards:
+            shard = shard_member.get_shard()
+            if ((isinstance(shard, Server) and shard.id == server.id) or
+                    (isinstance(shard, Cluster) and
+                     shard.contains_server(server))):
+                return True
+
+        return False
+
     ###########################################################################
     @property
     def shards(self):
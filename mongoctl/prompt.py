@@ -2,6 +2,7 @@ __author__ = 'abdul'
 
 import sys
 import getpass
+import threading
 
 from errors import MongoctlException
 ###############################################################################
@@ -18,6 +19,19 @@ def is_interactive_mode():
     global __interactive_mode__
     return __interactive_mode__
 
+###############################################################################
+# serializes prompts issued by concurrent threads (e.g. while stopping all
+# servers of a cluster) so that questions and answers do not interleave
+__prompt_lock__ = threading.RLock()
+
+###############################################################################
+def get_prompt_lock():
+    """
+    Returns the lock held while prompting. Hold it across a prompt and the
+     use of its answer to keep other threads from asking the same question
+    """
+    return __prompt_lock__
+
 ###############################################################################
 __say_yes_to_everything__ = False
 __say_no_to_everything__ = False
@@ -57,8 +71,9 @@ def read_input(message):
                "--noninteractive" % message)
         raise MongoctlException(msg)
 
-    print >> sys.stderr, message,
-    return raw_input()
+    with __prompt_lock__:
+        print >> sys.stderr, message,
+        return raw_input()
 
 ###############################################################################
 def read_username(dbname):
@@ -77,8 +92,9 @@ def read_password(message=''):
                " password using the -p option or run without --noninteractive")
         raise MongoctlException(msg)
 
-    print >> sys.stderr, message
-    return getpass.getpass()
+    with __prompt_lock__:
+        print >> sys.stderr, message
+        return getpass.getpass()
 
 
 ###############################################################################
@@ -108,14 +124,15 @@ def prompt_confirm(message):
                      "no":False,
                      "n":False}
 
-    while True:
-        print >> sys.stderr, message + " [y/n] ",
-        sys.stderr.flush()
-        choice = raw_input().lower()
-        if not valid_choices.has_key(choice):
-            print >> sys.stderr, ("Please respond with 'yes' or 'no' "
-                                  "(or 'y' or 'n').\n")
-        elif valid_choices[choice]:
-            return True
-        else:
-            return False
+    with __prompt_lock__:
+        while True:
+            print >> sys.stderr, message + " [y/n] ",
+            sys.stderr.flush()
+            choice = raw_input().lower()
+            if not valid_choices.has_key(choice):
+                print >> sys.stderr, ("Please respond with 'yes' or 'no' "
+                                      "(or 'y' or 'n').\n")
+            elif valid_choices[choice]:
+                return True
+            else:
+                return False
@@ -5,23 +5,29 @@ __author__ = 'abdul'
 import pymongo
 import pymongo.read_preferences
 import config
+import hashlib
+import threading
 
+from collections import OrderedDict, Mapping
 from bson import DBRef, json_util
 
 from errors import MongoctlException
 from mongoctl_logging import log_warning, log_verbose, log_info, log_exception
 from mongo_uri_tools import parse_mongo_uri
 from utils import (
-    resolve_class, document_pretty_string, is_valid_member_address, listify
+    resolve_class, document_pretty_string, is_valid_member_address, listify,
+    time_string, is_url
     )
+from repository_snapshot import RepositorySnapshot
+from file_repository import RepositoryManifest
 
 from mongodb_version import is_supported_mongo_version, is_valid_version
 from mongo_uri_tools import is_cluster_mongo_uri, mask_mongo_uri
 import mongo_utils
 
-DEFAULT_SERVERS_FILE = "servers.config"
+DEFAULT_SERVERS_FILE = config.DEFAULT_SERVERS_FILE
 
-DEFAULT_CLUSTERS_FILE = "clusters.config"
+DEFAULT_CLUSTERS_FILE = config.DEFAULT_CLUSTERS_FILE
 
 DEFAULT_SERVERS_COLLECTION = "servers"
 
@@ -36,6 +42,26 @@ LOOKUP_TYPE_SHARDS = "shards"
 LOOKUP_TYPE_ANY = [LOOKUP_TYPE_CONFIG_SVR, LOOKUP_TYPE_MEMBER,
                    LOOKUP_TYPE_SHARDS]
 
+# cluster index key for clusters (i.e. replica sets) used as shards
+INDEX_SHARD_CLUSTERS = "shardClusters"
+
+# db repository indexes created by ensure_db_repository_indexes(). Clusters
+# ones back db_lookup_cluster_by_server() and db_lookup_cluster_by_shard()
+CLUSTERS_COLLECTION_INDEXES = [
+    [("members.server.$id", pymongo.ASCENDING)],
+    [("configServers.server.$id", pymongo.ASCENDING)],
+    [("shards.server.$id", pymongo.ASCENDING)],
+    [("shards.cluster.$id", pymongo.ASCENDING)]
+]
+
+# server fields needed to list servers (see get_server_summary_projection())
+SERVER_SUMMARY_FIELDS = ["_type", "description", "address", "cmdOptions.port"]
+
+ACTIVITY_COLLECTION_INDEXES = [
+    [("server", pymongo.ASCENDING), ("ts", pymongo.DESCENDING)],
+    [("ts", pymongo.DESCENDING)]
+]
+
 ###############################################################################
 # Global variable: mongoctl's mongodb object
 __mongoctl_db__ = None
@@ -91,7 +117,8 @@ def has_commandline_servers_or_clusters():
 
 ###############################################################################
 def consulting_db_repository():
-    return has_db_repository() and is_db_repository_online()
+    return has_db_repository() and (get_db_repository_snapshot() is not None or
+                                    is_db_repository_online())
 
 ###############################################################################
 def is_db_repository_online():
@@ -104,7 +131,7 @@ def _db_repo_connect():
     uri = db_conf["databaseURI"]
     client_args = {"read_preference": pymongo.read_preferences.ReadPreference.PRIMARY_PREFERRED}
 
-    client = mongo_utils.mongo_client(uri, **client_args)
+    client = mongo_utils.get_mongo_client(uri, **client_args)
 
     return client
 
@@ -134,10 +161,15 @@ def set_commandline_servers_and_clusters(servers_json_str, clusters_json_str):
 ###############################################################################
 def clear_repository_cache():
     global __configured_servers__, __commandline_servers__, __configured_clusters__, __commandline_clusters__
+    global __configured_cluster_index__, __file_repository_manifest__
     __configured_servers__ = None
     __commandline_servers__ = None
     __configured_clusters__ = None
     __commandline_clusters__ = None
+    __configured_cluster_index__ = None
+    __file_repository_manifest__ = None
+    clear_db_preload()
+    clear_db_snapshot()
 
 ###############################################################################
 # Server lookup functions
@@ -174,6 +206,12 @@ def lookup_and_validate_server(server_id):
 
 ###############################################################################
 def db_lookup_server(server_id):
+    if get_db_repository_snapshot() is not None:
+        return get_db_snapshot_servers().get(server_id)
+
+    if server_id in __db_preloaded_servers__:
+        return __db_preloaded_servers__[server_id]
+
     server_collection = get_mongoctl_server_db_collection()
     server_doc = server_collection.find_one({"_id": server_id})
 
@@ -189,25 +227,44 @@ def config_lookup_server(server_id):
     return servers.get(server_id)
 
 ###############################################################################
-# returns all servers configured in both DB and config file
-def lookup_all_servers():
+# returns all servers configured in both DB and config file. With summaries,
+# servers of a split file repository are built from the summaries in its
+# manifest (enough to list them) instead of reading all their files
+def lookup_all_servers(summaries=False):
     validate_repositories()
 
     all_servers = {}
 
     if consulting_db_repository():
-        all_servers = db_lookup_all_servers()
+        all_servers = db_lookup_all_servers(summaries=summaries)
 
-    configured_servers = get_configured_servers()
+    if summaries and get_file_repository_manifest() is not None:
+        configured_servers = get_configured_server_summaries()
+    else:
+        configured_servers = get_configured_servers()
     all_servers = dict(configured_servers.items() + all_servers.items())
 
     return all_servers.values()
 
 ###############################################################################
-# returns servers saved in the db collection of servers
-def db_lookup_all_servers():
+# returns servers saved in the db collection of servers. With summaries, only
+# the fields needed to list them are fetched
+def db_lookup_all_servers(summaries=False):
+    if get_db_repository_snapshot() is not None:
+        return dict(get_db_snapshot_servers())
+
     servers = get_mongoctl_server_db_collection()
-    return new_servers_dict(servers.find())
+    projection = get_server_summary_projection() if summaries else None
+    return new_servers_dict(servers.find({}, projection))
+
+###############################################################################
+def get_server_summary_projection():
+    import objects.server
+    fields = list(SERVER_SUMMARY_FIELDS)
+    if objects.server.USE_ALT_ADDRESS:
+        fields.append(objects.server.USE_ALT_ADDRESS)
+
+    return dict((field, 1) for field in fields)
 
 ###############################################################################
 # Cluster lookup functions
@@ -246,6 +303,12 @@ def config_lookup_cluster(cluster_id):
 
 ###############################################################################
 def db_lookup_cluster(cluster_id):
+    if get_db_repository_snapshot() is not None:
+        return get_db_snapshot_clusters().get(cluster_id)
+
+    if cluster_id in __db_preloaded_clusters__:
+        return __db_preloaded_clusters__[cluster_id]
+
     cluster_collection = get_mongoctl_cluster_db_collection()
     cluster_doc = cluster_collection.find_one({"_id": cluster_id})
 
@@ -271,14 +334,27 @@ def lookup_all_clusters():
 ###############################################################################
 # returns a dictionary of (cluster_id, cluster) looked up from DB
 def db_lookup_all_clusters():
+    if get_db_repository_snapshot() is not None:
+        return dict(get_db_snapshot_clusters())
+
     clusters = get_mongoctl_cluster_db_collection()
     return new_replicaset_clusters_dict(clusters.find())
 
 ###############################################################################
 # Lookup by server id
 def db_lookup_cluster_by_server(server, lookup_type=LOOKUP_TYPE_ANY):
-    cluster_collection = get_mongoctl_cluster_db_collection()
     lookup_type = listify(lookup_type)
+    if get_db_repository_snapshot() is not None:
+        return index_lookup_cluster_by_server(get_db_snapshot_cluster_index(),
+                                              get_db_snapshot_clusters(),
+                                              server, lookup_type)
+
+    if server.id in __db_preloaded_referrers__:
+        return index_lookup_cluster_by_server(get_db_preloaded_cluster_index(),
+                                              __db_preloaded_clusters__,
+                                              server, lookup_type)
+
+    cluster_collection = get_mongoctl_cluster_db_collection()
     type_query =[]
     for t in lookup_type:
         prop_query = {"%s.server.$id" % t: server.id}
@@ -299,6 +375,14 @@ def db_lookup_cluster_by_server(server, lookup_type=LOOKUP_TYPE_ANY):
 ###############################################################################
 # Lookup by server id
 def db_lookup_cluster_by_shard(shard):
+    if get_db_repository_snapshot() is not None:
+        return index_lookup_cluster_by_shard(get_db_snapshot_cluster_index(),
+                                             get_db_snapshot_clusters(), shard)
+
+    if shard.id in __db_preloaded_referrers__:
+        return index_lookup_cluster_by_shard(get_db_preloaded_cluster_index(),
+                                             __db_preloaded_clusters__, shard)
+
     cluster_collection = get_mongoctl_cluster_db_collection()
 
     query = {
@@ -316,30 +400,33 @@ def db_lookup_cluster_by_shard(shard):
 
 ###############################################################################
 def config_lookup_cluster_by_server(server, lookup_type=LOOKUP_TYPE_ANY):
-    clusters = get_configured_clusters()
-    lookup_type = listify(lookup_type)
-
-    for t in lookup_type:
-        result = None
-        if t == LOOKUP_TYPE_MEMBER:
-            result = filter(lambda c: c.has_member_server(server),
-                            clusters.values())
-        elif t == LOOKUP_TYPE_CONFIG_SVR:
-            result = filter(lambda c: cluster_has_config_server(c, server),
-                            clusters.values())
-        elif t == LOOKUP_TYPE_SHARDS:
-            result = filter(lambda c: cluster_has_shard(c, server),
-                            clusters.values())
-        if result:
-            return result[0]
+    return index_lookup_cluster_by_server(get_configured_cluster_index(),
+                                          get_configured_clusters(),
+                                          server, lookup_type)
 
 ###############################################################################
 def config_lookup_cluster_by_shard(shard):
-    clusters = get_configured_clusters()
+    return index_lookup_cluster_by_shard(get_configured_cluster_index(),
+                                         get_configured_clusters(), shard)
+
+###############################################################################
+def index_lookup_cluster_by_server(cluster_index, clusters, server,
+                                   lookup_type=LOOKUP_TYPE_ANY):
+    for t in listify(lookup_type):
+        cluster_id = cluster_index[t].get(server.id)
+        if cluster_id is not None:
+            return clusters.get(cluster_id)
+
+###############################################################################
+def index_lookup_cluster_by_shard(cluster_index, clusters, shard):
+    from objects.server import Server
+    if isinstance(shard, Server):
+        cluster_id = cluster_index[LOOKUP_TYPE_SHARDS].get(shard.id)
+    else:
+        cluster_id = cluster_index[INDEX_SHARD_CLUSTERS].get(shard.id)
 
-    result = filter(lambda c: cluster_has_shard(c, shard), clusters.values())
-    if result:
-        return result[0]
+    if cluster_id is not None:
+        return clusters.get(cluster_id)
 
 ###############################################################################
 def cluster_has_config_server(cluster, server):
@@ -373,13 +460,13 @@ def get_configured_servers():
     global __configured_servers__, __commandline_servers__
 
     if __configured_servers__ is None:
-        __configured_servers__ = {}
-
         server_documents = []
-        if has_file_repository():
+        manifest = get_file_repository_manifest()
+        if manifest is None and has_file_repository():
             file_repo_conf = config.get_file_repository_conf()
             servers_path_or_url = file_repo_conf.get("servers",
                                                      DEFAULT_SERVERS_FILE)
+            prefetch_file_repository_urls()
 
             server_documents = config.read_config_json("servers",
                                                        servers_path_or_url)
@@ -391,13 +478,26 @@ def get_configured_servers():
         if __commandline_servers__:
             server_documents.extend(__commandline_servers__)
 
-        for document in server_documents:
-            server = new_server(document)
-            __configured_servers__[server.id] = server
+        if manifest is not None:
+            __configured_servers__ = FileDocumentObjectMap(
+                new_server, manifest.get_server_ids(),
+                manifest.read_server_document, server_documents)
+        else:
+            __configured_servers__ = DocumentObjectMap(new_server,
+                                                       server_documents)
 
     return __configured_servers__
 
 
+###############################################################################
+def prefetch_file_repository_urls():
+    # servers and clusters files are needed together most of the time
+    file_repo_conf = config.get_file_repository_conf()
+    config.prefetch_config_urls([
+        file_repo_conf.get("servers", DEFAULT_SERVERS_FILE),
+        file_repo_conf.get("clusters", DEFAULT_CLUSTERS_FILE)
+    ])
+
 ###############################################################################
 # Global variable: lazy loaded map that holds clusters read from config file
 __configured_clusters__ = None
@@ -408,13 +508,13 @@ def get_configured_clusters():
     global __configured_clusters__, __commandline_clusters__
 
     if __configured_clusters__ is None:
-        __configured_clusters__ = {}
-
         cluster_documents = []
-        if has_file_repository():
+        manifest = get_file_repository_manifest()
+        if manifest is None and has_file_repository():
             file_repo_conf = config.get_file_repository_conf()
             clusters_path_or_url = file_repo_conf.get("clusters",
                                                       DEFAULT_CLUSTERS_FILE)
+            prefetch_file_repository_urls()
 
             cluster_documents = config.read_config_json("clusters",
                                                         clusters_path_or_url)
@@ -424,12 +524,366 @@ def get_configured_clusters():
         if __commandline_clusters__:
             cluster_documents.extend(__commandline_clusters__)
 
-        for document in cluster_documents:
-            cluster = new_cluster(document)
-            __configured_clusters__[cluster.id] = cluster
+        if manifest is not None:
+            __configured_clusters__ = FileDocumentObjectMap(
+                new_cluster, manifest.get_cluster_ids(),
+                manifest.read_cluster_document, cluster_documents)
+        else:
+            __configured_clusters__ = DocumentObjectMap(new_cluster,
+                                                        cluster_documents)
 
     return __configured_clusters__
 
+###############################################################################
+# Global variable: lazy loaded index of configured clusters by the ids of the
+# servers/clusters they reference. See get_configured_cluster_index()
+__configured_cluster_index__ = None
+
+###############################################################################
+def get_configured_cluster_index():
+    """
+    Returns an index of configured clusters that maps:
+        LOOKUP_TYPE_MEMBER:     server id -> id of cluster having server as
+                                             member
+        LOOKUP_TYPE_CONFIG_SVR: server id -> id of cluster having server as
+                                             config server
+        LOOKUP_TYPE_SHARDS:     server id -> id of cluster having server as
+                                             shard
+        INDEX_SHARD_CLUSTERS:   cluster id -> id of cluster having cluster as
+                                              shard
+    The index is built once, from the cluster documents, when configured
+    clusters are loaded.
+    """
+    global __configured_cluster_index__
+
+    if __configured_cluster_index__ is None:
+        manifest = get_file_repository_manifest()
+        if manifest is not None:
+            # the manifest already has the refs of all cluster files
+            cluster_refs = manifest.get_cluster_refs()
+            for cluster_doc in __commandline_clusters__ or []:
+                cluster_refs.append((cluster_doc["_id"],
+                                     get_cluster_doc_refs(cluster_doc)))
+            __configured_cluster_index__ = build_cluster_ref_index(
+                cluster_refs)
+        else:
+            __configured_cluster_index__ = build_cluster_index(
+                get_configured_clusters().get_documents())
+
+    return __configured_cluster_index__
+
+###############################################################################
+def build_cluster_index(cluster_documents):
+    return build_cluster_ref_index(
+        [(cluster_doc["_id"], get_cluster_doc_refs(cluster_doc))
+         for cluster_doc in cluster_documents])
+
+###############################################################################
+def get_cluster_doc_refs(cluster_doc):
+    """
+    Returns a list of (cluster index key, id) of the servers/clusters the
+     cluster document references
+    """
+    refs = []
+
+    def add_ref(role, ref):
+        if isinstance(ref, DBRef):
+            refs.append((role, ref.id))
+
+    for member_doc in cluster_doc.get("members") or []:
+        add_ref(LOOKUP_TYPE_MEMBER, member_doc.get("server"))
+        # members configured by host get servers with the host as id
+        host = member_doc.get("host")
+        if host and not member_doc.get("server"):
+            refs.append((LOOKUP_TYPE_MEMBER, host))
+
+    for config_doc in cluster_doc.get("configServers") or []:
+        add_ref(LOOKUP_TYPE_CONFIG_SVR, config_doc.get("server"))
+
+    for shard_doc in cluster_doc.get("shards") or []:
+        add_ref(LOOKUP_TYPE_SHARDS, shard_doc.get("server"))
+        add_ref(INDEX_SHARD_CLUSTERS, shard_doc.get("cluster"))
+
+    return refs
+
+###############################################################################
+def build_cluster_ref_index(cluster_refs):
+    index = {
+        LOOKUP_TYPE_MEMBER: {},
+        LOOKUP_TYPE_CONFIG_SVR: {},
+        LOOKUP_TYPE_SHARDS: {},
+        INDEX_SHARD_CLUSTERS: {}
+    }
+
+    for cluster_id, refs in cluster_refs:
+        for role, ref_id in refs:
+            # first cluster wins, like the scans this index replaces
+            index[role].setdefault(ref_id, cluster_id)
+
+    return index
+
+###############################################################################
+# Global variable: lazy loaded manifest of the split file repository. See
+# get_file_repository_manifest()
+__file_repository_manifest__ = None
+
+###############################################################################
+def get_file_repository_manifest():
+    """
+    Returns the manifest of the file repository if it is a split one, i.e.
+     fileRepository.dir is set, or None otherwise
+    """
+    global __file_repository_manifest__
+
+    if __file_repository_manifest__ is None:
+        repo_dir = get_file_repository_dir()
+        if repo_dir is None:
+            return None
+        manifest = RepositoryManifest(repo_dir, get_cluster_doc_refs)
+        manifest.load()
+        __file_repository_manifest__ = manifest
+
+    return __file_repository_manifest__
+
+###############################################################################
+def get_file_repository_dir():
+    if not has_file_repository():
+        return None
+
+    repo_dir = config.get_file_repository_conf().get("dir")
+    if repo_dir is None:
+        return None
+
+    repo_dir = config.to_full_config_path(repo_dir)
+    if is_url(repo_dir):
+        raise MongoctlException("fileRepository dir '%s' must be a local "
+                                "directory" % repo_dir)
+    return repo_dir
+
+###############################################################################
+def get_configured_server_summaries():
+    server_documents = get_file_repository_manifest().get_server_summaries()
+    if __commandline_servers__:
+        server_documents.extend(__commandline_servers__)
+
+    return DocumentObjectMap(new_server, server_documents)
+
+###############################################################################
+# Global variables: servers/clusters preloaded from the db repository (None
+# for ids known not to be there) and ids whose referring clusters were
+# preloaded. See preload_db_repository()
+__db_preloaded_servers__ = {}
+
+__db_preloaded_clusters__ = OrderedDict()
+
+__db_preloaded_referrers__ = set()
+
+__db_preloaded_cluster_index__ = None
+
+###############################################################################
+def preload_db_repository(ids):
+    """
+    Loads the specified server/cluster ids from the db repository along with
+     everything reachable from them: servers and clusters referenced by
+     loaded clusters (members, configServers and shards) and clusters
+     referring to loaded servers/clusters. Each round issues one batched $in
+     query per collection and rounds go on until no new ids are found. Db
+     lookups of preloaded ids are then served from memory.
+    """
+    global __db_preloaded_cluster_index__
+
+    pending = set(i for i in listify(ids) if i is not None)
+    pending -= __db_preloaded_referrers__
+    if (not pending or not consulting_db_repository() or
+            not is_db_preload_enabled() or
+            get_db_repository_snapshot() is not None):
+        return
+
+    server_collection = get_mongoctl_server_db_collection()
+    cluster_collection = get_mongoctl_cluster_db_collection()
+
+    rounds = 0
+    while pending:
+        rounds += 1
+        batch = list(pending)
+        new_ids = set()
+
+        for server_id in batch:
+            __db_preloaded_servers__.setdefault(server_id, None)
+        for server_doc in server_collection.find({"_id": {"$in": batch}}):
+            __db_preloaded_servers__[server_doc["_id"]] = new_server(
+                server_doc)
+
+        # the clusters with these ids and the ones referring to them, except
+        # the ones loaded by previous rounds (their refs are known already)
+        query = [{"_id": {"$in": batch}}]
+        for ref_path in ["members.server.$id", "configServers.server.$id",
+                         "shards.server.$id", "shards.cluster.$id"]:
+            query.append({ref_path: {"$in": batch}})
+        loaded_ids = [cluster_id for cluster_id, cluster in
+                      __db_preloaded_clusters__.items() if cluster is not None]
+
+        loaded_clusters = list(cluster_collection.find({
+            "$or": query,
+            "_id": {"$nin": loaded_ids}
+        }))
+        for cluster_id in batch:
+            if cluster_id not in __db_preloaded_clusters__:
+                __db_preloaded_clusters__[cluster_id] = None
+        for cluster_doc in loaded_clusters:
+            cluster_id = cluster_doc["_id"]
+            if __db_preloaded_clusters__.get(cluster_id) is None:
+                __db_preloaded_clusters__[cluster_id] = new_cluster(
+                    cluster_doc)
+            new_ids.add(cluster_id)
+            new_ids.update(ref_id for role, ref_id in
+                           get_cluster_doc_refs(cluster_doc))
+
+        __db_preloaded_referrers__.update(batch)
+        pending = new_ids - __db_preloaded_referrers__
+
+    __db_preloaded_cluster_index__ = None
+    log_verbose("Preloaded %s servers and %s clusters from db repository in "
+                "%s round(s)" %
+                (len(filter(None, __db_preloaded_servers__.values())),
+                 len(filter(None, __db_preloaded_clusters__.values())),
+                 rounds))
+
+###############################################################################
+def is_db_preload_enabled():
+    return config.get_database_repository_conf().get("preload", True)
+
+###############################################################################
+def get_db_preloaded_cluster_index():
+    global __db_preloaded_cluster_index__
+
+    if __db_preloaded_cluster_index__ is None:
+        __db_preloaded_cluster_index__ = build_cluster_index(
+            [cluster.get_document() for cluster in
+             __db_preloaded_clusters__.values() if cluster is not None])
+
+    return __db_preloaded_cluster_index__
+
+###############################################################################
+def clear_db_preload():
+    global __db_preloaded_cluster_index__
+    __db_preloaded_servers__.clear()
+    __db_preloaded_clusters__.clear()
+    __db_preloaded_referrers__.clear()
+    __db_preloaded_cluster_index__ = None
+
+###############################################################################
+# Global variables: local snapshot of the db repository (False if not used)
+# and the servers/clusters read from it. See get_db_repository_snapshot()
+__db_snapshot__ = None
+
+__db_snapshot_servers__ = None
+
+__db_snapshot_clusters__ = None
+
+__db_snapshot_cluster_index__ = None
+
+###############################################################################
+def get_db_repository_snapshot():
+    """
+    Returns the local snapshot of the db repository to serve db lookups from
+     or None if db lookups should go to the db repository. The snapshot is
+     used as is if it is not older than databaseRepository.snapshotMaxStaleness
+     seconds, refreshed first if it is and the db repository is online, and
+     used regardless of its age if the db repository is offline.
+    """
+    global __db_snapshot__
+
+    if __db_snapshot__ is None:
+        __db_snapshot__ = False
+        if has_db_repository():
+            __db_snapshot__ = load_db_repository_snapshot() or False
+
+    return __db_snapshot__ or None
+
+###############################################################################
+def load_db_repository_snapshot():
+    db_conf = config.get_database_repository_conf()
+    max_staleness = db_conf.get("snapshotMaxStaleness")
+    if max_staleness is None:
+        return None
+
+    snapshot = RepositorySnapshot(
+        get_db_snapshot_name(),
+        db_conf.get("servers", DEFAULT_SERVERS_COLLECTION),
+        db_conf.get("clusters", DEFAULT_CLUSTERS_COLLECTION),
+        last_modified_field=db_conf.get("lastModifiedField"))
+    snapshot.load()
+
+    if snapshot.is_loaded() and snapshot.get_age() <= max_staleness:
+        log_verbose("Using db repository snapshot taken %s ago" %
+                    time_string(snapshot.get_age()))
+        return snapshot
+
+    if is_db_repository_online():
+        try:
+            snapshot.refresh(get_mongoctl_database())
+            snapshot.save()
+            return snapshot
+        except Exception, e:
+            log_exception(e)
+            log_warning("Unable to refresh db repository snapshot. Looking up"
+                        " db repository directly. Cause: %s" % e)
+            return None
+
+    if snapshot.is_loaded():
+        log_warning("Database repository is offline. Using db repository "
+                    "snapshot taken %s ago." % time_string(snapshot.get_age()))
+        return snapshot
+
+###############################################################################
+def get_db_snapshot_name():
+    db_conf = config.get_database_repository_conf()
+    repo_key = "%s|%s|%s" % (db_conf["databaseURI"],
+                             db_conf.get("servers", DEFAULT_SERVERS_COLLECTION),
+                             db_conf.get("clusters",
+                                         DEFAULT_CLUSTERS_COLLECTION))
+    return "db-repository-%s" % hashlib.md5(repo_key).hexdigest()
+
+###############################################################################
+def get_db_snapshot_servers():
+    global __db_snapshot_servers__
+
+    if __db_snapshot_servers__ is None:
+        __db_snapshot_servers__ = DocumentObjectMap(
+            new_server, get_db_repository_snapshot().get_server_docs())
+
+    return __db_snapshot_servers__
+
+###############################################################################
+def get_db_snapshot_clusters():
+    global __db_snapshot_clusters__
+
+    if __db_snapshot_clusters__ is None:
+        __db_snapshot_clusters__ = DocumentObjectMap(
+            new_cluster, get_db_repository_snapshot().get_cluster_docs())
+
+    return __db_snapshot_clusters__
+
+###############################################################################
+def get_db_snapshot_cluster_index():
+    global __db_snapshot_cluster_index__
+
+    if __db_snapshot_cluster_index__ is None:
+        __db_snapshot_cluster_index__ = build_cluster_index(
+            get_db_snapshot_clusters().get_documents())
+
+    return __db_snapshot_cluster_index__
+
+###############################################################################
+def clear_db_snapshot():
+    global __db_snapshot__, __db_snapshot_servers__, __db_snapshot_clusters__
+    global __db_snapshot_cluster_index__
+    __db_snapshot__ = None
+    __db_snapshot_servers__ = None
+    __db_snapshot_clusters__ = None
+    __db_snapshot_cluster_index__ = None
+
 ###############################################################################
 def validate_cluster(cluster):
     log_info("Validating cluster '%s'..." % cluster.id )
@@ -545,6 +999,44 @@ def get_activity_collection():
 
     return mongoctl_db[activity_coll_name]
 
+###############################################################################
+def get_activity_server_docs_collection():
+    """
+    Returns the collection holding the server docs referred to (by hash) by
+     activity records
+    """
+    return get_activity_collection()["serverDocs"]
+
+###############################################################################
+def ensure_db_repository_indexes():
+    """
+    Creates the indexes used by mongoctl in the db repository, if missing.
+     Returns a list of (collection name, index name)
+    """
+    clusters_collection = get_mongoctl_cluster_db_collection()
+    indexes = [(clusters_collection, keys)
+               for keys in CLUSTERS_COLLECTION_INDEXES]
+    indexes.extend((get_activity_collection(), keys)
+                   for keys in ACTIVITY_COLLECTION_INDEXES)
+
+    # incremental snapshot refreshes query by last modified
+    last_modified_field = config.get_database_repository_conf().get(
+        "lastModifiedField")
+    if last_modified_field:
+        for collection in [get_mongoctl_server_db_collection(),
+                           clusters_collection]:
+            indexes.append((collection,
+                            [(last_modified_field, pymongo.ASCENDING)]))
+
+    result = []
+    for collection, keys in indexes:
+        log_verbose("Ensuring index %s on collection '%s'" %
+                    (keys, collection.name))
+        index_name = collection.create_index(keys, background=True)
+        result.append((collection.name, index_name))
+
+    return result
+
 
 ###############################################################################
 # Factory Functions
@@ -686,3 +1178,84 @@ def replicaset_cluster_type():
 
 def sharded_cluster_type():
     return resolve_class("mongoctl.objects.sharded_cluster.ShardedCluster")
+
+###############################################################################
+# DocumentObjectMap Class
+###############################################################################
+class DocumentObjectMap(Mapping):
+    """
+    A read only map of _id -> object over a list of server/cluster documents.
+     Objects are created with the factory function on first access so that
+     looking up a few servers/clusters does not create all of them. Later
+     documents with the same _id replace earlier ones.
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self, factory, documents):
+        self._factory = factory
+        self._documents = OrderedDict()
+        self._objects = {}
+        self._lock = threading.Lock()
+        for document in documents:
+            self._documents[document["_id"]] = document
+
+    ###########################################################################
+    def __getitem__(self, key):
+        with self._lock:
+            obj = self._objects.get(key)
+            if obj is None:
+                obj = self._factory(self._get_document(key))
+                self._objects[key] = obj
+            return obj
+
+    ###########################################################################
+    def _get_document(self, key):
+        return self._documents[key]
+
+    ###########################################################################
+    def __contains__(self, key):
+        return key in self._documents
+
+    ###########################################################################
+    def __iter__(self):
+        return iter(self._documents)
+
+    ###########################################################################
+    def __len__(self):
+        return len(self._documents)
+
+    ###########################################################################
+    def get_documents(self):
+        return [self._get_document(key) for key in self._documents]
+
+###############################################################################
+# FileDocumentObjectMap Class
+###############################################################################
+class FileDocumentObjectMap(DocumentObjectMap):
+    """
+    A DocumentObjectMap over the files of a split file repository. Documents
+     are read from their files (with the read_document function) on first
+     access only. Extra documents (e.g. --servers) replace files with the
+     same _id.
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self, factory, ids, read_document, documents):
+        DocumentObjectMap.__init__(self, factory, [])
+        self._read_document = read_document
+        for key in ids:
+            self._documents[key] = None
+        for document in documents:
+            self._documents[document["_id"]] = document
+
+    ###########################################################################
+    def _get_document(self, key):
+        document = self._documents[key]
+        if document is None:
+            document = self._read_document(key)
+            self._documents[key] = document
+        return document
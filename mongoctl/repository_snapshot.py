@@ -0,0 +1,279 @@
+__author__ = 'abdul'
+
+import os
+import json
+import time
+
+import pymongo
+
+from bson import json_util
+
+from local_cache import get_cache_file_path, write_cache_file
+from mongoctl_logging import log_verbose, log_exception
+
+###############################################################################
+# CONSTS
+###############################################################################
+# bump when the snapshot file format changes so that old snapshots are ignored
+SNAPSHOT_VERSION = 1
+
+OPLOG_COLLECTION = "oplog.rs"
+
+# only what is needed to tell which docs changed: oplog insert entries hold
+# whole documents. Command fields are the ones that can drop/replace the
+# snapshot collections
+OPLOG_ENTRY_PROJECTION = {
+    "op": 1,
+    "ns": 1,
+    "o._id": 1,
+    "o2._id": 1,
+    "o.drop": 1,
+    "o.renameCollection": 1,
+    "o.to": 1,
+    "o.dropDatabase": 1,
+    "o.convertToCapped": 1,
+    "o.emptycapped": 1
+}
+
+###############################################################################
+# RepositorySnapshot Class
+###############################################################################
+class RepositorySnapshot(object):
+    """
+    A local copy of the servers and clusters collections of the db repository
+     kept as a json file in the cache dir. Refreshes are incremental when
+     possible: from the oplog of the repository database if it is readable,
+     otherwise from a last modified field of the docs if one is configured.
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self, name, servers_collection, clusters_collection,
+                 last_modified_field=None):
+        self._name = name
+        self._collection_names = {
+            "servers": servers_collection,
+            "clusters": clusters_collection
+        }
+        self._last_modified_field = last_modified_field
+        self._docs = {
+            "servers": {},
+            "clusters": {}
+        }
+        self._last_modified = {}
+        self._oplog_ts = None
+        self._refreshed_at = None
+
+    ###########################################################################
+    @property
+    def file_name(self):
+        return "%s.json" % self._name
+
+    ###########################################################################
+    def is_loaded(self):
+        return self._refreshed_at is not None
+
+    ###########################################################################
+    def get_age(self):
+        return time.time() - self._refreshed_at
+
+    ###########################################################################
+    def get_server_docs(self):
+        return self._docs["servers"].values()
+
+    ###########################################################################
+    def get_cluster_docs(self):
+        return self._docs["clusters"].values()
+
+    ###########################################################################
+    def load(self):
+        file_path = get_cache_file_path(self.file_name)
+        if not os.path.exists(file_path):
+            return False
+        try:
+            with open(file_path) as snapshot_file:
+                data = json.load(snapshot_file,
+                                 object_hook=json_util.object_hook)
+            if (data.get("version") != SNAPSHOT_VERSION or
+                    data.get("lastModifiedField") !=
+                    self._last_modified_field):
+                log_verbose("Ignoring outdated db repository snapshot '%s'" %
+                            file_path)
+                return False
+
+            for name in self._docs:
+                self._docs[name] = dict((doc["_id"], doc)
+                                        for doc in data[name])
+            self._last_modified = data.get("lastModified") or {}
+            self._oplog_ts = data.get("oplogTs")
+            self._refreshed_at = data["refreshedAt"]
+            return True
+        except Exception, e:
+            log_exception(e)
+            log_verbose("Ignoring unreadable db repository snapshot '%s'. "
+                        "Cause: %s" % (file_path, e))
+            return False
+
+    ###########################################################################
+    def save(self):
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "refreshedAt": self._refreshed_at,
+            "oplogTs": self._oplog_ts,
+            "lastModifiedField": self._last_modified_field,
+            "lastModified": self._last_modified,
+            "servers": self.get_server_docs(),
+            "clusters": self.get_cluster_docs()
+        }
+        write_cache_file(self.file_name,
+                         json.dumps(data, default=json_util.default))
+
+    ###########################################################################
+    def refresh(self, db):
+        """
+        Brings the snapshot up to date with the specified repository database
+        """
+        refreshed_at = time.time()
+        # read the oplog position before the collections so that changes
+        # made while refreshing are picked up by the next refresh
+        oplog_ts = get_latest_oplog_ts(db)
+
+        if not self.is_loaded():
+            how = "full"
+        elif (oplog_ts is not None and self._oplog_ts is not None and
+                self._refresh_from_oplog(db, oplog_ts)):
+            how = "oplog"
+        elif self._last_modified_field:
+            self._refresh_from_last_modified(db)
+            how = "last modified"
+        else:
+            how = "full"
+
+        if how == "full":
+            self._reload(db)
+
+        self._oplog_ts = oplog_ts
+        self._refreshed_at = refreshed_at
+        log_verbose("Refreshed db repository snapshot (%s): %s servers, %s "
+                    "clusters" % (how, len(self._docs["servers"]),
+                                  len(self._docs["clusters"])))
+
+    ###########################################################################
+    def _reload(self, db):
+        for name, collection_name in self._collection_names.items():
+            docs = list(db[collection_name].find())
+            self._docs[name] = dict((doc["_id"], doc) for doc in docs)
+            self._update_last_modified(name, docs)
+
+    ###########################################################################
+    def _refresh_from_oplog(self, db, oplog_ts):
+        """
+        Re-reads the docs touched since the last refresh according to the
+         oplog. Returns False if that is not possible (e.g. the oplog rolled
+         over since the last refresh)
+        """
+        oplog = db.client.local[OPLOG_COLLECTION]
+        oldest = list(oplog.find({}, {"ts": 1}).
+                      sort("$natural", pymongo.ASCENDING).limit(1))
+        if not oldest or oldest[0]["ts"] > self._oplog_ts:
+            log_verbose("Oplog rolled over since last db repository snapshot"
+                        " refresh")
+            return False
+
+        namespaces = dict(("%s.%s" % (db.name, collection_name), name)
+                          for name, collection_name in
+                          self._collection_names.items())
+        changed_ids = dict((name, set()) for name in self._docs)
+        query = {
+            "ts": {"$gt": self._oplog_ts, "$lte": oplog_ts},
+            "ns": {"$in": namespaces.keys() + ["%s.$cmd" % db.name]}
+        }
+
+        for entry in oplog.find(query, OPLOG_ENTRY_PROJECTION):
+            if entry["op"] == "c":
+                # collection dropped/renamed/etc.
+                if self._is_snapshot_command(entry["o"], namespaces):
+                    return False
+                continue
+            doc = entry.get("o2") if entry["op"] == "u" else entry.get("o")
+            if doc and "_id" in doc:
+                changed_ids[namespaces[entry["ns"]]].add(doc["_id"])
+
+        for name, ids in changed_ids.items():
+            self._refetch(db, name, ids)
+
+        return True
+
+    ###########################################################################
+    def _is_snapshot_command(self, command, namespaces):
+        if "dropDatabase" in command:
+            return True
+        names = set(self._collection_names.values()) | set(namespaces.keys())
+        return any(isinstance(value, basestring) and value in names
+                   for value in command.values())
+
+    ###########################################################################
+    def _refresh_from_last_modified(self, db):
+        """
+        Re-reads the docs modified since the last refresh and drops the ones
+         that no longer exist
+        """
+        field = self._last_modified_field
+        for name, collection_name in self._collection_names.items():
+            collection = db[collection_name]
+            docs = self._docs[name]
+
+            # $gte: docs modified within the same instant as the last refresh
+            # may have been missed by it
+            last_modified = self._last_modified.get(name)
+            query = {}
+            if last_modified is not None:
+                query = {field: {"$gte": last_modified}}
+            modified_docs = list(collection.find(query))
+            for doc in modified_docs:
+                docs[doc["_id"]] = doc
+            self._update_last_modified(name, modified_docs)
+
+            existing_ids = set(doc["_id"] for doc in
+                               collection.find({}, {"_id": 1}))
+            for doc_id in docs.keys():
+                if doc_id not in existing_ids:
+                    del docs[doc_id]
+
+    ###########################################################################
+    def _refetch(self, db, name, ids):
+        if not ids:
+            return
+        docs = self._docs[name]
+        collection = db[self._collection_names[name]]
+        for doc_id in ids:
+            docs.pop(doc_id, None)
+        for doc in collection.find({"_id": {"$in": list(ids)}}):
+            docs[doc["_id"]] = doc
+
+    ###########################################################################
+    def _update_last_modified(self, name, docs):
+        field = self._last_modified_field
+        if not field:
+            return
+        values = [doc[field] for doc in docs if doc.get(field) is not None]
+        if self._last_modified.get(name) is not None:
+            values.append(self._last_modified[name])
+        if values:
+            self._last_modified[name] = max(values)
+
+###############################################################################
+def get_latest_oplog_ts(db):
+    """
+    Returns the ts of the latest oplog entry of the specified db's server or
+     None if the oplog is not readable (e.g. not a replica set, no access)
+    """
+    try:
+        oplog = db.client.local[OPLOG_COLLECTION]
+        latest = list(oplog.find({}, {"ts": 1}).
+                      sort("$natural", pymongo.DESCENDING).limit(1))
+        if latest:
+            return latest[0]["ts"]
+    except Exception, e:
+        log_verbose("Unable to read oplog of db repository. Cause: %s" % e)
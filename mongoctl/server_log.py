@@ -0,0 +1,549 @@
+__author__ = 'abdul'
+
+import os
+import re
+import sys
+import time
+import heapq
+import calendar
+import threading
+
+from collections import OrderedDict
+
+from errors import MongoctlException
+from mongoctl_logging import log_verbose, log_exception
+
+###############################################################################
+# CONSTS
+###############################################################################
+# seconds between checks for new log lines (a read and a couple of stat
+# calls per followed file)
+FOLLOW_POLL_INTERVAL = 0.1
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# when showing the last lines of a log, at most this much of the end of the
+# file is read looking for lines that match the filter
+MAX_BACKWARD_SCAN_BYTES = 64 * 1024 * 1024
+
+# severities from most to least severe as logged by mongod >= 3.0
+SEVERITIES = ["F", "E", "W", "I", "D"]
+
+SEVERITY_NAMES = OrderedDict([
+    ("fatal", "F"),
+    ("error", "E"),
+    ("warning", "W"),
+    ("info", "I"),
+    ("debug", "D")
+])
+
+# "<timestamp> <severity> <component> [<context>] <message>"
+TEXT_LOG_LINE_PATTERN = re.compile(r"^\S+\s+([FEWID])\d?\s+(\S+)\s+\[")
+
+# structured logs (mongod >= 4.4)
+JSON_LOG_SEVERITY_PATTERN = re.compile(r'"s"\s*:\s*"([FEWID])\d?"')
+
+JSON_LOG_COMPONENT_PATTERN = re.compile(r'"c"\s*:\s*"([^"]+)"')
+
+# leading timestamp of text logs in iso8601-local/iso8601-utc format
+# (mongod >= 2.6), e.g. "2016-01-06T10:00:00.123+0000"
+ISO_TIMESTAMP_PATTERN = re.compile(
+    r"^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d+))?"
+    r"(Z|[+-]\d{2}:?\d{2})?")
+
+# leading timestamp of text logs in ctime format (older mongods), e.g.
+# "Wed Jan  6 10:00:00.123"
+CTIME_TIMESTAMP_PATTERN = re.compile(
+    r"^\w{3} (\w{3}) +(\d+) (\d{2}):(\d{2}):(\d{2})(?:\.(\d+))?")
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep",
+          "Oct", "Nov", "Dec"]
+
+JSON_LOG_TIMESTAMP_PATTERN = re.compile(r'"\$date"\s*:\s*"([^"]+)"')
+
+# relative time args, e.g. "10m" for 10 minutes ago
+RELATIVE_TIME_PATTERN = re.compile(r"^(\d+)([smhd])$")
+
+TIME_UNITS = {
+    "s": 1,
+    "m": 60,
+    "h": 60 * 60,
+    "d": 24 * 60 * 60
+}
+
+# a time window is located in a log by bisecting it until the range left is
+# this small, then reading on from there
+BISECT_MIN_RANGE = 64 * 1024
+
+# lines read from a bisection point looking for a timestamp
+BISECT_MAX_LINES = 100
+
+# mongod/mongos log this as soon as they accept connections
+READY_LOG_PATTERN = re.compile(r"waiting for connections", re.IGNORECASE)
+
+# startup errors after which the server will not come up
+FATAL_LOG_PATTERN = re.compile("|".join([
+    r"address already in use",
+    r"unable to lock file",
+    r"unable to create/open lock file",
+    r"another mongod instance is already running",
+    r"exception in initAndListen",
+    r"fatal assertion",
+    r"aborting after fassert"
+]), re.IGNORECASE)
+
+###############################################################################
+# LogFollower Class
+###############################################################################
+class LogFollower(object):
+    """
+    Follows a log file from a background thread and calls line_callback with
+     each new line (without the line break). Copes with the file not
+     existing yet and with it being truncated or replaced (e.g. rotated, or
+     moved aside by a mongod started without --logappend), in which case
+     the rest of the old file is read before moving on to the new one.
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self, path, line_callback, from_end=True, last_lines=0,
+                 line_filter=None):
+        """
+        :param from_end: only follow what is logged from now on
+        :param last_lines: when from_end, first pass that many of the last
+                           lines of the file to line_callback
+        :param line_filter: a LogLineFilter. Only matching lines are passed
+                            to line_callback
+        """
+        self._path = path
+        self._line_callback = line_callback
+        self._last_lines = last_lines
+        self._line_filter = line_filter or LogLineFilter()
+        self._line_matcher = self._line_filter.new_matcher()
+        self._file = None
+        self._partial_line = ""
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._open(seek_end=from_end)
+
+    ###########################################################################
+    def start(self):
+        if self._file is not None and self._last_lines:
+            self._show_last_lines()
+
+        self._thread = threading.Thread(target=self._run,
+                                        name="log-follower")
+        self._thread.daemon = True
+        self._thread.start()
+
+    ###########################################################################
+    def stop(self):
+        """
+        Stops following after handling the lines written so far
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._close()
+
+    ###########################################################################
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._follow()
+            self._stop_event.wait(FOLLOW_POLL_INTERVAL)
+        self._follow()
+
+    ###########################################################################
+    def _follow(self):
+        try:
+            self._read_new_lines()
+            if self._is_replaced():
+                # finish the old file first
+                self._read_new_lines()
+                log_verbose("Log file '%s' was replaced. Following the new "
+                            "one" % self._path)
+                self._close()
+                self._open(seek_end=False)
+                self._read_new_lines()
+        except Exception, e:
+            log_exception(e)
+            log_verbose("Error while following log file '%s': %s" %
+                        (self._path, e))
+
+    ###########################################################################
+    def _read_new_lines(self):
+        if self._file is None:
+            self._open(seek_end=False)
+            if self._file is None:
+                return
+
+        # truncated in place (e.g. copytruncate rotation)
+        if os.fstat(self._file.fileno()).st_size < self._file.tell():
+            self._file.seek(0)
+            self._partial_line = ""
+
+        while True:
+            data = self._file.read(READ_CHUNK_SIZE)
+            if not data:
+                break
+            lines = (self._partial_line + data).split("\n")
+            self._partial_line = lines.pop()
+            for line in lines:
+                line = line.rstrip("\r")
+                if self._line_matcher(line):
+                    self._line_callback(line)
+
+    ###########################################################################
+    def _show_last_lines(self):
+        end = self._file.tell()
+        lines, self._line_matcher, self._partial_line = read_last_lines(
+            self._file, end, self._last_lines, self._line_filter)
+        for line in lines:
+            self._line_callback(line)
+        self._file.seek(end)
+
+    ###########################################################################
+    def _is_replaced(self):
+        if self._file is None:
+            return False
+        try:
+            path_stat = os.stat(self._path)
+        except OSError:
+            # moved aside and not recreated yet
+            return False
+        file_stat = os.fstat(self._file.fileno())
+        return ((path_stat.st_dev, path_stat.st_ino) !=
+                (file_stat.st_dev, file_stat.st_ino))
+
+    ###########################################################################
+    def _open(self, seek_end):
+        try:
+            self._file = open(self._path)
+        except IOError:
+            # not created yet
+            self._file = None
+            return
+        self._partial_line = ""
+        if seek_end:
+            self._file.seek(0, os.SEEK_END)
+
+    ###########################################################################
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+###############################################################################
+def read_last_lines(log_file, end, count, line_filter):
+    """
+    Returns (the last count lines before offset end that match line_filter,
+     the filter's matcher as of end, the partial line at end). Reads backwards from end in growing
+     blocks so that only about as much of the file as needed is read, and no
+     more than MAX_BACKWARD_SCAN_BYTES.
+    """
+    block_size = READ_CHUNK_SIZE
+    while True:
+        start = max(0, end - block_size)
+        log_file.seek(start)
+        lines = log_file.read(end - start).split("\n")
+        partial_line = lines.pop()
+        if start > 0:
+            # may be partial
+            lines.pop(0)
+
+        matcher = line_filter.new_matcher()
+        matching = [line.rstrip("\r") for line in lines
+                    if matcher(line.rstrip("\r"))]
+
+        if (len(matching) >= count or start == 0 or
+                block_size >= MAX_BACKWARD_SCAN_BYTES):
+            return matching[-count:], matcher, partial_line
+
+        block_size *= 4
+
+###############################################################################
+# LogLineFilter Class
+###############################################################################
+class LogLineFilter(object):
+    """
+    Selects log lines by min severity, component and/or regex. Severity and
+     component are read from mongod >= 3.0 text logs and from structured
+     (json) logs. Lines they cannot be read from (e.g. the continuation lines
+     of a multi line message) go with the line before them.
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self, min_severity=None, components=None, pattern=None):
+        self._max_severity_rank = None
+        if min_severity:
+            self._max_severity_rank = SEVERITIES.index(
+                parse_severity(min_severity))
+        self._components = (set(c.upper() for c in components)
+                            if components else None)
+        self._pattern = re.compile(pattern) if pattern else None
+
+    ###########################################################################
+    def new_matcher(self):
+        """
+        Returns a function telling whether each line (to be passed in order)
+         matches
+        """
+        if self._max_severity_rank is None and self._components is None:
+            if self._pattern is None:
+                return lambda line: True
+            return lambda line: self._pattern.search(line) is not None
+
+        state = {"lastMatch": False}
+
+        def matches(line):
+            severity, component = parse_log_line(line)
+            if severity is None:
+                match = state["lastMatch"]
+            else:
+                match = ((self._max_severity_rank is None or
+                          SEVERITIES.index(severity) <=
+                          self._max_severity_rank) and
+                         (self._components is None or
+                          component.upper() in self._components))
+                state["lastMatch"] = match
+
+            return match and (self._pattern is None or
+                              self._pattern.search(line) is not None)
+
+        return matches
+
+###############################################################################
+def parse_log_line(line):
+    """
+    Returns (severity letter, component) of the log line or (None, None) if
+     the line does not carry them
+    """
+    if line.startswith("{"):
+        severity = JSON_LOG_SEVERITY_PATTERN.search(line)
+        component = JSON_LOG_COMPONENT_PATTERN.search(line)
+        if severity and component:
+            return severity.group(1), component.group(1)
+    else:
+        match = TEXT_LOG_LINE_PATTERN.match(line)
+        if match:
+            return match.group(1), match.group(2)
+
+    return None, None
+
+###############################################################################
+def parse_severity(severity):
+    value = SEVERITY_NAMES.get(severity.lower(), severity.upper())
+    if value not in SEVERITIES:
+        raise MongoctlException("Invalid severity '%s'. Must be one of %s" %
+                                (severity, ", ".join(SEVERITY_NAMES.keys())))
+    return value
+
+###############################################################################
+# Log timestamps and merging
+###############################################################################
+def parse_log_timestamp(line):
+    """
+    Returns the timestamp (seconds since epoch) the log line starts with or
+     None if it does not start with one (e.g. continuation lines)
+    """
+    if line.startswith("{"):
+        match = JSON_LOG_TIMESTAMP_PATTERN.search(line)
+        return parse_iso_timestamp(match.group(1)) if match else None
+
+    timestamp = parse_iso_timestamp(line)
+    if timestamp is None:
+        timestamp = _parse_ctime_timestamp(line)
+    return timestamp
+
+###############################################################################
+def parse_iso_timestamp(value):
+    match = ISO_TIMESTAMP_PATTERN.match(value)
+    if not match:
+        return None
+
+    (year, month, day, hour, minute, second,
+     fraction, tz) = match.groups()
+    fields = (int(year), int(month), int(day), int(hour), int(minute),
+              int(second), 0, 0, -1)
+    if tz is None:
+        timestamp = time.mktime(fields)
+    else:
+        timestamp = calendar.timegm(fields)
+        if tz != "Z":
+            offset = int(tz[1:3]) * 3600 + int(tz[-2:]) * 60
+            timestamp -= offset if tz[0] == "+" else -offset
+
+    return timestamp + float("0." + fraction) if fraction else timestamp
+
+###############################################################################
+def _parse_ctime_timestamp(line):
+    match = CTIME_TIMESTAMP_PATTERN.match(line)
+    if not match or match.group(1) not in MONTHS:
+        return None
+
+    month, day, hour, minute, second, fraction = match.groups()
+    # ctime timestamps have no year. Assume the current one
+    timestamp = time.mktime((time.localtime().tm_year,
+                             MONTHS.index(month) + 1, int(day), int(hour),
+                             int(minute), int(second), 0, 0, -1))
+    return timestamp + float("0." + fraction) if fraction else timestamp
+
+###############################################################################
+def parse_time_arg(value):
+    """
+    Returns the timestamp of a time arg: either relative to now (e.g. "10m",
+     "2h") or a date/time like "2016-01-06T10:00:00" (local time unless a
+     zone is given) or "2016-01-06"
+    """
+    match = RELATIVE_TIME_PATTERN.match(value)
+    if match:
+        return time.time() - int(match.group(1)) * TIME_UNITS[match.group(2)]
+
+    if re.match(r"^\d{4}-\d{2}-\d{2}$", value):
+        value += "T00:00:00"
+    timestamp = parse_iso_timestamp(value)
+    if timestamp is None:
+        raise MongoctlException("Invalid time '%s'. Must be relative (e.g. "
+                                "10m, 2h, 1d) or like 2016-01-06T10:00:00" %
+                                value)
+    return timestamp
+
+###############################################################################
+def iter_log_entries(path, since=None, until=None, line_filter=None):
+    """
+    Yields (timestamp, lines) for each entry of the log file logged within
+     [since, until], where lines are the entry's line and its continuation
+     lines that match line_filter. The start of the window is found by
+     bisecting the file rather than reading it from the start and reading
+     stops after the end of the window.
+    """
+    matcher = (line_filter or LogLineFilter()).new_matcher()
+    with open(path) as log_file:
+        if since is not None:
+            log_file.seek(find_log_offset(log_file, since))
+            if log_file.tell() > 0:
+                # partial line
+                log_file.readline()
+
+        timestamp = None
+        lines = []
+        for line in log_file:
+            line = line.rstrip("\r\n")
+            line_timestamp = parse_log_timestamp(line)
+            if line_timestamp is not None:
+                if lines and (since is None or
+                              (timestamp is not None and timestamp >= since)):
+                    yield timestamp, lines
+                timestamp = line_timestamp
+                lines = []
+                if until is not None and timestamp > until:
+                    return
+            if matcher(line):
+                lines.append(line)
+
+        if lines and (since is None or
+                      (timestamp is not None and timestamp >= since)):
+            yield timestamp, lines
+
+###############################################################################
+def find_log_offset(log_file, timestamp):
+    """
+    Returns an offset of the log file at or a little before the first entry
+     logged at or after timestamp (log entries being roughly in time order)
+    """
+    log_file.seek(0, os.SEEK_END)
+    low, high = 0, log_file.tell()
+    while high - low > BISECT_MIN_RANGE:
+        middle = (low + high) / 2
+        middle_timestamp = _first_timestamp_from(log_file, middle)
+        if middle_timestamp is None or middle_timestamp >= timestamp:
+            high = middle
+        else:
+            low = middle
+
+    return low
+
+###############################################################################
+def _first_timestamp_from(log_file, offset):
+    log_file.seek(offset)
+    if offset > 0:
+        # partial line
+        log_file.readline()
+
+    for _ in range(BISECT_MAX_LINES):
+        line = log_file.readline()
+        if not line:
+            break
+        timestamp = parse_log_timestamp(line)
+        if timestamp is not None:
+            return timestamp
+
+###############################################################################
+def merge_log_entries(entry_streams):
+    """
+    Merges the (timestamp, lines) entries of several logs by timestamp (a
+     k-way merge holding one entry per log at a time). Yields
+     (index of the stream, timestamp, lines)
+    """
+    heap = []
+    for index, entries in enumerate(entry_streams):
+        _push_next_entry(heap, index, iter(entries))
+
+    while heap:
+        _, index, timestamp, lines, entries = heapq.heappop(heap)
+        yield index, timestamp, lines
+        _push_next_entry(heap, index, entries)
+
+###############################################################################
+def _push_next_entry(heap, index, entries):
+    for timestamp, lines in entries:
+        # entries logged before any timestamp go first. index breaks ties
+        # so entries/lines are never compared
+        heapq.heappush(heap, (timestamp or 0, index, timestamp, lines,
+                              entries))
+        return
+
+###############################################################################
+# StartupLogMonitor Class
+###############################################################################
+class StartupLogMonitor(object):
+    """
+    Watches the log of a server being started for the line saying it is
+     ready or a fatal startup error. event is set as soon as either is seen
+     so that waiters can check right away. Optionally echoes the log.
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self, log_path, echo=False):
+        self.event = threading.Event()
+        self.ready = False
+        self.fatal_error = None
+        self._echo = echo
+        # only what is logged from now on is about this start
+        self._follower = LogFollower(log_path, self._on_line, from_end=True)
+
+    ###########################################################################
+    def start(self):
+        self._follower.start()
+
+    ###########################################################################
+    def stop(self):
+        self._follower.stop()
+
+    ###########################################################################
+    def _on_line(self, line):
+        if self._echo:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+        if self.fatal_error is None and FATAL_LOG_PATTERN.search(line):
+            self.fatal_error = line.strip()
+            self.event.set()
+        elif not self.ready and READY_LOG_PATTERN.search(line):
+            self.ready = True
+            self.event.set()
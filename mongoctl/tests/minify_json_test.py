@@ -0,0 +1,78 @@
+# The MIT License
+
+# Copyright (c) 2012 ObjectLabs Corporation
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+__author__ = 'abdul'
+import json
+import unittest
+from mongoctl.minify_json.minify_json import json_minify
+
+class MinifyJsonTest(unittest.TestCase):
+    def test_comments_and_white_space(self):
+        self.assertEqual(json_minify('// header\n{"a": 1, /* x */ "b": [1, 2]}\n'),
+                         '{"a":1,"b":[1,2]}')
+        self.assertEqual(json_minify('{"a": 1}//c\r{'), '{"a":1}{')
+        self.assertEqual(json_minify('{"a" : "b c"}', strip_space=False),
+                         '{"a" : "b c"}')
+        self.assertEqual(json_minify('{"a": 1} // x\n', strip_space=False),
+                         '{"a": 1} ')
+
+    def test_comment_markers_in_strings(self):
+        self.assertEqual(json_minify('{"a": "x // y"}'), '{"a":"x // y"}')
+        self.assertEqual(json_minify('{"a": "x /* y */ z"}'),
+                         '{"a":"x /* y */ z"}')
+        self.assertEqual(json_minify('{"/*":"*/","//":"",/*"//"*/"/*/"://\n"//"}'),
+                         '{"/*":"*/","//":"","/*/":"//"}')
+        self.assertEqual(json_minify('{"a": "//"} // "x"\n'), '{"a":"//"}')
+
+    def test_escaped_quotes(self):
+        # escaped quotes do not end strings, escaped backslashes do not
+        # escape the quote that follows them
+        self.assertEqual(json_minify(r'{"a": "b\"c // d"}'),
+                         r'{"a":"b\"c // d"}')
+        self.assertEqual(json_minify(r'{"a": "b\\", "c": 1 // x' + '\n}'),
+                         r'{"a":"b\\","c":1}')
+        self.assertEqual(json_minify(r'{"a": "b\\\"/* x */"}'),
+                         r'{"a":"b\\\"/* x */"}')
+        self.assertEqual(json.loads(json_minify(
+            r'{"foo": "ba\"r//", "bar\\": "b\\\"a/*z", "baz": /* y */ "o"}')),
+            {"foo": 'ba"r//', "bar\\": 'b\\"a/*z', "baz": "o"})
+
+    def test_line_breaks_in_strings(self):
+        # raw line breaks are dropped from strings only when stripping space
+        self.assertEqual(json_minify('{"a": "x\ny"}'), '{"a":"xy"}')
+        self.assertEqual(json_minify('{"a": "x\ny"}', strip_space=False),
+                         '{"a": "x\ny"}')
+        self.assertEqual(json_minify('{"a": "b\tc"}'), '{"a":"b\tc"}')
+
+    def test_differences_from_previous_implementation(self):
+        # the previous implementation left the text after the last quote or
+        # comment marker untouched: white space was kept there and so was the
+        # content of a trailing unterminated comment
+        self.assertEqual(json_minify('{"a": 1, "b": 2 }'), '{"a":1,"b":2}')
+        self.assertEqual(json_minify(r'{"a": "b\\"}//c'), r'{"a":"b\\"}')
+        self.assertEqual(json_minify('{"a": 1 /* x'), '{"a":1')
+        self.assertEqual(json_minify('{"a": "\\\\" /* x */ }'),
+                         '{"a":"\\\\"}')
+
+    def test_unterminated_string(self):
+        self.assertEqual(json_minify('{"a": "un // x'), '{"a":"un // x')
@@ -0,0 +1,193 @@
+# The MIT License
+
+# Copyright (c) 2012 ObjectLabs Corporation
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+__author__ = 'abdul'
+import os
+import time
+import shutil
+import calendar
+import tempfile
+import unittest
+from mongoctl.server_log import (
+    parse_log_timestamp, find_log_offset, iter_log_entries, merge_log_entries,
+    BISECT_MIN_RANGE
+)
+
+class ServerLogTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_log_timestamp(self):
+        utc = calendar.timegm((2016, 1, 6, 10, 0, 0, 0, 0, -1))
+        local = time.mktime((2016, 1, 6, 10, 0, 0, 0, 0, -1))
+
+        # iso8601-utc and iso8601-local text logs
+        self.assertEqual(parse_log_timestamp(
+            "2016-01-06T10:00:00.123Z I NETWORK  [initandlisten] x"),
+            utc + 0.123)
+        self.assertEqual(parse_log_timestamp(
+            "2016-01-06T10:00:00.500+0000 I NETWORK  [initandlisten] x"),
+            utc + 0.5)
+        self.assertEqual(parse_log_timestamp(
+            "2016-01-06T10:00:00-0130 I NETWORK  [initandlisten] x"),
+            utc + 90 * 60)
+        self.assertEqual(parse_log_timestamp(
+            "2016-01-06T15:30:00+05:30 I NETWORK  [initandlisten] x"), utc)
+        self.assertEqual(parse_log_timestamp(
+            "2016-01-06T10:00:00 I NETWORK  [initandlisten] x"), local)
+
+        # json logs (mongod >= 4.4)
+        self.assertEqual(parse_log_timestamp(
+            '{"t":{"$date":"2016-01-06T10:00:00.250+00:00"},"s":"I",'
+            '"c":"NETWORK","msg":"x"}'), utc + 0.25)
+        self.assertEqual(parse_log_timestamp('{"s":"I","msg":"x"}'), None)
+
+        # ctime (older mongods): no year so the current one is assumed
+        ctime_local = time.mktime((time.localtime().tm_year, 1, 6, 10, 0, 0,
+                                   0, 0, -1))
+        self.assertEqual(parse_log_timestamp(
+            "Wed Jan  6 10:00:00.125 [initandlisten] x"), ctime_local + 0.125)
+        self.assertEqual(parse_log_timestamp(
+            "Wed Jan 16 10:00:00 [initandlisten] x"),
+            ctime_local + 10 * 24 * 60 * 60)
+        self.assertEqual(parse_log_timestamp(
+            "Wed Foo  6 10:00:00 [initandlisten] x"), None)
+
+        # continuation lines
+        self.assertEqual(parse_log_timestamp("    at some.frame()"), None)
+        self.assertEqual(parse_log_timestamp(""), None)
+
+    def test_find_log_offset(self):
+        start = calendar.timegm((2016, 1, 6, 0, 0, 0, 0, 0, -1))
+        num_entries = 20000
+        log_path = self._write_log(start, num_entries)
+        line_offsets = self._line_offsets(log_path)
+        size = os.path.getsize(log_path)
+        self.assertTrue(size > 4 * BISECT_MIN_RANGE)
+
+        with open(log_path) as log_file:
+            # before the first and after the last entry
+            self.assertEqual(find_log_offset(log_file, start - 1), 0)
+            self.assertEqual(find_log_offset(log_file, start), 0)
+            self.assertTrue(find_log_offset(log_file, start + num_entries) >=
+                            size - BISECT_MIN_RANGE)
+
+            # at most BISECT_MIN_RANGE (plus the partial line skipped at
+            # bisection points) before the entry
+            for i in [1, 2, 999, 5000, num_entries / 2, num_entries - 2,
+                      num_entries - 1]:
+                offset = find_log_offset(log_file, start + i)
+                self.assertTrue(offset <= line_offsets[i])
+                self.assertTrue(line_offsets[i] - offset <=
+                                BISECT_MIN_RANGE + 100)
+
+        # small logs are not bisected
+        small_log_path = self._write_log(start, 10, "small.log")
+        with open(small_log_path) as log_file:
+            self.assertEqual(find_log_offset(log_file, start + 5), 0)
+
+    def test_iter_log_entries_window(self):
+        start = calendar.timegm((2016, 1, 6, 0, 0, 0, 0, 0, -1))
+        log_path = self._write_log(start, 20000)
+
+        entries = list(iter_log_entries(log_path, since=start + 12345,
+                                        until=start + 12347))
+        self.assertEqual([timestamp for timestamp, lines in entries],
+                         [start + 12345, start + 12346, start + 12347])
+        self.assertEqual(entries[0][1],
+                         [self._log_line(start + 12345, 12345),
+                          "    continuation of 12345"])
+
+        entries = list(iter_log_entries(log_path, since=start + 19999))
+        self.assertEqual([timestamp for timestamp, lines in entries],
+                         [start + 19999])
+        self.assertEqual(list(iter_log_entries(log_path,
+                                               since=start + 20000)), [])
+
+    def test_merge_log_entries(self):
+        streams = [
+            [(None, ["a0"]), (1, ["a1"]), (4, ["a4"]), (6, ["a6"])],
+            [],
+            [(2, ["c2"]), (4, ["c4"]), (5, ["c5"])],
+            [(1, ["d1"]), (3, ["d3"])]
+        ]
+        merged = list(merge_log_entries(streams))
+        # by timestamp, entries without one first, ties in stream order
+        self.assertEqual(merged, [
+            (0, None, ["a0"]),
+            (0, 1, ["a1"]),
+            (3, 1, ["d1"]),
+            (2, 2, ["c2"]),
+            (3, 3, ["d3"]),
+            (0, 4, ["a4"]),
+            (2, 4, ["c4"]),
+            (2, 5, ["c5"]),
+            (0, 6, ["a6"])
+        ])
+        self.assertEqual(list(merge_log_entries([])), [])
+
+    def test_merge_log_entries_reads_lazily(self):
+        consumed = []
+
+        def stream(name, timestamps):
+            for timestamp in timestamps:
+                consumed.append((name, timestamp))
+                yield timestamp, [name]
+
+        merged = merge_log_entries([stream("a", [1, 3, 5]),
+                                    stream("b", [2, 4, 6])])
+        self.assertEqual(next(merged), (0, 1, ["a"]))
+        # one entry per stream held at a time
+        self.assertEqual(sorted(consumed), [("a", 1), ("b", 2)])
+        self.assertEqual(next(merged), (1, 2, ["b"]))
+        self.assertEqual(sorted(consumed), [("a", 1), ("a", 3), ("b", 2)])
+
+    ###########################################################################
+    def _log_line(self, timestamp, i):
+        return "%s I NETWORK  [conn%s] entry %s" % (
+            time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(timestamp)),
+            i, i)
+
+    def _write_log(self, start, num_entries, file_name="mongodb.log"):
+        log_path = os.path.join(self.tmp_dir, file_name)
+        with open(log_path, "w") as log_file:
+            for i in range(num_entries):
+                log_file.write(self._log_line(start + i, i) + "\n")
+                log_file.write("    continuation of %s\n" % i)
+        return log_path
+
+    def _line_offsets(self, log_path):
+        """
+        Returns the offsets of the timestamped lines of the log
+        """
+        offsets = []
+        offset = 0
+        with open(log_path) as log_file:
+            for line in log_file:
+                if not line.startswith(" "):
+                    offsets.append(offset)
+                offset += len(line)
+        return offsets
@@ -25,6 +25,9 @@
 import unittest
 
 from version_functions_test import VersionFunctionsTest
+from minify_json_test import MinifyJsonTest
+from server_log_test import ServerLogTest
+from utils_test import DeadlineTest, WaitForTest, ParallelMapTest
 from basic_test import BasicMongoctlTest
 from master_slave_test import MasterSlaveTest
 from replicaset_test import ReplicasetTest
@@ -36,6 +39,11 @@ from sharded_test import ShardedTest
 ###############################################################################
 all_suites = [
     unittest.TestLoader().loadTestsFromTestCase(VersionFunctionsTest),
+    unittest.TestLoader().loadTestsFromTestCase(MinifyJsonTest),
+    unittest.TestLoader().loadTestsFromTestCase(ServerLogTest),
+    unittest.TestLoader().loadTestsFromTestCase(DeadlineTest),
+    unittest.TestLoader().loadTestsFromTestCase(WaitForTest),
+    unittest.TestLoader().loadTestsFromTestCase(ParallelMapTest),
     unittest.TestLoader().loadTestsFromTestCase(BasicMongoctlTest),
     unittest.TestLoader().loadTestsFromTestCase(MasterSlaveTest),
     unittest.TestLoader().loadTestsFromTestCase(ReplicasetTest),
@@ -0,0 +1,182 @@
+# The MIT License
+
+# Copyright (c) 2012 ObjectLabs Corporation
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+__author__ = 'abdul'
+import sys
+import time
+import threading
+import unittest
+from mongoctl.utils import (
+    Deadline, wait_for, wait_for_all, parallel_map, is_polling
+)
+
+class DeadlineTest(unittest.TestCase):
+    def test_no_deadline(self):
+        deadline = Deadline()
+        self.assertEqual(deadline.remaining(), None)
+        self.assertFalse(deadline.expired())
+        self.assertEqual(deadline.sub(None).remaining(), None)
+
+    def test_remaining_and_expired(self):
+        deadline = Deadline(10)
+        self.assertTrue(9 < deadline.remaining() <= 10)
+        self.assertFalse(deadline.expired())
+
+        expired = Deadline(0)
+        self.assertEqual(expired.remaining(), 0)
+        self.assertTrue(expired.expired())
+
+    def test_sub(self):
+        deadline = Deadline(10)
+        # sub deadlines end no later than their parent
+        self.assertTrue(deadline.sub(5).remaining() <= 5)
+        self.assertTrue(9 < deadline.sub(60).remaining() <= 10)
+        self.assertTrue(9 < deadline.sub(None).remaining() <= 10)
+        self.assertTrue(4 < Deadline().sub(5).remaining() <= 5)
+
+
+class WaitForTest(unittest.TestCase):
+    def test_wait_for(self):
+        self.assertTrue(wait_for(_true_after(3), timeout=5,
+                                 sleep_duration=0.05))
+        self.assertFalse(wait_for(lambda: False, timeout=0.2,
+                                  sleep_duration=0.05, grace=False))
+
+    def test_wait_for_expired_deadline(self):
+        calls = []
+
+        def predicate():
+            calls.append(1)
+            return False
+
+        self.assertFalse(wait_for(predicate, timeout=60,
+                                  deadline=Deadline(0), grace=False))
+        self.assertEqual(len(calls), 1)
+
+    def test_wait_for_polling(self):
+        polling = []
+
+        def predicate():
+            polling.append(is_polling())
+            polling.extend(parallel_map(lambda x: is_polling(), [1, 2, 3]))
+            return True
+
+        wait_for(predicate)
+        self.assertEqual(polling, [True, True, True, True])
+        self.assertFalse(is_polling())
+
+    def test_wait_for_all(self):
+        start_time = time.time()
+        results = wait_for_all([_true_after(2), lambda: False,
+                                _true_after(4)],
+                               timeout=0.5, sleep_duration=0.05)
+        duration = time.time() - start_time
+
+        self.assertEqual(results, [True, False, True])
+        # waits run at once, until the same deadline
+        self.assertTrue(0.4 < duration < 1.5)
+
+    def test_wait_for_all_deadline(self):
+        start_time = time.time()
+        results = wait_for_all([lambda: False, lambda: False], timeout=60,
+                               sleep_duration=0.05, deadline=Deadline(0.3))
+        self.assertEqual(results, [False, False])
+        self.assertTrue(time.time() - start_time < 1.5)
+
+
+class ParallelMapTest(unittest.TestCase):
+    def test_results_in_order(self):
+        self.assertEqual(parallel_map(lambda x: x * 2, range(20),
+                                      parallelism=4),
+                         [x * 2 for x in range(20)])
+        self.assertEqual(parallel_map(lambda x: x * 2, [1, 2],
+                                      parallelism=1), [2, 4])
+        self.assertEqual(parallel_map(lambda x: x, []), [])
+
+    def test_runs_concurrently(self):
+        barrier = _Barrier(3)
+        # times out if calls run one after the other
+        self.assertEqual(parallel_map(barrier.wait, [1, 2, 3],
+                                      parallelism=3), [1, 2, 3])
+
+    def test_first_error_in_items_order(self):
+        done = []
+
+        def func(x):
+            if x == 3:
+                # fails last
+                time.sleep(0.2)
+                raise ValueError("item %s" % x)
+            if x == 7:
+                raise KeyError("item %s" % x)
+            done.append(x)
+            return x
+
+        try:
+            parallel_map(func, range(10), parallelism=4)
+            self.fail("Expected ValueError")
+        except ValueError, e:
+            self.assertEqual(str(e), "item 3")
+
+        # all other calls still ran
+        self.assertEqual(sorted(done), [0, 1, 2, 4, 5, 6, 8, 9])
+
+    def test_system_exit(self):
+        def func(x):
+            if x == 2:
+                sys.exit(1)
+            return x
+
+        self.assertRaises(SystemExit, parallel_map, func, [1, 2, 3],
+                          parallelism=3)
+
+###############################################################################
+def _true_after(num_calls):
+    calls = []
+
+    def predicate():
+        calls.append(1)
+        return len(calls) >= num_calls
+
+    return predicate
+
+###############################################################################
+class _Barrier(object):
+    def __init__(self, count):
+        self._count = count
+        self._condition = threading.Condition()
+
+    def wait(self, value):
+        """
+        Returns value once count threads called wait(), or raises after 5
+         seconds
+        """
+        deadline = Deadline(5)
+        with self._condition:
+            self._count -= 1
+            self._condition.notify_all()
+            while self._count > 0:
+                if deadline.expired():
+                    raise Exception("Barrier timed out")
+                self._condition.wait(deadline.remaining())
+        return value
@@ -8,6 +8,7 @@ from errors import MongoctlException, is_auth_error
 from prompt import read_password
 
 import mongodb_version
+import mongo_utils
 
 ###############################################################################
 __global_login_user__ = {
@@ -49,11 +50,20 @@ def get_global_login_user(server, dbname):
                 __global_login_user__["database"] == dbname and
                 dbname != "local"):
         global_login_server = repository.lookup_server(__global_login_user__["serverId"])
-        global_login_cluster = global_login_server.get_replicaset_cluster()
+        if global_login_server:
+            global_login_cluster = global_login_server.get_replicaset_cluster()
+        else:
+            # login was specified for a whole cluster (e.g. start <cluster-id>)
+            global_login_cluster = repository.lookup_cluster(
+                __global_login_user__["serverId"])
         cluster = server.get_replicaset_cluster()
         if (global_login_cluster and cluster and
                     global_login_cluster.id == cluster.id):
             return __global_login_user__
+        # e.g. shard and config servers of a sharded cluster
+        if (global_login_cluster and
+                global_login_cluster.contains_server(server)):
+            return __global_login_user__
 
 
 ###############################################################################
@@ -150,6 +160,11 @@ def _mongo_add_user(server, db, username, password, read_only=False,
                                 read_only=read_only, num_tries=num_tries+1)
         else:
             raise
+    finally:
+        # the first user ends the localhost exception so databases that
+        # needed no auth so far may need it now. That is also the case when
+        # adding it failed with the PYTHON-407 error or partly went through
+        mongo_utils.forget_client_auth_states(db.client)
 
 
 ###############################################################################
@@ -329,12 +344,20 @@ def get_server_login_user(server, dbname):
         return login_record[dbname]
 
 ###############################################################################
-def _get_server_login_record(server, create_new=True):
+def get_server_login_scope(server):
+    """
+    Returns the key under which login users of the server are recorded.
+    Members of the same cluster share the same login users
+    """
     cluster = server.get_cluster()
     if cluster is not None:
-        key = cluster.id
+        return cluster.id
     else:
-        key = server.id
+        return server.id
+
+###############################################################################
+def _get_server_login_record(server, create_new=True):
+    key = get_server_login_scope(server)
 
     login_record = LOGIN_USERS.get(key)
     if not login_record and create_new:
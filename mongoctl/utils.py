@@ -5,9 +5,14 @@ import subprocess
 import pwd
 import time
 import socket
+import errno
 import psutil
 import urlparse
 import json
+import sys
+import math
+import threading
+import Queue
 
 from bson import json_util
 from mongoctl_logging import *
@@ -45,34 +50,238 @@ def is_url(value):
 
 
 ###############################################################################
-def wait_for(predicate, timeout=None, sleep_duration=2, grace=True):
+# Waiting
+###############################################################################
+# first poll interval of wait_for(). It doubles after each poll up to the
+# sleep_duration of the wait
+MIN_POLL_INTERVAL = 0.05
+
+POLL_BACKOFF_FACTOR = 2
+
+# latency of finished waits: list of
+# {"name", "duration", "polls", "success"}
+__wait_stats__ = []
+
+__wait_stats_lock__ = threading.Lock()
+
+# set while a wait_for() predicate is being evaluated in the current thread
+# so that cached results (e.g. of isMaster) are not used for polling
+__polling_state__ = threading.local()
+
+###############################################################################
+def wait_for(predicate, timeout=None, sleep_duration=2, grace=True,
+             deadline=None, wake_event=None, name=None):
+    """
+    Polls predicate until it returns True or the wait times out and returns
+     whether it did. Polls start MIN_POLL_INTERVAL apart and back off up to
+     sleep_duration apart.
+    :param timeout: seconds to wait for (after the first poll if grace)
+    :param deadline: a Deadline shared by the enclosing operation. The wait
+                     ends at the earliest of it and timeout
+    :param wake_event: a threading.Event that, when set, triggers a poll
+                       right away (e.g. set when a log line says the
+                       condition may be true now)
+    :param name: used to log/record the wait. Defaults to predicate name
+    """
+    name = name or getattr(predicate, "__name__", "predicate")
     start_time = now()
-    must_retry = may_retry = not predicate()
+    polls = 1
+    done = _poll(predicate)
 
-    if must_retry and grace:
+    if not done and grace:
         # optimizing for predicates whose first invocations may be slooooooow
         log_verbose("GRACE: First eval finished in %d secs - resetting timer." %
                     (now() - start_time))
-        start_time = now()
+        wait_deadline = (deadline or Deadline()).sub(timeout)
+    else:
+        wait_deadline = (deadline or Deadline()).sub(
+            None if timeout is None else timeout - (now() - start_time))
+    interval = MIN_POLL_INTERVAL
+    last_log_time = None
+    while not done:
+        remaining = wait_deadline.remaining()
+        if remaining == 0:
+            break
+
+        if last_log_time is None or now() - last_log_time >= sleep_duration:
+            left = ("[-%d sec] " % math.ceil(remaining)
+                    if remaining is not None else "")
+            log_info("-- waiting %s--" % left)
+            last_log_time = now()
+
+        if remaining is not None:
+            interval = min(interval, remaining)
+        if wake_event is not None:
+            if wake_event.wait(interval):
+                wake_event.clear()
+                interval = MIN_POLL_INTERVAL
+        else:
+            time.sleep(interval)
 
-    while must_retry and may_retry:
+        done = _poll(predicate)
+        polls += 1
+        interval = min(interval * POLL_BACKOFF_FACTOR, sleep_duration)
 
-        must_retry = not predicate()
-        if must_retry:
-            net_time = now() - start_time
-            if timeout and net_time + sleep_duration > timeout:
-                may_retry = False
-            else:
-                left = "[-%d sec] " % (timeout - net_time) if timeout else ""
-                log_info("-- waiting %s--" % left)
-                time.sleep(sleep_duration)
+    _record_wait(name, now() - start_time, polls, done)
+    return done
 
-    return not must_retry
+###############################################################################
+def _poll(predicate):
+    was_polling = is_polling()
+    __polling_state__.polling = True
+    try:
+        return predicate()
+    finally:
+        __polling_state__.polling = was_polling
+
+###############################################################################
+def is_polling():
+    """
+    Returns True if called (directly or through parallel_map) from a
+     wait_for() predicate
+    """
+    return getattr(__polling_state__, "polling", False)
+
+###############################################################################
+def wait_for_all(predicates, timeout=None, sleep_duration=2, deadline=None):
+    """
+    Waits for all predicates at once (one thread each) until the same
+     deadline. Returns the list of wait_for() results in predicates order
+    """
+    deadline = (deadline or Deadline()).sub(timeout)
+
+    def wait(predicate):
+        return wait_for(predicate, sleep_duration=sleep_duration,
+                        grace=False, deadline=deadline)
+
+    return parallel_map(wait, predicates, parallelism=len(predicates))
+
+###############################################################################
+def _record_wait(name, duration, polls, success):
+    log_verbose("Waited %.3f secs for %s (%s polls): %s" %
+                (duration, name, polls, "done" if success else "timed out"))
+    with __wait_stats_lock__:
+        __wait_stats__.append({
+            "name": name,
+            "duration": duration,
+            "polls": polls,
+            "success": success
+        })
+
+###############################################################################
+def get_wait_stats():
+    """
+    Returns the latency records of all waits finished so far
+    """
+    with __wait_stats_lock__:
+        return list(__wait_stats__)
+
+###############################################################################
+# Deadline Class
+###############################################################################
+class Deadline(object):
+    """
+    The time by which an operation (and all waits nested in it) must be done.
+     A None timeout means no deadline
+    """
+
+    ###########################################################################
+    # Constructor
+    ###########################################################################
+    def __init__(self, timeout=None):
+        self._expires_at = now() + timeout if timeout is not None else None
+
+    ###########################################################################
+    def remaining(self):
+        """
+        Returns the seconds left (0 once expired) or None if no deadline
+        """
+        if self._expires_at is not None:
+            return max(0, self._expires_at - now())
+
+    ###########################################################################
+    def expired(self):
+        return self.remaining() == 0
+
+    ###########################################################################
+    def sub(self, timeout):
+        """
+        Returns a deadline timeout seconds from now but no later than this one
+        """
+        deadline = Deadline(timeout)
+        if (self._expires_at is not None and
+                (deadline._expires_at is None or
+                 self._expires_at < deadline._expires_at)):
+            deadline._expires_at = self._expires_at
+
+        return deadline
 
 ###############################################################################
 def now():
     return time.time()
 
+###############################################################################
+# Parallel execution
+###############################################################################
+# max number of threads used by parallel_map(). Set by --parallelism
+DEFAULT_PARALLELISM = 8
+
+PARALLELISM = DEFAULT_PARALLELISM
+
+###############################################################################
+def parallel_map(func, items, parallelism=None):
+    """
+    Like map() but calls func on items concurrently using a bounded number of
+     threads (PARALLELISM by default). Results are returned in items order.
+     If any call raises (or exits) then the exception of the first failing
+     item (in items order) is re-raised after all calls finish.
+    """
+    items = list(items)
+    parallelism = min(parallelism or PARALLELISM, len(items))
+    if parallelism <= 1:
+        return map(func, items)
+
+    results = [None] * len(items)
+    errors = [None] * len(items)
+    pending = Queue.Queue()
+    for i in range(len(items)):
+        pending.put(i)
+
+    # calls made for a polling predicate are polling too
+    polling = is_polling()
+
+    def worker():
+        __polling_state__.polling = polling
+        while True:
+            try:
+                i = pending.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                results[i] = func(items[i])
+            except BaseException:
+                # including SystemExit (e.g. exit() calls of start/stop) so
+                # that it is re-raised in the calling thread
+                errors[i] = sys.exc_info()
+
+    threads = []
+    for _ in range(parallelism):
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    # join with a timeout so that the main thread stays interruptible
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(0.1)
+
+    for error in errors:
+        if error:
+            raise error[0], error[1], error[2]
+
+    return results
+
 ###############################################################################
 # OS Functions
 ###############################################################################
@@ -242,6 +451,31 @@ def is_valid_member_address(address):
 # Network Utils Functions
 ###############################################################################
 
+# timeout for raw tcp port probes, in seconds
+TCP_PROBE_TIMEOUT = 0.5
+
+###############################################################################
+def probe_tcp_port(host, port, timeout=TCP_PROBE_TIMEOUT):
+    """
+    Attempts a raw tcp connect to host:port.
+    Returns True if the port accepted the connection, False if the connection
+     was refused (i.e. nothing is listening on the port) and None if it could
+     not be determined within the timeout
+    """
+    sock = None
+    try:
+        sock = socket.create_connection((host, port), timeout)
+        return True
+    except socket.error, e:
+        if getattr(e, "errno", None) == errno.ECONNREFUSED:
+            return False
+        log_debug("TCP probe of %s:%s inconclusive: %s" % (host, port, e))
+        return None
+    finally:
+        if sock is not None:
+            sock.close()
+
+
 def is_host_local(host):
     if (host == "localhost" or
                 host == "127.0.0.1"):